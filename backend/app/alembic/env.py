@@ -9,7 +9,7 @@ from sqlmodel import SQLModel
 
 from alembic import context
 
-from models import Poll, PollOption, Vote, RollRange
+from models import Poll, PollFinalResult, PollOption, Vote, RollRange
 
 load_dotenv()
 # this is the Alembic Config object, which provides
@@ -31,6 +31,27 @@ if config.config_file_name is not None:
 # target_metadata = mymodel.Base.metadata
 target_metadata = SQLModel.metadata
 
+# Database-managed objects that have no counterpart in the models, kept out
+# of autogenerate so it does not try to drop them
+UNMANAGED_OBJECTS = {
+    "search_vector",
+    "ix_poll_search_vector",
+    "ix_poll_title_trgm",
+    "ix_poll_description_trgm",
+    "allowed_rolls",
+    "ix_poll_allowed_rolls",
+    "ix_poll_public_created_at",
+    "ix_poll_created_at",
+    "ix_poll_creator_email_created_at",
+    "ix_poll_total_votes",
+    "ix_poll_start_time",
+    "ix_poll_end_time",
+}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and name in UNMANAGED_OBJECTS)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,6 +74,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -76,7 +98,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,55 @@
+"""Timestamps with time zone
+
+Revision ID: 0c188424c50a
+Revises: 3704c36443f5
+Create Date: 2026-10-18 12:40:03.581920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c188424c50a'
+down_revision: Union[str, None] = '3704c36443f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = [
+    ('poll', 'created_at'),
+    ('poll', 'start_time'),
+    ('poll', 'end_time'),
+    ('vote', 'timestamp'),
+]
+
+
+def _alter_if(table: str, column: str, from_type: str, to_type: str, using: str) -> None:
+    # Depending on which earlier revisions were applied by hand the columns
+    # may already have the target type, so only convert the ones that don't
+    op.execute(f"""
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = '{table}' AND column_name = '{column}') = '{from_type}' THEN
+                ALTER TABLE {table} ALTER COLUMN "{column}" TYPE {to_type} USING {using};
+            END IF;
+        END $$
+    """)
+
+
+def upgrade() -> None:
+    # Stored values are UTC; the asyncpg driver refuses aware datetimes for
+    # columns without a time zone
+    for table, column in COLUMNS:
+        _alter_if(table, column, 'timestamp without time zone', 'timestamptz',
+                  f""""{column}" AT TIME ZONE 'UTC'""")
+
+
+def downgrade() -> None:
+    for table, column in COLUMNS:
+        _alter_if(table, column, 'timestamp with time zone', 'timestamp',
+                  f""""{column}" AT TIME ZONE 'UTC'""")
@@ -0,0 +1,85 @@
+"""Merge roll ranges into an indexed multirange
+
+Revision ID: 3704c36443f5
+Revises: b80248ca5781
+Create Date: 2026-10-18 11:48:30.117254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3704c36443f5'
+down_revision: Union[str, None] = 'b80248ca5781'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_if_invalid(name: str) -> None:
+    """Drop what an interrupted concurrent build left behind, so it is built again."""
+    invalid = op.get_bind().execute(sa.text("""
+        SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+        WHERE pg_class.relname = :name AND NOT pg_index.indisvalid
+    """), {"name": name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # Ranges were never checked on the way in, and one whose start is after
+    # its end matched no roll (start <= roll <= end). Postgres refuses to
+    # build such a range, so they go before anything is merged; swapping the
+    # bounds would let rolls into polls they could not see before
+    op.execute('DELETE FROM rollrange WHERE start > "end"')
+
+    # Rewrite every poll's ranges as their merged (disjoint) form
+    op.execute("""
+        CREATE TEMPORARY TABLE merged_rollrange ON COMMIT DROP AS
+        SELECT poll_id, unnest(range_agg(int4range(start, "end", '[]'))) AS rolls
+        FROM rollrange
+        GROUP BY poll_id
+    """)
+    op.execute("DELETE FROM rollrange")
+    op.execute("""
+        INSERT INTO rollrange (id, start, "end", poll_id)
+        SELECT gen_random_uuid(), lower(rolls), upper(rolls) - 1, poll_id
+        FROM merged_rollrange
+    """)
+
+    op.execute("""
+        ALTER TABLE poll
+        ADD COLUMN allowed_rolls int4multirange NOT NULL DEFAULT '{}'
+    """)
+    op.execute("""
+        UPDATE poll
+        SET allowed_rolls = merged.allowed_rolls
+        FROM (
+            SELECT poll_id, range_agg(int4range(start, "end", '[]')) AS allowed_rolls
+            FROM rollrange
+            GROUP BY poll_id
+        ) AS merged
+        WHERE poll.id = merged.poll_id
+    """)
+
+    # The rewrite commits first, then the indexes are built CONCURRENTLY so
+    # the tables stay writable meanwhile; that cannot run in a transaction
+    with op.get_context().autocommit_block():
+        _drop_if_invalid('ix_rollrange_poll_id')
+        op.create_index(op.f('ix_rollrange_poll_id'), 'rollrange', ['poll_id'], unique=False,
+                        if_not_exists=True, postgresql_concurrently=True)
+        _drop_if_invalid('ix_poll_allowed_rolls')
+        op.create_index('ix_poll_allowed_rolls', 'poll', ['allowed_rolls'], unique=False,
+                        if_not_exists=True, postgresql_using='gist', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_poll_allowed_rolls', table_name='poll', if_exists=True,
+                      postgresql_concurrently=True)
+        op.drop_index(op.f('ix_rollrange_poll_id'), table_name='rollrange', if_exists=True,
+                      postgresql_concurrently=True)
+    op.drop_column('poll', 'allowed_rolls')
@@ -0,0 +1,69 @@
+"""Add feed indexes
+
+Revision ID: 9e1f0c5b7d2a
+Revises: fc034ab2ebc2
+Create Date: 2026-10-18 19:40:12.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1f0c5b7d2a'
+down_revision: Union[str, None] = 'fc034ab2ebc2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns, partial index predicate). Feeds order by their sort
+# column and then the id, so the sort indexes end with the id where they can
+# and a page or a cursor continues straight from the index
+INDEXES = [
+    # Options are loaded by poll for every feed page, poll and result
+    ('ix_polloption_poll_id', 'polloption', ['poll_id'], None),
+    # /polls/public
+    ('ix_poll_public_created_at', 'poll', ['created_at', 'id'], 'is_private IS false'),
+    # /polls/
+    ('ix_poll_created_at', 'poll', ['created_at', 'id'], None),
+    # /polls/my-polls
+    ('ix_poll_creator_email_created_at', 'poll', ['creator_email', 'created_at', 'id'], None),
+    # /polls/popular-polls
+    ('ix_poll_total_votes', 'poll', ['total_votes', 'id'], None),
+    # /polls/upcoming-polls, and /polls/ongoing-polls with the end of the
+    # window checked in the index instead of on every started poll's row.
+    # It has to be a key column for that: Postgres only filters on included
+    # columns after fetching the row
+    ('ix_poll_start_time', 'poll', ['start_time', 'id', 'end_time'], None),
+    # /polls/ended-polls
+    ('ix_poll_end_time', 'poll', ['end_time', 'id'], None),
+]
+
+
+def _drop_if_invalid(name: str) -> None:
+    """Drop what an interrupted concurrent build left behind, so it is built again."""
+    invalid = op.get_bind().execute(sa.text("""
+        SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid
+        WHERE pg_class.relname = :name AND NOT pg_index.indisvalid
+    """), {"name": name}).first()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the tables writable while the indexes are built,
+    # and it cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            _drop_if_invalid(name)
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True,
+                            postgresql_where=sa.text(where) if where else None)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
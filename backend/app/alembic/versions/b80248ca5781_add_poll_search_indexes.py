@@ -0,0 +1,47 @@
+"""Add poll search indexes
+
+Revision ID: b80248ca5781
+Revises: fc1d48a07391
+Create Date: 2026-10-18 11:02:15.640912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b80248ca5781'
+down_revision: Union[str, None] = 'fc1d48a07391'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Trigram indexes serve the default substring (ILIKE '%q%') search
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_poll_title_trgm', 'poll', ['title'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_poll_description_trgm', 'poll', ['description'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'})
+
+    # Weighted full-text vector for the ranked search mode; the 'simple'
+    # configuration avoids English stemming of Bangla or mixed titles
+    op.execute("""
+        ALTER TABLE poll ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_poll_search_vector', 'poll', ['search_vector'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_poll_search_vector', table_name='poll')
+    op.drop_column('poll', 'search_vector')
+    op.drop_index('ix_poll_description_trgm', table_name='poll')
+    op.drop_index('ix_poll_title_trgm', table_name='poll')
@@ -0,0 +1,34 @@
+"""Add poll final results
+
+Revision ID: f94ce8d477cd
+Revises: 0c188424c50a
+Create Date: 2026-10-18 19:02:17.448391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f94ce8d477cd'
+down_revision: Union[str, None] = '0c188424c50a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('pollfinalresult',
+    sa.Column('poll_id', sa.Uuid(), nullable=False),
+    sa.Column('result', sa.JSON(), nullable=False),
+    sa.Column('etag', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False),
+    sa.Column('finalized_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['poll_id'], ['poll.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('poll_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('pollfinalresult')
@@ -0,0 +1,27 @@
+"""Add poll version
+
+Revision ID: fc034ab2ebc2
+Revises: f94ce8d477cd
+Create Date: 2026-10-18 19:20:51.082236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fc034ab2ebc2'
+down_revision: Union[str, None] = 'f94ce8d477cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('poll', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('poll', 'version')
@@ -0,0 +1,51 @@
+"""Add vote tallies
+
+Revision ID: fc1d48a07391
+Revises: 54770c2d8772
+Create Date: 2026-10-18 10:12:41.203117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fc1d48a07391'
+down_revision: Union[str, None] = '54770c2d8772'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('poll', sa.Column('total_votes', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('polloption', sa.Column('total_votes', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the tallies from the votes cast so far
+    op.execute("""
+        UPDATE polloption
+        SET total_votes = counts.total_votes
+        FROM (
+            SELECT option_id, count(*) AS total_votes
+            FROM vote
+            GROUP BY option_id
+        ) AS counts
+        WHERE polloption.id = counts.option_id
+    """)
+    op.execute("""
+        UPDATE poll
+        SET total_votes = counts.total_votes
+        FROM (
+            SELECT poll_id, sum(total_votes) AS total_votes
+            FROM polloption
+            GROUP BY poll_id
+        ) AS counts
+        WHERE poll.id = counts.poll_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('polloption', 'total_votes')
+    op.drop_column('poll', 'total_votes')
@@ -0,0 +1,62 @@
+import functools
+import inspect
+
+from fastapi import APIRouter
+from fastapi.routing import APIRoute
+
+from api.deps import AsyncSessionDep
+
+
+def run_on_async_session(endpoint):
+    """Turn a sync endpoint taking a `session` into an async one.
+
+    The endpoint body runs unchanged through `AsyncSession.run_sync`: its
+    queries, subqueryloads and lazy loads go through the asyncio driver on
+    the event loop instead of blocking a threadpool worker, so the eager
+    loading and error behaviour are exactly those of the sync route.
+    """
+    signature = inspect.signature(endpoint)
+    parameters = [
+        parameter.replace(annotation=AsyncSessionDep) if name == "session" else parameter
+        for name, parameter in signature.parameters.items()
+    ]
+
+    @functools.wraps(endpoint)
+    async def async_endpoint(**kwargs):
+        async_session = kwargs.pop("session")
+        return await async_session.run_sync(
+            lambda session: endpoint(session=session, **kwargs))
+
+    async_endpoint.__signature__ = signature.replace(parameters=parameters)
+    return async_endpoint
+
+
+def async_router(router: APIRouter) -> APIRouter:
+    """Copy `router`, serving every endpoint that uses the database asynchronously."""
+    copy = APIRouter()
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            copy.routes.append(route)
+            continue
+        endpoint = route.endpoint
+        if "session" in inspect.signature(endpoint).parameters:
+            endpoint = run_on_async_session(endpoint)
+        copy.add_api_route(
+            route.path,
+            endpoint,
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            deprecated=route.deprecated,
+            methods=route.methods,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+        )
+    return copy
@@ -1,13 +1,19 @@
-from collections.abc import Generator
+import hashlib
+import time
+from collections.abc import AsyncGenerator, Callable, Generator
 from typing import Annotated
 
+import anyio
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from core.db import engine
+from core.cache import TTLCache
+from core.db import async_engine, engine
 from core.config import settings
+from core.metrics import Counter, Gauge
 from core import security
 from models.common import AuthUser
 from utils.email_validator import is_valid_cuet_email
@@ -16,16 +22,84 @@ from utils.email_validator import is_valid_cuet_email
 httpBearer = HTTPBearer()
 
 
-def get_db() -> Generator[Session, None, None]:
+# Requests holding a database session at once. Bounded by what the pool can
+# serve so excess load is shed with a 503 instead of queueing on checkout
+_db_slots = anyio.Semaphore(settings.db_max_concurrency)
+Gauge("db_requests_in_flight", "Requests currently holding a database slot",
+      function=lambda: settings.db_max_concurrency - _db_slots.value)
+db_requests_rejected = Counter("db_requests_rejected_total",
+                               "Requests turned away because every database slot was busy")
+
+
+class DBSlot:
+    """The database slot a request holds until it is done."""
+
+    def __init__(self):
+        self.kept = False
+
+    def keep(self) -> Callable[[], None]:
+        """Hold the slot past the request, for a response that still reads from
+        the database while it is sent; the returned function releases it.
+        """
+        self.kept = True
+        return _db_slots.release
+
+
+async def acquire_db_slot() -> AsyncGenerator[DBSlot, None]:
+    try:
+        with anyio.fail_after(settings.DB_QUEUE_TIMEOUT):
+            await _db_slots.acquire()
+    except TimeoutError:
+        db_requests_rejected.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again shortly",
+            headers={"Retry-After": str(settings.DB_RETRY_AFTER)})
+    slot = DBSlot()
+    try:
+        yield slot
+    finally:
+        if not slot.kept:
+            _db_slots.release()
+
+
+# Depending on it again in an endpoint gives the same slot as its session's
+DBSlotDep = Annotated[DBSlot, Depends(acquire_db_slot)]
+
+
+def get_db(_: DBSlotDep) -> Generator[Session, None, None]:
     with Session(engine) as session:
         yield session
 
 
+async def get_async_db(_: DBSlotDep) -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSession(async_engine) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
 TokenDep = Annotated[str, Depends(httpBearer)]
 
 
-def get_current_user(session: SessionDep, token: TokenDep):
+# Verified users keyed by the token's digest, so each token is only checked
+# against the JWKS once for as long as it stays valid
+_verified_tokens = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE,
+                            ttl=settings.TOKEN_CACHE_TTL)
+Counter("auth_token_cache_hits_total", "Requests authenticated from the verified-token cache",
+        function=lambda: _verified_tokens.hits)
+Counter("auth_token_cache_misses_total", "Requests whose token had to be verified",
+        function=lambda: _verified_tokens.misses)
+Gauge("auth_token_cache_size", "Tokens in the verified-token cache",
+      function=lambda: len(_verified_tokens))
+
+
+def get_current_user(token: TokenDep):
+    token_digest = hashlib.sha256(token.credentials.encode()).digest()
+    user = _verified_tokens.get(token_digest)
+    if user is not None:
+        return user
+
     try:
         signing_key = security.jwks_client.get_signing_key_from_jwt(token.credentials)
         payload = jwt.decode(
@@ -39,13 +113,21 @@ def get_current_user(session: SessionDep, token: TokenDep):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Must be a CUET-student email")
 
-        return AuthUser(
+        user = AuthUser(
             email=payload.get("email"),
             full_name=" ".join(payload.get(
                 "user_metadata").get("full_name").split()[:2]),
             roll=payload.get("email")[1:8],
             avatar_url=payload.get("user_metadata").get("avatar_url")
         )
+        user.email_hash  # computed once here rather than on every cache hit
+
+        # Never keep a token around past its own expiry
+        if "exp" in payload:
+            ttl = min(settings.TOKEN_CACHE_TTL, payload["exp"] - time.time())
+            if ttl > 0:
+                _verified_tokens.set(token_digest, user, ttl=ttl)
+        return user
 
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -1,7 +1,14 @@
 from fastapi import APIRouter
+from api.async_routes import async_router
 from api.routes import poll, vote, user
+from core.config import settings
+
+
+def _mode(router: APIRouter) -> APIRouter:
+    return async_router(router) if settings.DB_ASYNC else router
+
 
 api_router = APIRouter()
-api_router.include_router(poll.router, prefix="/polls", tags=["polls"])
-api_router.include_router(vote.router, prefix="/votes", tags=["votes"])
-api_router.include_router(user.router, prefix="/users", tags=["users"])
+api_router.include_router(_mode(poll.router), prefix="/polls", tags=["polls"])
+api_router.include_router(_mode(vote.router), prefix="/votes", tags=["votes"])
+api_router.include_router(_mode(user.router), prefix="/users", tags=["users"])
@@ -0,0 +1,43 @@
+from collections.abc import Callable
+from uuid import UUID
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+def _default(value):
+    # orjson only takes uuid.UUID itself; asyncpg hands out a subclass
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError
+
+
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered by orjson.
+
+    Produces the same bytes as FastAPI's default rendering of the same data
+    (compact separators, UTF-8, UTC datetimes ending in Z) without going
+    through pydantic.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls `release` once it is done sending.
+
+    It is called whether the body was sent completely, failed or was cut
+    short by the client going away.
+    """
+
+    def __init__(self, content, release: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
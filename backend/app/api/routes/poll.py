@@ -1,33 +1,90 @@
-from datetime import datetime, timezone
-from fastapi import APIRouter, HTTPException, status
+import asyncio
+import csv
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import select, func
-from sqlalchemy.orm import subqueryload
-from sqlalchemy.sql import or_, and_
+from sqlalchemy.orm import Bundle, subqueryload
+from sqlalchemy.sql import and_, case, tuple_
 from uuid import UUID
 
-from api.deps import SessionDep, CurrentUser
-from core.security import hash_email
+from api.deps import DBSlot, DBSlotDep, SessionDep, CurrentUser
+from api.responses import ORJSONResponse, ReleasingStreamingResponse
+from core.cache import TTLCache
+from core.config import settings
+from core.db import engine
+from core.metrics import Counter
 from models.common import Message
 from models.poll import (
     Poll,
     PollCreate,
     PollCreateResponse,
+    PollImportRequest,
+    PollImportResponse,
     PollOption,
     PollOptions,
     PollOptionsCreate,
     PollResponse,
     PollsResponse,
-    PollOptionResult,
     PollResult,
     RollRange,
     RollRanges,
     RollRangesCreate,
 )
 from models.vote import Vote
+from services.cohorts import cohort_index
+from services.eligibility import (
+    get_poll_with_access,
+    merge_roll_ranges,
+    refresh_allowed_rolls,
+    visible_to,
+)
+from services.export import MEDIA_TYPES, ExportFormat, result_query, stream_rows, vote_timeline_query
+from services.live import tally_hub
+from services.poll_events import on_polls_changed, polls_changed
+from services.poll_import import check_options, check_roll_ranges, import_polls, parse_csv
+from services.results import count_result, forget_final_result, get_final_result, result_etag
+from services.search import SearchMode, ranked_search, search_clause
+from utils.cursor import decode_cursor, encode_cursor
+from utils.etag import etag_matches, strong_etag
+from utils.timestamps import as_utc
 
 
 router = APIRouter()
 
+# Results of settled polls never change
+FINAL_RESULT_MAX_AGE = 60 * 60 * 24 * 365
+
+# PollResponse fields read straight off the poll's own columns
+POLL_COLUMN_FIELDS = ("id", "title", "description", "is_private", "creator_email",
+                      "created_at", "start_time", "end_time")
+
+_feed_counts = TTLCache(maxsize=settings.FEED_COUNT_CACHE_SIZE,
+                        ttl=settings.FEED_COUNT_CACHE_TTL)
+
+# Feed pages shared by a cohort of users, as (ids in page order, count, next
+# cursor); the polls themselves are loaded fresh for every request
+_shared_pages = TTLCache(maxsize=settings.COHORT_FEED_CACHE_SIZE,
+                         ttl=settings.COHORT_FEED_CACHE_TTL)
+# Part of every shared page's key and bumped whenever a poll changes, so a
+# page that was being loaded while it changed is never stored or matched
+_shared_generation = 0
+
+
+@on_polls_changed
+def _forget_shared_pages(poll_ids) -> None:
+    global _shared_generation
+    _shared_generation += 1
+    _shared_pages.clear()
+
+
+Counter("feed_shared_page_hits_total", "Feed pages served from a cohort's shared page",
+        function=lambda: _shared_pages.hits)
+Counter("feed_shared_page_misses_total", "Feed pages that had to be loaded for a cohort",
+        function=lambda: _shared_pages.misses)
+
 
 def _serialize_poll_public(poll, total_votes, selected_option) -> PollResponse:
     return PollResponse(
@@ -46,60 +103,334 @@ def _serialize_poll_public(poll, total_votes, selected_option) -> PollResponse:
     )
 
 
-def _get_polls(user, session, skip, limit, search, where_clause, order_by_clause=None) -> PollsResponse:
-    """Get polls based on query parameters."""
-    vote_count_subquery = (
-        select(PollOption.poll_id, func.count(Vote.id).label('total_votes'))
-        .join(Vote, Vote.option_id == PollOption.id, isouter=True)
-        .group_by(PollOption.poll_id)
-        .subquery()
-    )
-
+def _model_row(obj) -> dict:
+    """A table model's fields as pydantic serializes them.
+
+    Pydantic walks a SQLModel table instance's `__dict__`, so the keys come
+    in the order the ORM set them, not in declaration order.
+    """
+    fields = type(obj).model_fields
+    return {key: value for key, value in obj.__dict__.items()
+            if key in fields and not fields[key].exclude}
+
+
+def _poll_row(poll, total_votes, selected_option) -> dict:
+    """`_serialize_poll_public` as a plain dict, keyed in PollResponse field order."""
+    return {
+        "id": poll.id,
+        "title": poll.title,
+        "description": poll.description,
+        "is_private": poll.is_private,
+        "creator_email": poll.creator_email,
+        "created_at": poll.created_at,
+        "start_time": poll.start_time,
+        "end_time": poll.end_time,
+        "roll_ranges": [_model_row(roll_range) for roll_range in poll.roll_ranges],
+        "options": [_model_row(option) for option in poll.options],
+        "selected_option": _model_row(selected_option) if selected_option else None,
+        "total_votes": total_votes,
+    }
+
+
+def _parse_fields(fields: str | None) -> frozenset[str] | None:
+    """The PollResponse fields named in a comma-separated `fields` parameter."""
+    if fields is None:
+        return None
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = requested - PollResponse.model_fields.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # Polls are always identified
+    return requested | {"id"}
+
+
+def _sparse_poll_rows(session, polls, fields) -> list[dict]:
+    """Feed rows with only `fields`, loading just the relations they name.
+
+    Roll ranges and options take one query each for the whole page, and the
+    selected options one more when options themselves are not requested.
+    """
+    poll_ids = [poll.id for poll, *_ in polls]
+    related = {}
+    for name, model in (("roll_ranges", RollRange), ("options", PollOption)):
+        if name in fields:
+            related[name] = defaultdict(list)
+            if poll_ids:
+                for child in session.exec(select(model).where(model.poll_id.in_(poll_ids))).all():
+                    related[name][child.poll_id].append(child)
+
+    selected_options = {}
+    if "selected_option" in fields:
+        if "options" in related:
+            selected_options = {option.id: option
+                                for options in related["options"].values() for option in options}
+        else:
+            selected_ids = [selected_option for _, _, selected_option, *_ in polls if selected_option]
+            if selected_ids:
+                selected_options = {option.id: option for option in session.exec(
+                    select(PollOption).where(PollOption.id.in_(selected_ids))).all()}
+
+    rows = []
+    for poll, total_votes, selected_option, *_ in polls:
+        row = {}
+        for name in PollResponse.model_fields:
+            if name not in fields:
+                continue
+            if name in related:
+                row[name] = [_model_row(child) for child in related[name][poll.id]]
+            elif name == "selected_option":
+                option = selected_options.get(selected_option)
+                row[name] = _model_row(option) if option else None
+            elif name == "total_votes":
+                row[name] = total_votes
+            else:
+                row[name] = getattr(poll, name)
+        rows.append(row)
+    return rows
+
+
+def _feed_etag(rows, total_count, fields=None) -> str:
+    """ETag of a feed page from its polls' (id, version, total votes, selected option)."""
+    return strong_etag(repr((rows, total_count, sorted(fields or ()))).encode())
+
+
+def _poll_etag(poll_id, version, total_votes, selected_option_id) -> str:
+    return strong_etag(repr((poll_id, version, total_votes, selected_option_id)).encode())
+
+
+def _set_validators(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    # Clients may keep the response but must revalidate it before reuse
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def _not_modified(etag: str) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    _set_validators(response, etag)
+    return response
+
+
+def _count_polls(session, filters, count_key) -> int:
+    """Count the polls matching `filters`, cached per filter for a short while."""
+    total_count = _feed_counts.get(count_key) if count_key else None
+    if total_count is None:
+        total_count = session.exec(
+            select(func.count(Poll.id)).where(*filters)).one()
+        if count_key:
+            _feed_counts.set(count_key, total_count)
+    return total_count
+
+
+def _share_key(feed: str, session, user) -> tuple | None:
+    """Key of the users who get the same pages of `feed` as `user`, None to not share them."""
+    if not settings.COHORT_FEED_CACHE:
+        return None
+    return feed, cohort_index.cohort_of(session, user) if user else None
+
+
+def _get_polls(user, session, skip, limit, search, where_clause, sort_column=Poll.total_votes, descending=True,
+               cursor=None, with_count=True, count_key=None, search_mode=SearchMode.contains,
+               fields=None, paginate=True, response=None, if_none_match=None,
+               share_key=None) -> PollsResponse | Response:
+    """Get polls based on query parameters.
+
+    Polls are ordered by `sort_column` and then `Poll.id`. When a `cursor` is
+    given the page starts right after the poll it points to and `skip` is
+    ignored; the total count then comes from a short-lived per-filter cache.
+    Offset pages are counted exactly in a query of their own, so the page
+    itself can stop at its last row of the sort index; a page past the end
+    still reports the total, and under concurrent writes the count may see
+    a slightly newer state than the rows. `with_count=False` skips the
+    count altogether.
+
+    With `search_mode=ranked` the search is a full-text match and the best
+    matches come first; such pages cannot be continued with a cursor.
+    `paginate=False` never hands out a next cursor.
+
+    `fields` is a comma-separated subset of PollResponse's fields. The query
+    then selects only the poll columns those need, relations are loaded only
+    when named, and the rows are returned as they are instead of as
+    PollResponse models.
+
+    The page's ETag is set on `response`, or on the ORJSONResponse returned
+    instead with FAST_JSON. When `if_none_match` is given it
+    is checked first with a query for just the ids and counters of the page,
+    and a match is answered with 304 without loading or serializing polls.
+
+    `share_key` names the users who see the same polls in this feed (see
+    `_share_key`). Which polls are on a page, its count and next cursor are
+    then cached for all of them; a cached page skips the sorted page query
+    and the count, but its polls, tallies and selected options are still
+    loaded for every request, through the feed's filters. When some of them
+    no longer pass, the page is loaded afresh as if it had not been cached.
+    """
     selected_option_subquery = (
         select(Vote.option_id, PollOption.poll_id)
         .join(PollOption, PollOption.id == Vote.option_id)
-        .where(Vote.voter_email_hash == hash_email(user.email) if user else None)
+        .where(Vote.voter_email_hash == user.email_hash if user else None)
         .subquery()
     )
 
-    query = (
-        select(Poll, vote_count_subquery.c.total_votes, selected_option_subquery.c.option_id.label('selected_option'),
-               func.count().over().label('total_count'))
-        .join(vote_count_subquery, vote_count_subquery.c.poll_id == Poll.id, isouter=True)
-        .join(selected_option_subquery, selected_option_subquery.c.poll_id == Poll.id, isouter=True)
-        .where(where_clause)
-        .options(
-            subqueryload(Poll.options),
-            subqueryload(Poll.roll_ranges)
-        )
-        .order_by(func.coalesce(vote_count_subquery.c.total_votes, 0).desc() if order_by_clause is None else order_by_clause)
-        .offset(skip)
-        .limit(limit)
-    )
-
-    if search:
-        search = f"%{search}%"
-        query = query.where(
-            or_(Poll.title.ilike(search), Poll.description.ilike(search))
+    filters = [where_clause]
+    order_by = ((sort_column.desc(), Poll.id.desc()) if descending
+                else (sort_column.asc(), Poll.id.asc()))
+    ranked = bool(search) and search_mode == SearchMode.ranked
+    if ranked:
+        if cursor is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Ranked search does not support cursor pagination")
+        search_filter, rank = ranked_search(
+            session.get_bind().dialect.name, search)
+        filters.append(search_filter)
+        order_by = (rank.desc(), *order_by)
+    elif search:
+        filters.append(search_clause(search))
+
+    fields = _parse_fields(fields)
+    if fields is None:
+        poll_columns = Poll
+    else:
+        # The cursor and the ETag need the id, version and sort column too
+        wanted = [Poll.id, Poll.version, sort_column,
+                  *(getattr(Poll, name) for name in POLL_COLUMN_FIELDS if name in fields)]
+        poll_columns = Bundle("poll", *{column.key: column for column in wanted}.values())
+
+    shared_page = None
+    if share_key is not None:
+        generation = _shared_generation
+        share_key = (generation, share_key, skip if cursor is None else cursor, limit, search,
+                     search_mode, fields, with_count, paginate)
+        shared_page = _shared_pages.get(share_key)
+
+    columns = [poll_columns, Poll.total_votes,
+               selected_option_subquery.c.option_id.label('selected_option')]
+
+    def page_query(shared_page):
+        query = (
+            select(*columns)
+            .join(selected_option_subquery, selected_option_subquery.c.poll_id == Poll.id, isouter=True)
         )
-
-    polls = session.exec(query).unique().all()
-    total_count = polls[0][3] if polls else 0
-
-    data = [
-        _serialize_poll_public(poll, total_votes or 0,
-                               session.exec(
-                                   select(PollOption)
-                                   .where(PollOption.id == selected_option)).first()
-                               )
-        for poll, total_votes, selected_option, _ in polls
-    ]
-
-    return PollsResponse(data=data, count=total_count)
+        if shared_page is not None:
+            # The polls of the cached page, in its order. The feed's filters
+            # still apply: the cohort it was stored under may have been
+            # outdated by a change this worker has not heard of yet
+            page_ids = shared_page[0]
+            query = query.where(Poll.id.in_(page_ids), *filters)
+            if page_ids:
+                query = query.order_by(
+                    case({poll_id: position for position, poll_id in enumerate(page_ids)}, value=Poll.id))
+            return query
+        query = query.where(*filters).order_by(*order_by).limit(limit)
+        if cursor is None:
+            return query.offset(skip)
+        try:
+            value, poll_id = decode_cursor(
+                cursor, sort_column.key, sort_column.type.python_type)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        keyset = tuple_(sort_column, Poll.id)
+        return query.where(keyset < tuple_(value, poll_id) if descending
+                           else keyset > tuple_(value, poll_id))
+
+    def load_page(query):
+        if fields is None:
+            query = query.options(
+                subqueryload(Poll.options),
+                subqueryload(Poll.roll_ranges)
+            )
+        return session.exec(query).unique().all()
+
+    counted = {}
+
+    def page_count(rows):
+        if not with_count:
+            return None
+        if shared_page is not None:
+            return shared_page[1]
+        if cursor is not None:
+            return _count_polls(session, filters, count_key)
+        if len(rows) < limit and (rows or skip == 0):
+            # The page holds the last of the polls
+            return skip + len(rows)
+        # Counted once even when the page is also revalidated
+        if 'total' not in counted:
+            counted['total'] = _count_polls(session, filters, None)
+        return counted['total']
+
+    def outdated(rows) -> bool:
+        """Whether polls of the shared page dropped out of this user's feed."""
+        return shared_page is not None and len(rows) < len(shared_page[0])
+
+    query = page_query(shared_page)
+    if if_none_match:
+        rows = session.exec(query.with_only_columns(
+            Poll.id, Poll.version, *columns[1:])).all()
+        if outdated(rows):
+            # The page is loaded afresh for this user and shared again
+            shared_page = None
+            query = page_query(None)
+            rows = session.exec(query.with_only_columns(
+                Poll.id, Poll.version, *columns[1:])).all()
+        etag = _feed_etag([row[:4] for row in rows], page_count(rows), fields)
+        if etag_matches(if_none_match, etag):
+            return _not_modified(etag)
+
+    polls = load_page(query)
+    if outdated(polls):
+        shared_page = None
+        polls = load_page(page_query(None))
+    total_count = page_count(polls)
+
+    etag = _feed_etag([(poll.id, poll.version, total_votes, selected_option)
+                       for poll, total_votes, selected_option, *_ in polls],
+                      total_count, fields)
+
+    next_cursor = None
+    if shared_page is not None:
+        next_cursor = shared_page[2]
+    elif paginate and polls and len(polls) == limit and not ranked:
+        last_poll = polls[-1][0]
+        next_cursor = encode_cursor(sort_column.key, getattr(
+            last_poll, sort_column.key), last_poll.id)
+
+    # Not stored if a poll changed while it was loaded; the page may be outdated
+    if share_key is not None and shared_page is None and generation == _shared_generation:
+        _shared_pages.set(share_key, ([poll.id for poll, *_ in polls], total_count, next_cursor))
+
+    if fields is not None:
+        data = _sparse_poll_rows(session, polls, fields)
+    else:
+        # The selected option is one of the poll's eagerly loaded options, so
+        # it is picked from there instead of being fetched once per row
+        serialize = _poll_row if settings.FAST_JSON else _serialize_poll_public
+        data = [
+            serialize(poll, total_votes,
+                      next((option for option in poll.options
+                            if option.id == selected_option), None)
+                      )
+            for poll, total_votes, selected_option, *_ in polls
+        ]
+
+    # Sparse rows are not PollResponses, so they never go through the
+    # response model
+    if settings.FAST_JSON or fields is not None:
+        # Returned as is, so the validators go on this response
+        response = ORJSONResponse(
+            {"data": data, "count": total_count, "next_cursor": next_cursor})
+        _set_validators(response, etag)
+        return response
+    if response is not None:
+        _set_validators(response, etag)
+    return PollsResponse(data=data, count=total_count, next_cursor=next_cursor)
 
 
 @ router.get("/", response_model=PollsResponse)
-def get_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+              search: str = None, cursor: str = None, with_count: bool = True,
+              search_mode: SearchMode = SearchMode.contains, fields: str = None,
+              if_none_match: str | None = Header(default=None)):
     """Get all polls."""
     polls = _get_polls(
         user=user,
@@ -107,20 +438,25 @@ def get_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int
         skip=skip,
         limit=limit,
         search=search,
-        where_clause=or_(
-            Poll.is_private.is_(False),
-            Poll.creator_email == user.email,
-            Poll.roll_ranges.any(
-                and_(RollRange.start <= user.roll, RollRange.end >= user.roll)
-            ),
-        ),
-        order_by_clause=Poll.created_at.desc()
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("visible", session, user),
+        count_key=("visible", user.email, search),
+        where_clause=visible_to(user),
+        sort_column=Poll.created_at
     )
     return polls
 
 
 @ router.get("/public", response_model=PollsResponse)
-def get_public_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_public_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                     search: str = None, cursor: str = None, with_count: bool = True,
+                     search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                     if_none_match: str | None = Header(default=None)):
     """Get all public polls."""
     polls = _get_polls(
         user=None,
@@ -128,14 +464,25 @@ def get_public_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limi
         skip=skip,
         limit=limit,
         search=search,
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("public", session, None),
+        count_key=("public", search),
         where_clause=Poll.is_private.is_(False),
-        order_by_clause=Poll.created_at.desc()
+        sort_column=Poll.created_at
     )
     return polls
 
 
 @ router.get("/my-polls", response_model=PollsResponse)
-def get_my_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_my_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                 search: str = None, cursor: str = None, with_count: bool = True,
+                 search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                 if_none_match: str | None = Header(default=None)):
     """Get all polls created by the user."""
     polls = _get_polls(
         user=user,
@@ -143,8 +490,15 @@ def get_my_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: i
         skip=skip,
         limit=limit,
         search=search,
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        count_key=("mine", user.email, search),
         where_clause=Poll.creator_email == user.email,
-        order_by_clause=Poll.created_at.desc()
+        sort_column=Poll.created_at
     )
     return polls
 
@@ -158,20 +512,17 @@ def get_my_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: i
 #         skip=skip,
 #         limit=limit,
 #         search=search,
-#         where_clause=or_(
-#             Poll.is_private.is_(False),
-#             Poll.creator_email == user.email,
-#             Poll.roll_ranges.any(
-#                 and_(RollRange.start <= user.roll, RollRange.end >= user.roll)
-#             )
-#         ),
-#         order_by_clause=Poll.created_at.desc()
+#         where_clause=visible_to(user),
+#         sort_column=Poll.created_at
 #     )
 #     return polls
 
 
 @ router.get("/popular-polls", response_model=PollsResponse)
-def get_popular_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_popular_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                      search: str = None, cursor: str = None, with_count: bool = True,
+                      search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                      if_none_match: str | None = Header(default=None)):
     """Get all popular polls."""
     polls = _get_polls(
         user=user,
@@ -179,19 +530,24 @@ def get_popular_polls(user: CurrentUser, session: SessionDep, skip: int = 0, lim
         skip=skip,
         limit=limit,
         search=search,
-        where_clause=or_(
-            Poll.is_private.is_(False),
-            Poll.creator_email == user.email,
-            Poll.roll_ranges.any(
-                and_(RollRange.start <= user.roll, RollRange.end >= user.roll)
-            ),
-        ),
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("popular", session, user),
+        count_key=("visible", user.email, search),
+        where_clause=visible_to(user),
     )
     return polls
 
 
 @ router.get("/upcoming-polls", response_model=PollsResponse)
-def get_upcoming_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_upcoming_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                       search: str = None, cursor: str = None, with_count: bool = True,
+                       search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                       if_none_match: str | None = Header(default=None)):
     """Get all upcoming polls."""
     polls = _get_polls(
         user=user,
@@ -199,22 +555,29 @@ def get_upcoming_polls(user: CurrentUser, session: SessionDep, skip: int = 0, li
         skip=skip,
         limit=limit,
         search=search,
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("upcoming", session, user),
+        count_key=("upcoming", user.email, search),
         where_clause=and_(
             Poll.start_time > datetime.now(timezone.utc),
-            or_(
-                Poll.is_private.is_(False),
-                Poll.creator_email == user.email,
-                Poll.roll_ranges.any(
-                    and_(RollRange.start <= user.roll, RollRange.end >= user.roll))
-            )
+            visible_to(user)
         ),
-        order_by_clause=Poll.start_time.asc()
+        sort_column=Poll.start_time,
+        descending=False
     )
     return polls
 
 
 @ router.get("/ongoing-polls", response_model=PollsResponse)
-def get_ongoing_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_ongoing_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                      search: str = None, cursor: str = None, with_count: bool = True,
+                      search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                      if_none_match: str | None = Header(default=None)):
     """Get all ongoing polls."""
     polls = _get_polls(
         user=user,
@@ -222,23 +585,30 @@ def get_ongoing_polls(user: CurrentUser, session: SessionDep, skip: int = 0, lim
         skip=skip,
         limit=limit,
         search=search,
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("ongoing", session, user),
+        count_key=("ongoing", user.email, search),
         where_clause=and_(
             Poll.start_time <= datetime.now(timezone.utc),
             Poll.end_time >= datetime.now(timezone.utc),
-            or_(
-                Poll.is_private.is_(False),
-                Poll.creator_email == user.email,
-                Poll.roll_ranges.any(
-                    and_(RollRange.start <= user.roll, RollRange.end >= user.roll))
-            )
+            visible_to(user)
         ),
-        order_by_clause=Poll.start_time.asc()
+        sort_column=Poll.start_time,
+        descending=False
     )
     return polls
 
 
 @ router.get("/ended-polls", response_model=PollsResponse)
-def get_ended_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit: int = 20, search: str = None):
+def get_ended_polls(user: CurrentUser, session: SessionDep, response: Response, skip: int = 0, limit: int = 20,
+                    search: str = None, cursor: str = None, with_count: bool = True,
+                    search_mode: SearchMode = SearchMode.contains, fields: str = None,
+                    if_none_match: str | None = Header(default=None)):
     """Get all ended polls."""
     polls = _get_polls(
         user=user,
@@ -246,16 +616,19 @@ def get_ended_polls(user: CurrentUser, session: SessionDep, skip: int = 0, limit
         skip=skip,
         limit=limit,
         search=search,
+        cursor=cursor,
+        with_count=with_count,
+        search_mode=search_mode,
+        fields=fields,
+        response=response,
+        if_none_match=if_none_match,
+        share_key=_share_key("ended", session, user),
+        count_key=("ended", user.email, search),
         where_clause=and_(
             Poll.end_time < datetime.now(timezone.utc),
-            or_(
-                Poll.is_private.is_(False),
-                Poll.creator_email == user.email,
-                Poll.roll_ranges.any(
-                    and_(RollRange.start <= user.roll, RollRange.end >= user.roll))
-            )
+            visible_to(user)
         ),
-        order_by_clause=Poll.end_time.desc()
+        sort_column=Poll.end_time
     )
     return polls
 
@@ -273,6 +646,7 @@ def create_poll(request: PollCreate, user: CurrentUser, session: SessionDep):
     )
 
     session.add(poll)
+    polls_changed(session, poll.id)
     session.commit()
     session.refresh(poll)
     return PollCreateResponse(poll_id=poll.id)
@@ -302,38 +676,27 @@ def create_full_poll(
 
         # Step 2: Add Poll Options
         option_texts = options_request.option_texts
-        if len(option_texts) < 2:
-            raise HTTPException(
-                status_code=400, detail="At least two options are required"
-            )
-        if len(option_texts) > 20:
-            raise HTTPException(
-                status_code=400, detail="A poll can have at most 20 options"
-            )
-        if len(option_texts) != len(set(option_texts)):
-            raise HTTPException(
-                status_code=400, detail="Options must be unique"
-            )
+        try:
+            check_options(option_texts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         options = [PollOption(poll_id=poll.id, option_text=text)
                    for text in option_texts]
         session.add_all(options)
 
         # Step 3: Add Roll Ranges
-        roll_ranges = roll_ranges_request.roll_ranges
-        if poll.is_private and len(roll_ranges) == 0:
-            raise HTTPException(
-                status_code=400, detail="At least one roll range is required"
-            )
-        unique_ranges = set((start, end) for start, end in roll_ranges)
-        if len(roll_ranges) != len(unique_ranges):
-            raise HTTPException(
-                status_code=400, detail="Roll ranges must be unique"
-            )
+        try:
+            roll_ranges = check_roll_ranges(poll.is_private, roll_ranges_request.roll_ranges)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         ranges = [RollRange(poll_id=poll.id, start=start, end=end)
                   for start, end in roll_ranges]
         session.add_all(ranges)
+        session.flush()
+        refresh_allowed_rolls(session, poll.id)
+        polls_changed(session, poll.id)
 
         # Commit the transaction if all operations succeed
         session.commit()
@@ -348,34 +711,167 @@ def create_full_poll(
         )
 
 
+def _import(session, user, items) -> PollImportResponse:
+    if len(items) > settings.POLL_IMPORT_MAX_POLLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.POLL_IMPORT_MAX_POLLS} polls can be imported at once")
+    results = import_polls(session, user.email, items)
+    return PollImportResponse(data=results,
+                              created=sum(result.poll_id is not None for result in results))
+
+
+@router.post("/import", response_model=PollImportResponse)
+def import_polls_json(request: PollImportRequest, user: CurrentUser, session: SessionDep):
+    """Create many polls with their options and roll ranges at once.
+
+    Each poll is validated on its own and gets its own outcome; the valid
+    ones are created together in one transaction.
+    """
+    return _import(session, user, request.polls)
+
+
+@router.post("/import/csv", response_model=PollImportResponse)
+def import_polls_csv(user: CurrentUser, session: SessionDep, body: str = Body(media_type="text/csv")):
+    """Create many polls from CSV, one per row, like `/import`."""
+    try:
+        items = parse_csv(body)
+    except csv.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid CSV. {str(e)}")
+    return _import(session, user, items)
+
+
+def _live_totals(session, poll_ids: set[UUID], user) -> dict[UUID, int]:
+    """Current totals of polls the user may view, raising like `get_poll` otherwise."""
+    rows = session.exec(
+        select(Poll.id, Poll.total_votes, visible_to(user)).where(Poll.id.in_(poll_ids))
+    ).all()
+    if len(rows) < len(poll_ids):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
+    if not all(can_view for _, _, can_view in rows):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this poll")
+    return {poll_id: total_votes for poll_id, total_votes, _ in rows}
+
+
+def _tally_event(poll_id: UUID, total_votes: int) -> str:
+    data = json.dumps({"poll_id": str(poll_id), "total_votes": total_votes})
+    return f"event: tally\ndata: {data}\n\n"
+
+
+def _stream_tallies(totals: dict[UUID, int]) -> StreamingResponse:
+    """Server-sent events with the polls' totals now and whenever they change."""
+    async def events():
+        subscription = tally_hub.subscribe(totals)
+        try:
+            for poll_id, total_votes in totals.items():
+                yield _tally_event(poll_id, total_votes)
+            while True:
+                try:
+                    updates = await asyncio.wait_for(
+                        subscription.get(), settings.LIVE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                for poll_id, total_votes in updates.items():
+                    yield _tally_event(poll_id, total_votes)
+        finally:
+            tally_hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@ router.get("/batch", response_model=PollsResponse)
+def get_polls_batch(user: CurrentUser, session: SessionDep, response: Response, ids: list[UUID] = Query(),
+                    fields: str = None, if_none_match: str | None = Header(default=None)):
+    """Get several polls by their IDs.
+
+    Polls that do not exist or that the user cannot view are left out. The
+    number of queries does not depend on how many IDs are given.
+    """
+    ids = set(ids)
+    if len(ids) > settings.POLL_BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.POLL_BATCH_MAX_IDS} polls can be fetched at once")
+    polls = _get_polls(
+        user=user,
+        session=session,
+        skip=0,
+        limit=len(ids),
+        search=None,
+        fields=fields,
+        paginate=False,
+        response=response,
+        if_none_match=if_none_match,
+        where_clause=and_(Poll.id.in_(ids), visible_to(user)),
+        sort_column=Poll.created_at
+    )
+    return polls
+
+
+@ router.get("/live", response_class=StreamingResponse)
+def stream_poll_tallies(user: CurrentUser, session: SessionDep, poll_ids: list[UUID] = Query()):
+    """Stream the total votes of several polls as server-sent events."""
+    if len(set(poll_ids)) > settings.LIVE_MAX_POLLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.LIVE_MAX_POLLS} polls can be streamed at once")
+    return _stream_tallies(_live_totals(session, set(poll_ids), user))
+
+
+@ router.get("/{poll_id}/live", response_class=StreamingResponse)
+def stream_poll_tally(poll_id: UUID, user: CurrentUser, session: SessionDep):
+    """Stream the total votes of a poll as server-sent events."""
+    return _stream_tallies(_live_totals(session, {poll_id}, user))
+
+
 @ router.get("/{poll_id}", response_model=PollResponse)
-def get_poll(poll_id: UUID, user: CurrentUser, session: SessionDep):
+def get_poll(poll_id: UUID, user: CurrentUser, session: SessionDep, response: Response,
+             if_none_match: str | None = Header(default=None)):
     """Get a poll by its ID."""
-    poll_with_votes = session.exec(
-        select(Poll, func.coalesce(func.count(Vote.id), 0).label('total_votes'))
-        .outerjoin(PollOption, PollOption.poll_id == Poll.id)
-        .outerjoin(Vote, Vote.option_id == PollOption.id)
-        .where(Poll.id == poll_id)
-        .group_by(Poll.id)
-    ).first()
+    if if_none_match:
+        # Validate against the poll's counters before loading anything else
+        validator = session.exec(
+            select(Poll.version, Poll.total_votes, visible_to(user),
+                   select(Vote.option_id)
+                   .where(Vote.poll_id == Poll.id, Vote.voter_email_hash == user.email_hash)
+                   .scalar_subquery())
+            .where(Poll.id == poll_id)
+        ).first()
+        if validator is not None and validator[2]:
+            version, total_votes, _, selected_option_id = validator
+            etag = _poll_etag(poll_id, version, total_votes, selected_option_id)
+            if etag_matches(if_none_match, etag):
+                return _not_modified(etag)
+
+    poll, can_view = get_poll_with_access(session, poll_id, user)
 
-    if not poll_with_votes:
+    if not poll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
 
-    poll, total_votes = poll_with_votes
-
-    if poll.is_private and poll.creator_email != user.email and not any(roll_range.start <= user.roll <= roll_range.end for roll_range in poll.roll_ranges):
+    if not can_view:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this poll")
 
     selected_option = session.exec(
         select(PollOption)
         .join(Vote, Vote.option_id == PollOption.id)
-        .where(Vote.voter_email_hash == hash_email(user.email), PollOption.poll_id == poll_id)
+        .where(Vote.voter_email_hash == user.email_hash, PollOption.poll_id == poll_id)
     ).first()
 
-    return _serialize_poll_public(poll, total_votes, selected_option)
+    etag = _poll_etag(poll_id, poll.version, poll.total_votes,
+                      selected_option.id if selected_option else None)
+    if settings.FAST_JSON:
+        response = ORJSONResponse(_poll_row(poll, poll.total_votes, selected_option))
+        _set_validators(response, etag)
+        return response
+    _set_validators(response, etag)
+    return _serialize_poll_public(poll, poll.total_votes, selected_option)
 
 
 @ router.delete("/{poll_id}", response_model=Message)
@@ -390,19 +886,21 @@ def delete_poll(poll_id: UUID, user: CurrentUser, session: SessionDep):
         raise HTTPException(
             status_code=403, detail="You are not authorized to delete this poll")
     session.delete(poll)
+    polls_changed(session, poll_id)
     session.commit()
+    forget_final_result(poll_id)
     return Message(message="Poll deleted successfully")
 
 
 @ router.get("/{poll_id}/options", response_model=PollOptions)
 def get_poll_options(poll_id: UUID, user: CurrentUser, session: SessionDep):
     """Get all options of a poll by its ID."""
-    poll = session.get(Poll, poll_id)
+    poll, can_view = get_poll_with_access(session, poll_id, user)
     if not poll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
 
-    if poll.is_private and poll.creator_email != user.email and not any(roll_range.start <= user.roll <= roll_range.end for roll_range in poll.roll_ranges):
+    if not can_view:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this poll")
 
@@ -412,12 +910,12 @@ def get_poll_options(poll_id: UUID, user: CurrentUser, session: SessionDep):
 @ router.get("/{poll_id}/roll-ranges", response_model=RollRanges)
 def get_roll_ranges(poll_id: UUID, user: CurrentUser, session: SessionDep):
     """Get all roll ranges of a poll by its ID."""
-    poll = session.get(Poll, poll_id)
+    poll, can_view = get_poll_with_access(session, poll_id, user)
     if not poll:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
 
-    if poll.is_private and poll.creator_email != user.email and not any(roll_range.start <= user.roll <= roll_range.end for roll_range in poll.roll_ranges):
+    if not can_view:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this poll")
 
@@ -437,6 +935,11 @@ def create_poll_option(poll_id: UUID, request: PollOptionsCreate, user: CurrentU
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to add options to this poll")
 
+    # The result of an ended poll is final
+    if as_utc(poll.end_time) < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Poll has ended")
+
     option_texts = request.option_texts
     if len(option_texts) < 2:
         raise HTTPException(
@@ -451,6 +954,8 @@ def create_poll_option(poll_id: UUID, request: PollOptionsCreate, user: CurrentU
     options = [PollOption(poll_id=poll_id, option_text=option_text)
                for option_text in option_texts]
     session.add_all(options)
+    poll.version = Poll.version + 1
+    polls_changed(session, poll_id)
     session.commit()
     for option in options:
         session.refresh(option)
@@ -472,15 +977,26 @@ def add_allowed_voters(poll_id: UUID, request: RollRangesCreate, user: CurrentUs
         raise HTTPException(
             status_code=400, detail="At least one roll range is required")
 
-    unique_ranges = set(roll_ranges + [(roll_range.start, roll_range.end)
-                                       for roll_range in poll.roll_ranges])
-    if len(roll_ranges) + len(poll.roll_ranges) != len(unique_ranges):
-        raise HTTPException(
-            status_code=400, detail="Roll ranges must be unique")
-
+    # Keep the poll's ranges merged: drop the ones swallowed by the new
+    # ranges and add whatever is left over
+    existing_ranges = {(roll_range.start, roll_range.end): roll_range
+                       for roll_range in poll.roll_ranges}
+    try:
+        merged_ranges = merge_roll_ranges(
+            list(roll_ranges) + list(existing_ranges))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for key, roll_range in existing_ranges.items():
+        if key not in merged_ranges:
+            session.delete(roll_range)
     roll_ranges = [RollRange(poll_id=poll_id, start=start, end=end)
-                   for start, end in roll_ranges]
+                   for start, end in merged_ranges if (start, end) not in existing_ranges]
     session.add_all(roll_ranges)
+    poll.version = Poll.version + 1
+    session.flush()
+    refresh_allowed_rolls(session, poll_id)
+    polls_changed(session, poll_id)
     session.commit()
     for roll_range in roll_ranges:
         session.refresh(roll_range)
@@ -489,34 +1005,84 @@ def add_allowed_voters(poll_id: UUID, request: RollRangesCreate, user: CurrentUs
 
 
 @ router.get("/{poll_id}/result", response_model=PollResult)
-def get_poll_result(poll_id: UUID, user: CurrentUser, session: SessionDep):
+def get_poll_result(poll_id: UUID, user: CurrentUser, session: SessionDep,
+                    if_none_match: str | None = Header(default=None)):
     """Get the result of a poll."""
-    poll = session.get(Poll, poll_id)
+    poll, can_view = get_poll_with_access(session, poll_id, user)
 
     if not poll:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Poll not found")
 
-    if poll.is_private and poll.creator_email != user.email and not any(roll_range.start <= user.roll <= roll_range.end for roll_range in poll.roll_ranges):
+    if not can_view:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to view this poll")
 
-    if poll.end_time > datetime.now(timezone.utc):
+    now = datetime.now(timezone.utc)
+    end_time = as_utc(poll.end_time)
+    if end_time > now:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Poll has not ended yet")
 
-    results = session.exec(
-        select(PollOption.option_text, func.coalesce(
-            func.count(Vote.id), 0).label('votes'))
-        .outerjoin(Vote, Vote.option_id == PollOption.id)
-        .where(PollOption.poll_id == poll_id)
-        .group_by(PollOption.option_text)
-    ).all()
+    if end_time + timedelta(seconds=settings.RESULT_SETTLE_SECONDS) <= now:
+        result, etag = get_final_result(session, poll_id)
+        cache_control = f"private, max-age={FINAL_RESULT_MAX_AGE}, immutable"
+    else:
+        # Votes cast right before the end may still be committing
+        result = count_result(session, poll_id)
+        etag = result_etag(result)
+        cache_control = "private, no-cache"
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # The exact bytes the ETag was computed from
+    return Response(result.model_dump_json(), media_type="application/json", headers=headers)
+
+
+def _export(session, slot: DBSlot, poll_id: UUID, user, query, name: str,
+            format: ExportFormat) -> StreamingResponse:
+    """Stream `query` as a download of an ended poll, for its creator only.
+
+    The checks use the request's session; the rows are read by the
+    response itself, on a session of its own, while they are sent. The
+    request's database slot is kept until then, so exports count against
+    DB_MAX_CONCURRENCY like any other request.
+    """
+    poll = session.exec(
+        select(Poll.creator_email, Poll.end_time > datetime.now(timezone.utc))
+        .where(Poll.id == poll_id)
+    ).first()
+    if not poll:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Poll not found")
+
+    creator_email, running = poll
+    if creator_email != user.email:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to export this poll")
+
+    if running:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Poll has not ended yet")
+
+    return ReleasingStreamingResponse(
+        stream_rows(engine, query, format, settings.EXPORT_BATCH_SIZE),
+        release=slot.keep(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="poll-{poll_id}-{name}.{format.value}"'},
+    )
+
+
+@ router.get("/{poll_id}/export/votes", response_class=StreamingResponse)
+def export_poll_votes(poll_id: UUID, user: CurrentUser, session: SessionDep, slot: DBSlotDep,
+                      format: ExportFormat = ExportFormat.csv):
+    """Download the anonymized timeline of a poll's votes."""
+    return _export(session, slot, poll_id, user, vote_timeline_query(poll_id), "votes", format)
 
-    total_votes = sum([result.votes for result in results])
-    data = [
-        PollOptionResult(option_text=result.option_text, votes=result.votes)
-        for result in results
-    ]
 
-    return PollResult(data=data, total_votes=total_votes)
+@ router.get("/{poll_id}/export/results", response_class=StreamingResponse)
+def export_poll_results(poll_id: UUID, user: CurrentUser, session: SessionDep, slot: DBSlotDep,
+                        format: ExportFormat = ExportFormat.csv):
+    """Download the per-option result of a poll."""
+    return _export(session, slot, poll_id, user, result_query(poll_id), "results", format)
@@ -1,50 +1,77 @@
-from datetime import datetime, timezone
+import asyncio
+import queue
+
 from fastapi import APIRouter, HTTPException, status
-from sqlalchemy.exc import IntegrityError
 
-from core.security import hash_email
 from api.deps import SessionDep, CurrentUser
+from core.config import settings
 from models.common import Message
-from models.poll import Poll, PollOption
-from models.vote import Vote, VoteCreateRequest
+from models.vote import BallotCreateRequest, BallotItem, BallotResponse, VoteCreateRequest
+from services.vote_writer import vote_writer
+from services.voting import VoteResult, cast_ballot, cast_vote
 
 
 router = APIRouter()
 
 
-@router.post("/vote", response_model=Message)
-def vote(request: VoteCreateRequest, user: CurrentUser, session: SessionDep):
-    voter_email_hash = hash_email(user.email)
-    poll_option = session.get(PollOption, request.option_id)
-    if not poll_option:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="PollOption not found")
+VOTE_ERRORS = {
+    VoteResult.option_not_found: (status.HTTP_404_NOT_FOUND, "PollOption not found"),
+    VoteResult.forbidden: (status.HTTP_403_FORBIDDEN, "You are not authorized to vote in this poll"),
+    VoteResult.not_started: (status.HTTP_400_BAD_REQUEST, "Poll not started yet"),
+    VoteResult.ended: (status.HTTP_400_BAD_REQUEST, "Poll has ended"),
+    VoteResult.duplicate: (status.HTTP_400_BAD_REQUEST, "You have already voted in this poll"),
+}
 
-    poll = session.get(Poll, poll_option.poll_id)
-    if (poll.is_private and poll.creator_email != user.email
-            and not any(roll_range.start <= user.roll <= roll_range.end for roll_range in poll.roll_ranges)
-        ):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to vote in this poll")
-    if poll.start_time > datetime.now(timezone.utc):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Poll not started yet")
-    if poll.end_time < datetime.now(timezone.utc):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Poll has ended")
-
-    try:
-        vote = Vote(
-            option_id=request.option_id,
-            poll_id=poll.id,
-            voter_email_hash=voter_email_hash
-        )
-        session.add(vote)
+
+def _raise_for(result: VoteResult) -> None:
+    if result is not VoteResult.accepted:
+        status_code, detail = VOTE_ERRORS[result]
+        raise HTTPException(status_code=status_code, detail=detail)
+
+
+if settings.VOTE_WRITE_BEHIND:
+    @router.post("/vote", response_model=Message)
+    async def vote(request: VoteCreateRequest, user: CurrentUser):
+        try:
+            future = vote_writer.submit(request.option_id, user)
+        except queue.Full:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again shortly",
+                headers={"Retry-After": str(settings.DB_RETRY_AFTER)})
+        # Answered once the batch holding the vote is committed
+        _raise_for(await asyncio.wrap_future(future))
+
+        return Message(message="Voted successfully")
+else:
+    @router.post("/vote", response_model=Message)
+    def vote(request: VoteCreateRequest, user: CurrentUser, session: SessionDep):
+        result = cast_vote(session, request.option_id, user)
+        if result is not VoteResult.accepted:
+            session.rollback()
+        _raise_for(result)
         session.commit()
-        session.refresh(vote)
-    except IntegrityError:
-        session.rollback()
+
+        return Message(message="Voted successfully")
+
+
+@router.post("/ballot", response_model=BallotResponse)
+def vote_ballot(request: BallotCreateRequest, user: CurrentUser, session: SessionDep):
+    """Vote for several options, typically one per poll of an election, at once.
+
+    Every option gets its own outcome and the accepted votes are committed
+    together.
+    """
+    if len(request.option_ids) > settings.BALLOT_MAX_OPTIONS:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="You have already voted in this poll")
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A ballot can hold at most {settings.BALLOT_MAX_OPTIONS} options")
+    results = cast_ballot(session, request.option_ids, user)
+    session.commit()
 
-    return Message(message="Voted successfully")
\ No newline at end of file
+    return BallotResponse(
+        data=[BallotItem(option_id=option_id, result=result.value,
+                         detail=VOTE_ERRORS[result][1] if result in VOTE_ERRORS else None)
+              for option_id, result in zip(request.option_ids, results)],
+        accepted=results.count(VoteResult.accepted),
+    )
@@ -0,0 +1,80 @@
+"""Compare the sync (threadpool + psycopg2) and async (asyncpg) request paths.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.async_mode
+
+Each mode runs in its own interpreter because DB_ASYNC is read at import.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import API, client_for, load_app, measure, print_table, seed_polls
+
+
+async def run_worker(args) -> list[dict]:
+    app = load_app()
+    poll_ids = seed_polls(args.polls, prefix=f"async-{args.mode}")
+    results = []
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        # One option per poll, so every vote request hits a fresh (voter, poll) pair
+        options = {}
+        for poll_id in poll_ids:
+            response = await client.get(f"{API}/polls/{poll_id}/options",
+                                        headers={"X-Bench-Roll": "2300000"})
+            options[poll_id] = response.json()["data"][0]["id"] if response.status_code == 200 else None
+        public_options = [option for option in options.values() if option]
+
+        for concurrency in args.concurrency:
+            results.append(await measure(
+                "GET /polls/", lambda i: client.get(f"{API}/polls/", params={"limit": 20}),
+                concurrency, args.requests))
+            results.append(await measure(
+                "GET /polls/{poll_id}",
+                lambda i: client.get(f"{API}/polls/{poll_ids[i % len(poll_ids)]}"),
+                concurrency, args.requests))
+            # Voters from a roll range no seeded poll restricts, so every vote
+            # is allowed and none repeats
+            base = 2_300_000 + concurrency * args.requests
+            results.append(await measure(
+                "POST /votes/vote",
+                lambda i: client.post(f"{API}/votes/vote",
+                                      json={"option_id": public_options[i % len(public_options)]},
+                                      headers={"X-Bench-Roll": str(base + i // len(public_options))}),
+                concurrency, args.requests))
+    for result in results:
+        result["mode"] = args.mode
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--polls", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--mode", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_worker(args))))
+        return
+
+    results = []
+    for mode in ("sync", "async"):
+        env = {**os.environ, "DB_ASYNC": str(mode == "async")}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.async_mode", "--mode", mode,
+             "--requests", str(args.requests), "--polls", str(args.polls),
+             "--concurrency", *map(str, args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results.extend(json.loads(output.strip().splitlines()[-1]))
+    print_table(sorted(results, key=lambda r: (r["name"], r["concurrency"], r["mode"])))
+
+
+if __name__ == "__main__":
+    main()
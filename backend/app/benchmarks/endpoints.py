@@ -0,0 +1,418 @@
+"""Benchmark every route of the poll, vote and user APIs.
+
+Run from the app directory. Without DATABASE_URL a throwaway SQLite
+database is used:
+
+    python -m benchmarks.endpoints --concurrency 1 8 32 --output before.json
+    DATABASE_URL=postgresql://... python -m benchmarks.endpoints --baseline before.json
+
+Nothing outside the process is needed: tokens are signed with a local ES256
+key served as a fake JWKS (see benchmarks.fake_jwks), so every request goes
+through the real token check. Each route needs a scenario here or the
+script refuses to run; each scenario is tried once before it is timed, and
+if that raises or gets an error status the others still run but the exit
+status is 1. Routes that use things up (votes, deletes, new
+options) get fresh voters or polls for every request, made before timing.
+
+With --baseline, throughput and p95 are compared with an earlier --output
+file and the exit status is 1 if any got worse by more than --threshold.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from benchmarks.fake_jwks import FakeJWKS
+from benchmarks.harness import API, bench_email, client_for, load_app, measure, print_table, seed_polls
+from benchmarks.live_fanout import StreamClient
+
+# Reads, creates and owns polls; within the rolls of some seeded private polls
+USER = 1904001
+# Fresh voters are numbered from here
+VOTERS = 3_000_000
+ENDED_VOTERS = 2_900_000
+BALLOT_SIZE = 5
+IMPORT_SIZE = 10
+ROUTERS = ("/polls", "/votes", "/users")
+
+
+class Context:
+    """What the scenarios share: the app, a client, tokens and seeded polls."""
+
+    def __init__(self, app, client, jwks: FakeJWKS):
+        self.app = app
+        self.client = client
+        self.jwks = jwks
+        self.public_ids: list = []
+        self.public_options: list = []
+        self.ended_id = None
+        # Whatever the current scenario's `prepare` made, one item per request
+        self.prepared: list = []
+        self._headers: dict[int, dict] = {}
+        self._next_voter = VOTERS
+
+    def auth(self, roll: int = USER) -> dict:
+        headers = self._headers.get(roll)
+        if headers is None:
+            headers = self._headers[roll] = {"Authorization": f"Bearer {self.jwks.token(roll)}"}
+        return headers
+
+    def fresh_voters(self, count: int) -> list[dict]:
+        """Headers of voters who have not voted yet; their tokens are verified on first use."""
+        rolls = range(self._next_voter, self._next_voter + count)
+        self._next_voter += count
+        return [{"Authorization": f"Bearer {self.jwks.token(roll)}"} for roll in rolls]
+
+
+@dataclass
+class Scenario:
+    method: str
+    route: str
+    send: Callable[[Context, int], Awaitable]
+    # Makes what `count` requests use up, before they are timed
+    prepare: Callable[[Context, int], list] | None = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.route}"
+
+
+SCENARIOS: list[Scenario] = []
+
+
+def scenario(method: str, route: str, prepare: Callable[[Context, int], list] | None = None):
+    def register(send):
+        SCENARIOS.append(Scenario(method, route, send, prepare))
+        return send
+    return register
+
+
+def create_polls(count: int, **fields) -> list:
+    """Create ongoing polls owned by USER and return their ids."""
+    from sqlmodel import Session
+
+    from core.db import engine
+    from services.poll_import import import_polls
+
+    items = [{"title": f"endpoints poll {i}", "description": f"endpoints description {i}",
+              "option_texts": ["yes", "no"], **fields} for i in range(count)]
+    with Session(engine) as session:
+        results = import_polls(session, bench_email(USER), items)
+    if any(result.error for result in results):
+        raise RuntimeError(next(result.error for result in results if result.error))
+    return [result.poll_id for result in results]
+
+
+def seed(ctx: Context, polls: int, ended_votes: int) -> None:
+    """Seed the feeds, and a poll of USER's that has ended with `ended_votes` votes."""
+    from sqlmodel import Session, select
+
+    from core.db import engine
+    from models.common import AuthUser
+    from models.poll import Poll, PollOption
+    from services.voting import VoteResult, cast_vote
+
+    poll_ids = seed_polls(polls, prefix="endpoints")
+    with Session(engine) as session:
+        rows = session.exec(
+            select(PollOption.poll_id, PollOption.id).join(Poll)
+            .where(PollOption.poll_id.in_(poll_ids), Poll.is_private == False)  # noqa: E712
+            .order_by(PollOption.poll_id, PollOption.option_text)
+        ).all()
+    options = {}
+    for poll_id, option_id in rows:
+        options.setdefault(poll_id, option_id)
+    ctx.public_ids = list(options)
+    ctx.public_options = list(options.values())
+
+    now = datetime.now(timezone.utc)
+    ctx.ended_id, = create_polls(1, option_texts=["a", "b", "c", "d"],
+                                 start_time=now - timedelta(days=2), end_time=now - timedelta(days=1))
+    with Session(engine) as session:
+        option_ids = session.exec(
+            select(PollOption.id).where(PollOption.poll_id == ctx.ended_id)).all()
+        for i in range(ended_votes):
+            roll = ENDED_VOTERS + i
+            voter = AuthUser(email=bench_email(roll), full_name="Bench Voter", roll=roll)
+            result = cast_vote(session, option_ids[i % len(option_ids)], voter,
+                               now=now - timedelta(days=1, hours=12))
+            if result is not VoteResult.accepted:
+                raise RuntimeError(f"seeding the ended poll: {result.value}")
+        session.commit()
+
+
+FEEDS = ("/polls/", "/polls/public", "/polls/my-polls", "/polls/popular-polls",
+         "/polls/upcoming-polls", "/polls/ongoing-polls", "/polls/ended-polls")
+
+for feed in FEEDS:
+    @scenario("GET", feed)
+    async def get_feed(ctx: Context, i: int, feed=feed):
+        return await ctx.client.get(f"{API}{feed}", params={"limit": 20}, headers=ctx.auth())
+
+
+@scenario("GET", "/polls/batch")
+async def get_batch(ctx: Context, i: int):
+    ids = [str(poll_id) for poll_id in ctx.public_ids[:20]]
+    return await ctx.client.get(f"{API}/polls/batch", params={"ids": ids}, headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}")
+async def get_poll(ctx: Context, i: int):
+    poll_id = ctx.public_ids[i % len(ctx.public_ids)]
+    return await ctx.client.get(f"{API}/polls/{poll_id}", headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}/options")
+async def get_options(ctx: Context, i: int):
+    poll_id = ctx.public_ids[i % len(ctx.public_ids)]
+    return await ctx.client.get(f"{API}/polls/{poll_id}/options", headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}/roll-ranges")
+async def get_roll_ranges(ctx: Context, i: int):
+    poll_id = ctx.public_ids[i % len(ctx.public_ids)]
+    return await ctx.client.get(f"{API}/polls/{poll_id}/roll-ranges", headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}/result")
+async def get_result(ctx: Context, i: int):
+    return await ctx.client.get(f"{API}/polls/{ctx.ended_id}/result", headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}/export/votes")
+async def export_votes(ctx: Context, i: int):
+    return await ctx.client.get(f"{API}/polls/{ctx.ended_id}/export/votes", headers=ctx.auth())
+
+
+@scenario("GET", "/polls/{poll_id}/export/results")
+async def export_results(ctx: Context, i: int):
+    return await ctx.client.get(f"{API}/polls/{ctx.ended_id}/export/results", headers=ctx.auth())
+
+
+async def first_event(ctx: Context, path: str, query: dict):
+    """Open a tally stream, wait for its first event and hang up; streams never end."""
+    stream = StreamClient(ctx.app, f"{API}{path}", query, USER)
+    stream.scope["headers"].append((b"authorization", ctx.auth()["Authorization"].encode()))
+    stream.open()
+    while not stream.totals and stream.status in (None, 200):
+        stream.changed.clear()
+        await stream.changed.wait()
+    await stream.close()
+    return SimpleNamespace(status_code=stream.status)
+
+
+@scenario("GET", "/polls/live")
+async def stream_tallies(ctx: Context, i: int):
+    return await first_event(ctx, "/polls/live", {"poll_ids": [str(p) for p in ctx.public_ids[:10]]})
+
+
+@scenario("GET", "/polls/{poll_id}/live")
+async def stream_tally(ctx: Context, i: int):
+    return await first_event(ctx, f"/polls/{ctx.public_ids[i % len(ctx.public_ids)]}/live", {})
+
+
+@scenario("POST", "/polls/create")
+async def create(ctx: Context, i: int):
+    return await ctx.client.post(f"{API}/polls/create", headers=ctx.auth(), json={
+        "title": f"created poll {i}", "description": "created by the endpoint benchmark"})
+
+
+@scenario("POST", "/polls/full-create")
+async def full_create(ctx: Context, i: int):
+    return await ctx.client.post(f"{API}/polls/full-create", headers=ctx.auth(), json={
+        "request": {"title": f"full poll {i}", "description": "created by the endpoint benchmark",
+                    "is_private": True},
+        "options_request": {"option_texts": ["one", "two", "three", "four"]},
+        "roll_ranges_request": {"roll_ranges": [[USER, USER + 59]]},
+    })
+
+
+def _import_items(i: int) -> list[dict]:
+    return [{"title": f"imported poll {i}.{j}", "description": "imported by the endpoint benchmark",
+             "option_texts": ["one", "two", "three"]} for j in range(IMPORT_SIZE)]
+
+
+@scenario("POST", "/polls/import")
+async def import_json(ctx: Context, i: int):
+    return await ctx.client.post(f"{API}/polls/import", headers=ctx.auth(),
+                                 json={"polls": _import_items(i)})
+
+
+@scenario("POST", "/polls/import/csv")
+async def import_csv(ctx: Context, i: int):
+    rows = ["title,description,option_texts"] + [
+        f"{item['title']},{item['description']},{'|'.join(item['option_texts'])}"
+        for item in _import_items(i)]
+    return await ctx.client.post(f"{API}/polls/import/csv", content="\n".join(rows),
+                                 headers={**ctx.auth(), "Content-Type": "text/csv"})
+
+
+@scenario("DELETE", "/polls/{poll_id}", prepare=lambda ctx, count: create_polls(count))
+async def delete(ctx: Context, i: int):
+    return await ctx.client.delete(f"{API}/polls/{ctx.prepared[i]}", headers=ctx.auth())
+
+
+@scenario("POST", "/polls/{poll_id}/options", prepare=lambda ctx, count: create_polls(count))
+async def add_options(ctx: Context, i: int):
+    return await ctx.client.post(f"{API}/polls/{ctx.prepared[i]}/options", headers=ctx.auth(),
+                                 json={"option_texts": ["maybe", "later"]})
+
+
+@scenario("POST", "/polls/{poll_id}/roll-ranges",
+          prepare=lambda ctx, count: create_polls(count, is_private=True, roll_ranges=[(USER, USER + 59)]))
+async def add_roll_ranges(ctx: Context, i: int):
+    return await ctx.client.post(f"{API}/polls/{ctx.prepared[i]}/roll-ranges", headers=ctx.auth(),
+                                 json={"roll_ranges": [[USER + 100, USER + 199]]})
+
+
+@scenario("POST", "/votes/vote", prepare=lambda ctx, count: ctx.fresh_voters(count))
+async def vote(ctx: Context, i: int):
+    option_id = ctx.public_options[i % len(ctx.public_options)]
+    return await ctx.client.post(f"{API}/votes/vote", headers=ctx.prepared[i],
+                                 json={"option_id": str(option_id)})
+
+
+@scenario("POST", "/votes/ballot", prepare=lambda ctx, count: ctx.fresh_voters(count))
+async def ballot(ctx: Context, i: int):
+    options = ctx.public_options
+    option_ids = [str(options[(i + j) % len(options)]) for j in range(BALLOT_SIZE)]
+    return await ctx.client.post(f"{API}/votes/ballot", headers=ctx.prepared[i],
+                                 json={"option_ids": option_ids})
+
+
+@scenario("GET", "/users/current")
+async def current_user(ctx: Context, i: int):
+    return await ctx.client.get(f"{API}/users/current", headers=ctx.auth())
+
+
+def uncovered_routes(app) -> list[str]:
+    """Routes of the poll, vote and user APIs that no scenario exercises."""
+    covered = {(s.method, s.route) for s in SCENARIOS}
+    missing = []
+    for route in app.routes:
+        path = getattr(route, "path", "")
+        if not path.startswith(tuple(API + prefix for prefix in ROUTERS)):
+            continue
+        for method in sorted(getattr(route, "methods", ()) - {"HEAD"}):
+            if (method, path[len(API):]) not in covered:
+                missing.append(f"{method} {path[len(API):]}")
+    return missing
+
+
+async def run(args, jwks: FakeJWKS) -> tuple[list[dict], list[str]]:
+    """Time every scenario; returns the results and how the failed scenarios failed."""
+    from core.config import settings
+    from core.db import engine
+
+    app = load_app(bench_auth=False)
+    missing = uncovered_routes(app)
+    if missing:
+        sys.exit(f"No scenario for: {', '.join(missing)}")
+
+    database = engine.dialect.name + ("+async" if settings.DB_ASYNC else "")
+    results, failures = [], []
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        ctx = Context(app, client, jwks)
+        seed(ctx, args.polls, args.ended_votes)
+        for s in SCENARIOS:
+            if args.only and not any(part in s.name for part in args.only):
+                continue
+
+            ctx.prepared = s.prepare(ctx, 1) if s.prepare else []
+            try:
+                response = await s.send(ctx, 0)
+            except Exception as e:
+                failures.append(f"{s.name}: {type(e).__name__}: {e}")
+                print(f"FAILED {failures[-1]}", file=sys.stderr)
+                continue
+            if response.status_code >= 400:
+                failures.append(f"{s.name}: answered {response.status_code}")
+                print(f"FAILED {failures[-1]}", file=sys.stderr)
+                continue
+
+            for concurrency in args.concurrency:
+                ctx.prepared = s.prepare(ctx, args.requests) if s.prepare else []
+                result = await measure(s.name, lambda i, s=s: s.send(ctx, i),
+                                       concurrency, args.requests)
+                result["database"] = database
+                results.append(result)
+                print(f"{s.name} at {concurrency}: {result['throughput']} req/s", file=sys.stderr)
+    return results, failures
+
+
+def compare(results: list[dict], baseline: list[dict], threshold: float) -> int:
+    """Print how each result moved against the baseline and count the regressions."""
+    earlier = {(result["name"], result["concurrency"]): result for result in baseline}
+    regressions = 0
+    print(f"\n{'endpoint':<36} {'conc':>5} {'req/s':>9} {'change':>8} {'p95 ms':>9} {'change':>8}")
+    for result in results:
+        before = earlier.get((result["name"], result["concurrency"]))
+        if before is None or not before["throughput"] or not before["p95_ms"]:
+            continue
+        throughput = result["throughput"] / before["throughput"] - 1
+        p95 = result["p95_ms"] / before["p95_ms"] - 1
+        regressed = throughput < -threshold or p95 > threshold
+        regressions += regressed
+        print(f"{result['name']:<36} {result['concurrency']:>5} {result['throughput']:>9} "
+              f"{throughput:>+8.1%} {result['p95_ms']:>9} {p95:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--ended-votes", type=int, default=1000)
+    # Only run scenarios whose name contains one of these, e.g. "/votes"
+    parser.add_argument("--only", nargs="+")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results in this JSON file")
+    # Relative change in throughput or p95 that counts as a regression
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # Both have to be in place before the app's settings are first read
+    jwks = FakeJWKS().start()
+    os.environ["SUPABASE_URL"] = jwks.url
+    os.environ.setdefault("PROJECT_NAME", "cavs-bench")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="cavs-bench-"), "bench.sqlite")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    try:
+        results, failures = asyncio.run(run(args, jwks))
+    finally:
+        jwks.stop()
+
+    print()
+    print_table(results, label="database")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "database": results[0]["database"] if results else None,
+                "requests": args.requests,
+                "results": results,
+            }, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if results and baseline.get("database") != results[0]["database"]:
+            print(f"\nThe baseline ran on {baseline.get('database')}, not {results[0]['database']}")
+        if compare(results, baseline["results"], args.threshold):
+            sys.exit(1)
+    if failures:
+        sys.exit("\nScenarios that failed:\n" + "\n".join(f"  {failure}" for failure in failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""A local stand-in for Supabase's JWKS endpoint and the tokens it vouches for.
+
+`core.security` builds its JWKS client from SUPABASE_URL at import, so the
+server has to be started and SUPABASE_URL pointed at it before the app is
+imported:
+
+    jwks = FakeJWKS().start()
+    os.environ["SUPABASE_URL"] = jwks.url
+    ...
+    headers = {"Authorization": f"Bearer {jwks.token(1904001)}"}
+
+Requests then go through the real `get_current_user`: a JWKS lookup by
+`kid`, an ES256 signature check and the verified-token cache.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt.algorithms import ECAlgorithm
+
+JWKS_PATH = "/auth/v1/.well-known/jwks.json"
+
+
+class FakeJWKS:
+    """An ES256 keypair whose public half is served as a JWKS on localhost."""
+
+    def __init__(self, audience: str = "authenticated"):
+        self.audience = audience
+        self.kid = uuid.uuid4().hex
+        self._key = ec.generate_private_key(ec.SECP256R1())
+        jwk = ECAlgorithm.to_jwk(self._key.public_key(), as_dict=True)
+        self._body = json.dumps(
+            {"keys": [{**jwk, "kid": self.kid, "alg": "ES256", "use": "sig"}]}).encode()
+        self._server: ThreadingHTTPServer | None = None
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        """The base URL to use as SUPABASE_URL."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeJWKS":
+        jwks = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != JWKS_PATH:
+                    self.send_error(404)
+                    return
+                jwks.requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(jwks._body)))
+                self.end_headers()
+                self.wfile.write(jwks._body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, name="fake-jwks", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def token(self, roll: int, ttl: int = 3600, full_name: str = "Bench User") -> str:
+        """A signed access token like Supabase issues for the student with `roll`."""
+        now = int(time.time())
+        payload = {
+            "sub": str(uuid.uuid5(uuid.NAMESPACE_OID, str(roll))),
+            "aud": self.audience,
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + ttl,
+            "email": f"u{roll}@student.cuet.ac.bd",
+            "user_metadata": {"full_name": full_name,
+                              "avatar_url": f"https://bench.invalid/avatars/{roll}.png"},
+        }
+        return jwt.encode(payload, self._key, algorithm="ES256", headers={"kid": self.kid})
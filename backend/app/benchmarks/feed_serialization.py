@@ -0,0 +1,74 @@
+"""Time the orjson poll responses against the pydantic ones.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.feed_serialization
+
+The two serializers are timed on the same loaded page, without the query,
+since that is the only part the mode changes. That both render the same
+bytes is checked by tests/test_fast_json.py.
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from benchmarks.harness import API, load_app, percentile, seed_polls
+
+
+def time_serializers(app, limit: int, rounds: int) -> None:
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from sqlalchemy.orm import subqueryload
+    from sqlmodel import Session, select
+
+    from api.responses import ORJSONResponse
+    from api.routes.poll import _poll_row, _serialize_poll_public
+    from core.db import engine
+    from models.poll import Poll, PollsResponse
+
+    route = next(route for route in app.routes if getattr(route, "path", None) == f"{API}/polls/")
+
+    with Session(engine) as session:
+        polls = session.exec(select(Poll).options(
+            subqueryload(Poll.options), subqueryload(Poll.roll_ranges)).limit(limit)).all()
+
+        def pydantic_body() -> bytes:
+            # What FastAPI does with a returned PollsResponse: validate it
+            # against the response model again, dump it, then json.dumps
+            data = [_serialize_poll_public(poll, poll.total_votes, None) for poll in polls]
+            content = asyncio.run(serialize_response(
+                field=route.response_field, is_coroutine=False,
+                response_content=PollsResponse(data=data, count=len(polls), next_cursor=None)))
+            return JSONResponse(content).body
+
+        def orjson_body() -> bytes:
+            data = [_poll_row(poll, poll.total_votes, None) for poll in polls]
+            return ORJSONResponse({"data": data, "count": len(polls), "next_cursor": None}).body
+
+        for name, render in (("pydantic", pydantic_body), ("orjson", orjson_body)):
+            timings = []
+            for _ in range(rounds):
+                started = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            print(f"{name:<10} {len(polls)} polls: p50 {percentile(timings, 50) * 1000:.2f} ms, "
+                  f"p95 {percentile(timings, 95) * 1000:.2f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    app = load_app()
+    seed_polls(args.polls, prefix="serialization")
+    time_serializers(app, args.limit, args.rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
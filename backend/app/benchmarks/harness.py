@@ -0,0 +1,134 @@
+"""Helpers shared by the benchmark scripts.
+
+The app is imported in-process and driven through httpx's ASGI transport,
+so the environment (DATABASE_URL, DB_ASYNC, ...) has to be set before
+`load_app` is called. Unless told otherwise, requests authenticate as the
+roll in the `X-Bench-Roll` header instead of a Supabase token.
+"""
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+API = "/api/v1"
+
+
+def bench_email(roll: int) -> str:
+    return f"u{roll}@student.cuet.ac.bd"
+
+
+def load_app(bench_auth: bool = True):
+    """Import the app, with authentication replaced by the X-Bench-Roll header if `bench_auth`."""
+    from fastapi import Request
+
+    from api import deps
+    from core.db import engine, init_db
+    from main import app
+    from models.common import AuthUser
+
+    if engine.dialect.name == "sqlite":
+        init_db()
+    if not bench_auth:
+        return app
+
+    def bench_user(request: Request) -> AuthUser:
+        roll = int(request.headers.get("X-Bench-Roll", "1904001"))
+        return AuthUser(email=bench_email(roll), full_name="Bench User", roll=roll)
+
+    app.dependency_overrides[deps.get_current_user] = bench_user
+    return app
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app),
+                             base_url="http://bench", timeout=60)
+
+
+def seed_polls(count: int, options: int = 4, private_share: float = 0.3, prefix: str = "bench") -> list:
+    """Create ongoing polls (some private to roll batches) and return their ids."""
+    from sqlmodel import Session
+
+    from core.db import engine
+    from models.poll import Poll, PollOption, RollRange
+    from services.eligibility import refresh_allowed_rolls
+
+    now = datetime.now(timezone.utc)
+    poll_ids = []
+    with Session(engine) as session:
+        for i in range(count):
+            is_private = random.random() < private_share
+            poll = Poll(
+                title=f"{prefix} poll {i}",
+                description=f"{prefix} description {i}",
+                is_private=is_private,
+                creator_email=bench_email(1900000 + i % 500),
+                start_time=now - timedelta(hours=1),
+                end_time=now + timedelta(days=1),
+            )
+            session.add(poll)
+            session.flush()
+            session.add_all([PollOption(poll_id=poll.id, option_text=f"option {j}")
+                             for j in range(options)])
+            if is_private:
+                batch = random.choice([19, 20, 21, 22])
+                session.add(RollRange(poll_id=poll.id, start=batch * 10 ** 5,
+                                      end=batch * 10 ** 5 + 99_999))
+                session.flush()
+                refresh_allowed_rolls(session, poll.id)
+            poll_ids.append(poll.id)
+        session.commit()
+    return poll_ids
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(q / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+async def measure(name: str, send: Callable[[int], Awaitable[httpx.Response]],
+                  concurrency: int, total: int) -> dict:
+    """Issue `total` requests with `concurrency` in flight and summarize latencies.
+
+    `send(i)` performs the i-th request; any 5xx counts as an error.
+    """
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await send(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "name": name,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def print_table(results: list[dict], label: str = "mode") -> None:
+    print(f"{label:<10} {'endpoint':<36} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for result in results:
+        print(f"{result.get(label, ''):<10} {result['name']:<36} {result['concurrency']:>5} "
+              f"{result['throughput']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9} {result['errors']:>7}")
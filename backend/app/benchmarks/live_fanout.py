@@ -0,0 +1,168 @@
+"""Simulate thousands of clients streaming live tallies while votes come in.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.live_fanout --subscribers 5000
+
+Subscribers are real requests to the streaming endpoints, driven straight
+through the ASGI interface (httpx's ASGI transport buffers whole bodies and
+cannot stream). Votes arrive in bursts; after each burst the script waits
+until every subscriber has seen the new totals and records how long that
+took, then reports those lags next to the number of tally queries the
+database served.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from benchmarks.harness import API, client_for, load_app, percentile, seed_polls
+
+
+class StreamClient:
+    """One server-sent events request kept open against the ASGI app."""
+
+    def __init__(self, app, path: str, query: dict, roll: int):
+        self.app = app
+        self.scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": urlencode(query, doseq=True).encode(), "root_path": "",
+            "headers": [(b"host", b"bench"), (b"x-bench-roll", str(roll).encode())],
+            "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        }
+        self.totals: dict[str, int] = {}
+        self.changed = asyncio.Event()
+        self.status: int | None = None
+        self._buffer = ""
+        self._requested = False
+        self._disconnect = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def _receive(self):
+        if not self._requested:
+            self._requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self._disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def _send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.changed.set()
+            return
+        self._buffer += message.get("body", b"").decode()
+        *events, self._buffer = self._buffer.split("\n\n")
+        for event in events:
+            for line in event.splitlines():
+                if line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    self.totals[data["poll_id"]] = data["total_votes"]
+                    self.changed.set()
+
+    def open(self) -> None:
+        self.status = None
+        self._buffer = ""
+        self._requested = False
+        self._task = asyncio.create_task(self.app(self.scope, self._receive, self._send))
+
+    async def close(self) -> None:
+        self._disconnect.set()
+        await self._task
+
+    async def wait_for(self, expected: dict[str, int]) -> None:
+        while any(self.totals.get(poll_id, -1) < total for poll_id, total in expected.items()):
+            self.changed.clear()
+            await self.changed.wait()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=10)
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--votes-per-burst", type=int, default=50)
+    # Every this-many-th subscriber follows all polls through /polls/live
+    parser.add_argument("--multiplex-every", type=int, default=10)
+    parser.add_argument("--connect-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    from services.live import refresh_queries
+
+    app = load_app()
+    poll_ids = [str(poll_id) for poll_id in seed_polls(args.polls, private_share=0, prefix="live")]
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        options = {}
+        for poll_id in poll_ids:
+            response = await client.get(f"{API}/polls/{poll_id}/options")
+            options[poll_id] = response.json()["data"][0]["id"]
+
+        # Clients connect in waves rather than all in the same instant
+        subscribers = []
+        started = time.perf_counter()
+        for i in range(args.subscribers):
+            if args.multiplex_every and i % args.multiplex_every == 0:
+                stream = StreamClient(app, f"{API}/polls/live", {"poll_ids": poll_ids}, 1904001)
+            else:
+                poll_id = poll_ids[i % len(poll_ids)]
+                stream = StreamClient(app, f"{API}/polls/{poll_id}/live", {}, 1904001)
+            stream.open()
+            subscribers.append(stream)
+            if len(subscribers) % args.connect_batch == 0:
+                await asyncio.gather(*(_first_event(s) for s in subscribers[-args.connect_batch:]))
+        await asyncio.gather(*(_first_event(s) for s in subscribers))
+        print(f"{len(subscribers)} subscribers connected in {time.perf_counter() - started:.2f}s")
+
+        queries_before = refresh_queries.value
+        expected = {poll_id: 0 for poll_id in poll_ids}
+        lags = []
+        voter = 2_600_000
+        for _ in range(args.bursts):
+            sends = []
+            for j in range(args.votes_per_burst):
+                poll_id = poll_ids[j % len(poll_ids)]
+                expected[poll_id] += 1
+                sends.append(client.post(f"{API}/votes/vote", json={"option_id": options[poll_id]},
+                                         headers={"X-Bench-Roll": str(voter)}))
+                voter += 1
+            await asyncio.gather(*sends)
+            acknowledged = time.perf_counter()
+
+            async def delivered(stream: StreamClient):
+                wanted = {p: expected[p] for p in stream.totals}
+                await stream.wait_for(wanted)
+                lags.append(time.perf_counter() - acknowledged)
+
+            await asyncio.wait_for(asyncio.gather(*(delivered(s) for s in subscribers)), 60)
+
+        queries = refresh_queries.value - queries_before
+        for stream in subscribers:
+            await stream.close()
+
+    lags.sort()
+    votes = args.bursts * args.votes_per_burst
+    print(f"votes cast:           {votes}")
+    print(f"subscribers:          {args.subscribers}")
+    print(f"tally refresh queries: {queries:.0f}")
+    print(f"delivery lag p50/p95/p99: {percentile(lags, 50) * 1000:.1f} / "
+          f"{percentile(lags, 95) * 1000:.1f} / {percentile(lags, 99) * 1000:.1f} ms")
+
+
+async def _first_event(stream: StreamClient) -> None:
+    while not stream.totals:
+        if stream.status == 503:
+            # Shed while every database slot was busy; reconnect like an
+            # EventSource would
+            await stream._task
+            await asyncio.sleep(random.uniform(0, 1))
+            stream.open()
+        elif stream.status not in (None, 200):
+            raise RuntimeError(f"stream answered {stream.status}")
+        stream.changed.clear()
+        await stream.changed.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
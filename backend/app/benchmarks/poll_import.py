@@ -0,0 +1,69 @@
+"""Compare creating polls one /full-create call at a time with one /import call.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.poll_import --polls 10 100 500
+
+Both paths create the same polls (half of them private with two roll
+ranges, four options each) for the same user, sequentially like a
+client script would.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.harness import API, client_for, load_app
+
+
+def payload(i: int, prefix: str) -> dict:
+    is_private = i % 2 == 0
+    return {
+        "title": f"{prefix} position {i}",
+        "description": f"{prefix} description {i}",
+        "is_private": is_private,
+        "option_texts": [f"candidate {j}" for j in range(4)],
+        "roll_ranges": [[1904001, 1904060], [1904101, 1904160]] if is_private else [],
+    }
+
+
+async def sequential(client, polls: list[dict]) -> int:
+    failed = 0
+    for poll in polls:
+        response = await client.post(f"{API}/polls/full-create", json={
+            "request": {key: poll[key] for key in ("title", "description", "is_private")},
+            "options_request": {"option_texts": poll["option_texts"]},
+            "roll_ranges_request": {"roll_ranges": poll["roll_ranges"]},
+        })
+        failed += response.status_code != 200
+    return failed
+
+
+async def bulk(client, polls: list[dict]) -> int:
+    response = await client.post(f"{API}/polls/import", json={"polls": polls})
+    response.raise_for_status()
+    return len(polls) - response.json()["created"]
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    from core.db import count_queries
+
+    app = load_app()
+    print(f"{'polls':>6} {'path':<12} {'seconds':>9} {'polls/s':>9} {'queries':>8} {'failed':>7}")
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        for count in args.polls:
+            for name, create in (("sequential", sequential), ("import", bulk)):
+                polls = [payload(i, f"import-bench-{name}") for i in range(count)]
+                started = time.perf_counter()
+                with count_queries() as queries:
+                    failed = await create(client, polls)
+                elapsed = time.perf_counter() - started
+                print(f"{count:>6} {name:<12} {elapsed:>9.3f} {count / elapsed:>9.1f} "
+                      f"{queries.count:>8} {failed:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,242 @@
+"""Capture the plans of the feed, poll, result and vote queries and check them for regressions.
+
+Run from the app directory against a Postgres database seeded at scale
+(see benchmarks.seed_scale):
+
+    DATABASE_URL=postgresql://... python -m benchmarks.query_plans --output plans.json
+    DATABASE_URL=postgresql://... python -m benchmarks.query_plans --baseline plans.json
+
+Every scenario is a real request through the app: each page variant of
+every feed `_get_polls` serves, `get_poll`, `get_poll_result` and `vote`
+(accepted and refused). The statements they run are recorded with their
+parameters, and each distinct statement shape is run again under
+EXPLAIN (ANALYZE, BUFFERS) in a transaction that is rolled back. The
+requests themselves do commit, so the vote scenarios leave a vote behind.
+
+Shapes are matched to the baseline by their SQL. One fails when its plan
+gains a sequential scan of a table with at least --seq-scan-rows rows,
+or when its estimated cost grows by more than --cost-threshold; the exit
+status is then 1.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from benchmarks.harness import API, client_for, load_app
+
+FEEDS = ("/polls/", "/polls/public", "/polls/my-polls", "/polls/popular-polls",
+         "/polls/upcoming-polls", "/polls/ongoing-polls", "/polls/ended-polls")
+TABLES = ("poll", "polloption", "rollrange", "vote", "pollfinalresult")
+VOTER = 9_990_001
+
+# Statements run by the current scenario, while one is running
+_captured: list | None = None
+
+
+def _capture(conn, cursor, statement, parameters, context, executemany):
+    if _captured is not None and not executemany:
+        _captured.append((statement, parameters))
+
+
+def shape_of(statement: str) -> str:
+    """The statement with its parameters and expanded IN lists folded."""
+    sql = " ".join(statement.split())
+    sql = re.sub(r"%\(\w+\)s", "?", sql)
+    return re.sub(r"\?(?:, \?)+", "?, ...", sql)
+
+
+def _plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child)
+
+
+def explain(connection, statement: str, parameters) -> dict:
+    """EXPLAIN ANALYZE a statement without keeping anything it writes.
+
+    A write that cannot run again, such as an insert the request already
+    committed, is only planned.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+        plan, = cursor.fetchone()[0]
+    except connection.dbapi_connection.IntegrityError:
+        connection.rollback()
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan, = cursor.fetchone()[0]
+    finally:
+        connection.rollback()
+    top = plan["Plan"]
+    return {
+        "total_cost": top["Total Cost"],
+        "execution_ms": round(plan["Execution Time"], 3) if "Execution Time" in plan else None,
+        "rows": top.get("Actual Rows"),
+        "shared_hit": top.get("Shared Hit Blocks", 0),
+        "shared_read": top.get("Shared Read Blocks", 0),
+        "seq_scans": sorted({node["Relation Name"] for node in _plan_nodes(top)
+                             if node["Node Type"] == "Seq Scan"}),
+        "plan": plan,
+    }
+
+
+async def run_scenarios(app, user: int, hot_poll, ended_poll, option_id) -> list[tuple[str, list]]:
+    """Send every scenario's requests and return the statements each ran."""
+    headers = {"X-Bench-Roll": str(user)}
+    scenarios = []
+
+    async with client_for(app) as client:
+        async def record(name: str, method: str, path: str, **kwargs):
+            global _captured
+            _captured = []
+            try:
+                response = await client.request(method, f"{API}{path}", **kwargs)
+            finally:
+                statements, _captured = _captured, None
+            if response.status_code >= 500:
+                raise RuntimeError(f"{name} answered {response.status_code}")
+            scenarios.append((name, statements))
+            return response
+
+        for feed in FEEDS:
+            first = await record(f"GET {feed}", "GET", feed, params={"limit": 20}, headers=headers)
+            body = first.json()
+            if body.get("next_cursor"):
+                await record(f"GET {feed} next page", "GET", feed, headers=headers,
+                             params={"limit": 20, "cursor": body["next_cursor"]})
+            await record(f"GET {feed} revalidated", "GET", feed, params={"limit": 20},
+                         headers={**headers, "If-None-Match": first.headers["ETag"]})
+            await record(f"GET {feed} sparse", "GET", feed, headers=headers,
+                         params={"limit": 20, "fields": "title,options,selected_option"})
+            await record(f"GET {feed} search", "GET", feed, headers=headers,
+                         params={"limit": 20, "search": "election"})
+            await record(f"GET {feed} ranked search", "GET", feed, headers=headers,
+                         params={"limit": 20, "search": "election", "search_mode": "ranked"})
+            if feed == "/polls/":
+                ids = [poll["id"] for poll in body["data"]]
+
+        await record("GET /polls/batch", "GET", "/polls/batch", params={"ids": ids}, headers=headers)
+        poll = await record("GET /polls/{poll_id}", "GET", f"/polls/{hot_poll}", headers=headers)
+        await record("GET /polls/{poll_id} revalidated", "GET", f"/polls/{hot_poll}",
+                     headers={**headers, "If-None-Match": poll.headers["ETag"]})
+        await record("GET /polls/{poll_id}/result", "GET", f"/polls/{ended_poll}/result", headers=headers)
+        for name in ("POST /votes/vote", "POST /votes/vote refused"):
+            await record(name, "POST", "/votes/vote", json={"option_id": str(option_id)},
+                         headers={"X-Bench-Roll": str(VOTER)})
+    return scenarios
+
+
+def pick_fixtures(session):
+    """A roll that can see private polls, the busiest ongoing public and ended polls and an option."""
+    from sqlmodel import func, select
+
+    from models.poll import Poll, PollOption, RollRange
+
+    now = datetime.now(timezone.utc)
+    user = session.exec(select(RollRange.start).order_by(RollRange.id).limit(1)).first() or 1904001
+    hot_poll = session.exec(
+        select(Poll.id).where(Poll.is_private.is_(False), Poll.start_time <= now, Poll.end_time >= now)
+        .order_by(Poll.total_votes.desc()).limit(1)).first()
+    ended_poll = session.exec(
+        select(Poll.id).where(Poll.end_time < now).order_by(Poll.total_votes.desc()).limit(1)).first()
+    if hot_poll is None or ended_poll is None:
+        raise SystemExit("Seed the database first, e.g. with benchmarks.seed_scale")
+    option_id = session.exec(
+        select(PollOption.id).where(PollOption.poll_id == hot_poll).order_by(func.random()).limit(1)).first()
+    return user, hot_poll, ended_poll, option_id
+
+
+def compare(shapes: dict, baseline: dict, cost_threshold: float, large_tables: set[str]) -> list[str]:
+    """Describe every shape that got worse than in the baseline."""
+    failures = []
+    for shape_id, shape in shapes.items():
+        before = baseline.get(shape_id)
+        if before is None:
+            print(f"new shape {shape_id} ({shape['scenario']})")
+            continue
+        new_scans = (set(shape["seq_scans"]) - set(before["seq_scans"])) & large_tables
+        if new_scans:
+            failures.append(f"{shape_id} ({shape['scenario']}): sequential scan of {', '.join(sorted(new_scans))}")
+        if before["total_cost"] and shape["total_cost"] > before["total_cost"] * (1 + cost_threshold):
+            failures.append(f"{shape_id} ({shape['scenario']}): cost {before['total_cost']} -> {shape['total_cost']}")
+    for shape_id in baseline.keys() - shapes.keys():
+        print(f"shape {shape_id} ({baseline[shape_id]['scenario']}) is no longer run")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write the plans to this JSON file")
+    parser.add_argument("--baseline", help="compare with the plans in this JSON file")
+    # Relative growth of a plan's estimated cost that counts as a regression
+    parser.add_argument("--cost-threshold", type=float, default=0.5)
+    # Sequential scans of smaller tables are what the planner should pick
+    parser.add_argument("--seq-scan-rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    from sqlalchemy import bindparam
+    from sqlmodel import Session, text
+
+    from core.config import settings
+    from core.db import engine
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Query plans are only checked on Postgres")
+
+    # Pages shared from the cohort cache would skip the feed queries
+    settings.COHORT_FEED_CACHE = False
+    app = load_app()
+    with Session(engine) as session:
+        fixtures = pick_fixtures(session)
+        sizes = dict(session.exec(text(
+            "SELECT relname, reltuples FROM pg_class WHERE relname IN :tables"
+        ).bindparams(bindparam("tables", TABLES, expanding=True))).all())
+    large_tables = {table for table, rows in sizes.items() if rows >= args.seq_scan_rows}
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        scenarios = asyncio.run(run_scenarios(app, *fixtures))
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    shapes = {}
+    connection = engine.raw_connection()
+    try:
+        for scenario, statements in scenarios:
+            for statement, parameters in statements:
+                sql = shape_of(statement)
+                shape_id = hashlib.sha1(sql.encode()).hexdigest()[:12]
+                if shape_id in shapes or sql.split(" ", 1)[0] not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                    continue
+                shapes[shape_id] = {"scenario": scenario, "sql": sql,
+                                    **explain(connection, statement, parameters)}
+    finally:
+        connection.close()
+
+    print(f"{'shape':<13} {'scenario':<40} {'cost':>10} {'ms':>9} {'hit':>7} {'read':>7}  seq scans")
+    for shape_id, shape in shapes.items():
+        scans = [table for table in shape["seq_scans"] if table in large_tables]
+        print(f"{shape_id:<13} {shape['scenario']:<40} {shape['total_cost']:>10} {shape['execution_ms'] or '-':>9} "
+              f"{shape['shared_hit']:>7} {shape['shared_read']:>7}  {', '.join(scans)}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created_at": datetime.now(timezone.utc).isoformat(),
+                       "table_rows": sizes, "shapes": shapes}, f, indent=2, default=str)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(shapes, baseline["shapes"], args.cost_threshold, large_tables)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
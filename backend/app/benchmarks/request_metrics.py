@@ -0,0 +1,130 @@
+"""Measure what per-route request metrics cost.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.request_metrics
+
+Each mode runs in its own interpreter because REQUEST_METRICS is read at
+import. "/" involves no database, so its difference is the middleware
+alone; the poll routes add the per-statement hooks. End-to-end numbers
+are noisy at this scale, so the script also times the middleware around
+an empty app and `SELECT 1` with and without a request being tracked.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import API, client_for, load_app, measure, print_table, seed_polls
+
+MODES = {"off": "false", "on": "true"}
+
+
+async def run_worker(args) -> list[dict]:
+    app = load_app()
+    poll_ids = seed_polls(args.polls, prefix=f"metrics-{args.mode}")
+    paths = {
+        "GET /": "/",
+        "GET /polls/?limit=20": f"{API}/polls/?limit=20",
+        "GET /polls/{id}": [f"{API}/polls/{poll_id}" for poll_id in poll_ids],
+    }
+    results = []
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        for name, path in paths.items():
+            async def send(i, path=path):
+                return await client.get(path[i % len(path)] if isinstance(path, list) else path)
+
+            # Warm up caches and connections before timing
+            await measure(name, send, args.concurrency, args.requests // 10)
+            result = await measure(name, send, args.concurrency, args.requests)
+            result["mode"] = args.mode
+            results.append(result)
+    return results
+
+
+async def middleware_cost(rounds: int) -> float:
+    """Microseconds the middleware adds to a request that does nothing."""
+    from core.request_metrics import RequestMetricsMiddleware
+
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    timings = {}
+    for name, app in (("bare", empty_app), ("tracked", RequestMetricsMiddleware(empty_app))):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            await app(dict(scope), None, send)
+        timings[name] = (time.perf_counter() - started) / rounds
+    return (timings["tracked"] - timings["bare"]) * 1e6
+
+
+def statement_cost(rounds: int) -> float:
+    """Microseconds the statement hooks add to `SELECT 1` while a request is tracked."""
+    from sqlalchemy import text
+
+    from core.db import count_queries, engine
+
+    timings = {}
+    with engine.connect() as connection:
+        for name in ("untracked", "tracked", "untracked", "tracked"):
+            with count_queries(keep_statements=5) if name == "tracked" else _nothing():
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    connection.execute(text("SELECT 1"))
+                # The second pass of each counts, the first warms up
+                timings[name] = (time.perf_counter() - started) / rounds
+    return (timings["tracked"] - timings["untracked"]) * 1e6
+
+
+class _nothing:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_worker(args))))
+        return
+
+    results = []
+    for mode, enabled in MODES.items():
+        env = {**os.environ, "REQUEST_METRICS": enabled}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.request_metrics", "--mode", mode,
+             "--requests", str(args.requests), "--polls", str(args.polls),
+             "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results.extend(json.loads(output.strip().splitlines()[-1]))
+    print_table(sorted(results, key=lambda r: (r["name"], r["mode"])))
+
+    by_mode = {(r["name"], r["mode"]): r for r in results}
+    for name in dict.fromkeys(r["name"] for r in results):
+        off, on = by_mode[name, "off"], by_mode[name, "on"]
+        print(f"{name}: {(on['p50_ms'] - off['p50_ms']) * 1000:+.0f} us at p50, "
+              f"{(on['throughput'] / off['throughput'] - 1) * 100:+.1f}% throughput")
+
+    print(f"middleware: {asyncio.run(middleware_cost(20_000)):.1f} us per request")
+    print(f"statement hooks: {statement_cost(5_000):.1f} us per statement")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Fill a Postgres database with production-sized synthetic polls and votes.
+
+Run from the app directory against a migrated database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.seed_scale --polls 50000 --votes 5000000
+
+Rows are streamed in with COPY. Poll popularity follows a Zipf curve
+(--skew), so a few polls take most of the votes and most get a handful.
+Polls are spread over --days of creation dates, with a mix of ended,
+ongoing and upcoming ones. Private polls are open to one to three CUET
+cohorts (batch and department, or a whole batch) and only get votes
+from rolls inside them. Tallies and `allowed_rolls` are written
+consistent with the rows, and the tables are analyzed at the end. The
+same --seed gives the same data.
+
+--reset empties the poll tables first.
+"""
+import argparse
+import bisect
+import io
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.harness import bench_email
+from core.security import hash_email
+from services.eligibility import merge_roll_ranges
+
+ROLLS = (1_000_000, 9_999_999)
+# Voters are picked by stepping through a poll's rolls by this, or the next
+# number coprime with their count, so each roll comes up once
+STRIDE = 7919
+TOPICS = ["Class representative", "Cultural night", "Sports week", "Study tour destination",
+          "Cafeteria menu", "Exam schedule", "Club president", "Hall election", "Fest theme",
+          "Lab timing", "Farewell venue", "Debate motion", "Rag day", "Library hours"]
+DEPARTMENTS = ["CE", "EEE", "ME", "CSE", "URP", "Arch", "PME", "ETE", "MIE", "WRE", "BME", "MSE"]
+CHOICES = ["Yes", "No", "Maybe", "Saturday", "Sunday", "Cox's Bazar", "Sylhet", "Bandarban",
+           "Biryani", "Khichuri", "Online", "Offline", "Morning", "Evening", "Postpone"]
+
+
+class PollPlan:
+    """What is generated for one poll, decided before any row is written."""
+
+    __slots__ = ("id", "title", "description", "is_private", "created_at", "creator_email",
+                 "start_time", "end_time", "roll_ranges", "option_ids", "option_texts", "votes")
+
+    def __init__(self, rng: random.Random, now: datetime, days: int, private_share: float, creators: list[int]):
+        self.id = uuid.UUID(int=rng.getrandbits(128), version=4)
+        topic = rng.choice(TOPICS)
+        batch = rng.randint(17, 24)
+        department = rng.randrange(len(DEPARTMENTS))
+        self.title = f"{topic} {DEPARTMENTS[department]} {batch}"
+        self.description = (f"Vote on the {topic.lower()} for {DEPARTMENTS[department]} "
+                            f"batch {batch}. Poll {self.id.hex[:8]}.")
+        self.is_private = rng.random() < private_share
+        self.created_at = now - timedelta(days=days * rng.random())
+        self.creator_email = bench_email(rng.choice(creators))
+        self.start_time = self.created_at + timedelta(hours=72 * rng.random())
+        self.end_time = self.start_time + timedelta(hours=rng.uniform(1, 14 * 24))
+
+        self.roll_ranges = []
+        if self.is_private:
+            cohorts = []
+            for _ in range(rng.randint(1, 3)):
+                if rng.random() < 0.3:
+                    cohorts.append((batch * 10 ** 5, batch * 10 ** 5 + 99_999))
+                else:
+                    start = batch * 10 ** 5 + (department + 1) * 10 ** 3
+                    cohorts.append((start + 1, start + 180))
+                batch = rng.randint(17, 24)
+                department = rng.randrange(len(DEPARTMENTS))
+            self.roll_ranges = merge_roll_ranges(cohorts)
+
+        texts = rng.sample(CHOICES, rng.randint(2, 6))
+        self.option_texts = texts
+        self.option_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in texts]
+        self.votes: list[int] = [0] * len(texts)
+
+    def capacity(self) -> int:
+        """How many distinct voters may vote in the poll."""
+        if not self.is_private:
+            return ROLLS[1] - ROLLS[0] + 1
+        return sum(end - start + 1 for start, end in self.roll_ranges)
+
+    def voters(self, rng: random.Random, count: int):
+        """`count` distinct rolls allowed to vote in the poll."""
+        ranges = self.roll_ranges or [ROLLS]
+        sizes = [end - start + 1 for start, end in ranges]
+        bounds = [sum(sizes[:i + 1]) for i in range(len(sizes))]
+        capacity = bounds[-1]
+        stride = STRIDE
+        while math.gcd(stride, capacity) != 1:
+            stride += 1
+        offset = rng.randrange(capacity)
+        for k in range(count):
+            index = (offset + k * stride) % capacity
+            i = bisect.bisect_right(bounds, index)
+            yield ranges[i][0] + index - (bounds[i - 1] if i else 0)
+
+
+def plan_polls(args, now: datetime) -> list[PollPlan]:
+    rng = random.Random(args.seed)
+    creators = [rng.randint(*ROLLS) for _ in range(args.creators)]
+    polls = [PollPlan(rng, now, args.days, args.private_share, creators) for _ in range(args.polls)]
+
+    # Zipf weights over a random popularity order; upcoming polls get none
+    order = list(range(len(polls)))
+    rng.shuffle(order)
+    weights = [0.0] * len(polls)
+    for rank, i in enumerate(order):
+        if polls[i].start_time <= now:
+            weights[i] = 1 / (rank + 1) ** args.skew
+    total_weight = sum(weights) or 1
+    for poll, weight in zip(polls, weights):
+        count = min(poll.capacity(), round(args.votes * weight / total_weight))
+        if count:
+            # Some options are a lot more popular than others
+            option_weights = [rng.random() ** 2 + 0.05 for _ in poll.option_ids]
+            tally = Counter(rng.choices(range(len(poll.option_ids)), option_weights, k=count))
+            poll.votes = [tally[i] for i in range(len(poll.option_ids))]
+    return polls
+
+
+def _timestamp(value: datetime) -> str:
+    return value.isoformat()
+
+
+def copy_rows(cursor, table: str, columns: str, rows, chunk: int) -> int:
+    """COPY `rows` (tuples of text values) into `table`, `chunk` rows at a time."""
+    buffer = io.StringIO()
+    written = 0
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        buffer.write("\t".join(row))
+        buffer.write("\n")
+        written += 1
+        if written % chunk == 0:
+            flush()
+    if buffer.tell():
+        flush()
+    return written
+
+
+def poll_rows(polls: list[PollPlan]):
+    for poll in polls:
+        allowed_rolls = ",".join(f"[{start},{end}]" for start, end in poll.roll_ranges)
+        yield (str(poll.id), poll.title, poll.description, "t" if poll.is_private else "f",
+               _timestamp(poll.created_at), poll.creator_email, _timestamp(poll.start_time),
+               _timestamp(poll.end_time), str(sum(poll.votes)), "{" + allowed_rolls + "}")
+
+
+def option_rows(polls: list[PollPlan]):
+    for poll in polls:
+        for option_id, text, votes in zip(poll.option_ids, poll.option_texts, poll.votes):
+            yield str(option_id), str(poll.id), text, str(votes)
+
+
+def range_rows(polls: list[PollPlan], rng: random.Random):
+    for poll in polls:
+        for start, end in poll.roll_ranges:
+            yield str(uuid.UUID(int=rng.getrandbits(128), version=4)), str(poll.id), str(start), str(end)
+
+
+def vote_rows(polls: list[PollPlan], rng: random.Random, now: datetime):
+    for poll in polls:
+        total = sum(poll.votes)
+        if not total:
+            continue
+        span = (min(poll.end_time, now) - poll.start_time).total_seconds()
+        voters = poll.voters(rng, total)
+        for option_id, votes in zip(poll.option_ids, poll.votes):
+            option_id = str(option_id)
+            for _ in range(votes):
+                roll = next(voters)
+                yield (str(uuid.UUID(int=rng.getrandbits(128), version=4)), str(poll.id), option_id,
+                       hash_email(bench_email(roll)),
+                       _timestamp(poll.start_time + timedelta(seconds=span * rng.random())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--polls", type=int, default=50_000)
+    parser.add_argument("--votes", type=int, default=5_000_000)
+    # Zipf exponent of poll popularity; higher is more skewed
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--private-share", type=float, default=0.3)
+    parser.add_argument("--creators", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=100_000, help="rows per COPY")
+    parser.add_argument("--reset", action="store_true",
+                        help="delete every poll, option, roll range and vote first")
+    args = parser.parse_args()
+
+    from core.db import engine
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("The seeder needs Postgres")
+
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    polls = plan_polls(args, now)
+    hottest = sorted((sum(poll.votes) for poll in polls), reverse=True)
+    print(f"planned {len(polls)} polls in {time.perf_counter() - started:.1f}s; "
+          f"{sum(hottest)} votes, the top 10 polls have {sum(hottest[:10])}")
+
+    rng = random.Random(args.seed + 1)
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        if args.reset:
+            cursor.execute("TRUNCATE vote, pollfinalresult, rollrange, polloption, poll")
+        for table, columns, rows in [
+            ("poll", "id, title, description, is_private, created_at, creator_email, "
+                     "start_time, end_time, total_votes, allowed_rolls", poll_rows(polls)),
+            ("polloption", "id, poll_id, option_text, total_votes", option_rows(polls)),
+            ("rollrange", 'id, poll_id, start, "end"', range_rows(polls, rng)),
+            ("vote", "id, poll_id, option_id, voter_email_hash, timestamp", vote_rows(polls, rng, now)),
+        ]:
+            table_started = time.perf_counter()
+            written = copy_rows(cursor, table, columns, rows, args.chunk)
+            print(f"{table}: {written} rows in {time.perf_counter() - table_started:.1f}s")
+        # Plans are only as good as the statistics behind them
+        cursor.execute("ANALYZE poll, polloption, rollrange, vote")
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare per-request vote commits with write-behind group commit.
+
+Run from the app directory against a migrated Postgres database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.vote_ingest
+
+Each mode runs in its own interpreter because VOTE_WRITE_BEHIND is read at
+import. Every voter votes twice in the same poll, so half the requests
+exercise the duplicate-vote path.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from benchmarks.harness import API, client_for, load_app, measure, print_table, seed_polls
+
+MODES = {"per-request": "false", "write-behind": "true"}
+
+
+async def run_worker(args) -> list[dict]:
+    app = load_app()
+    poll_ids = seed_polls(args.polls, private_share=0, prefix=f"ingest-{args.mode}")
+    results = []
+    async with app.router.lifespan_context(app), client_for(app) as client:
+        options = []
+        for poll_id in poll_ids:
+            response = await client.get(f"{API}/polls/{poll_id}/options")
+            options.extend(option["id"] for option in response.json()["data"][:2])
+
+        # Polls are fresh for every run, so earlier runs never voted in them
+        base = 2_500_000
+        for concurrency in args.concurrency:
+            statuses = Counter()
+
+            async def send(i, base=base):
+                # Request 2k and 2k+1 come from the same voter and hit both
+                # options of one poll, so exactly one of them is accepted
+                voter, second = divmod(i, 2)
+                poll = voter % len(poll_ids)
+                response = await client.post(
+                    f"{API}/votes/vote", json={"option_id": options[2 * poll + second]},
+                    headers={"X-Bench-Roll": str(base + voter)})
+                statuses[response.status_code] += 1
+                return response
+
+            result = await measure("POST /votes/vote", send, concurrency, args.requests)
+            result["accepted"] = statuses[200]
+            results.append(result)
+            base += args.requests
+    for result in results:
+        result["mode"] = args.mode
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--mode", choices=MODES)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(run_worker(args))))
+        return
+
+    results = []
+    for mode, write_behind in MODES.items():
+        env = {**os.environ, "VOTE_WRITE_BEHIND": write_behind}
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.vote_ingest", "--mode", mode,
+             "--requests", str(args.requests), "--polls", str(args.polls),
+             "--concurrency", *map(str, args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results.extend(json.loads(output.strip().splitlines()[-1]))
+    print_table(sorted(results, key=lambda r: (r["concurrency"], r["mode"])))
+    for result in results:
+        # Half of the requests are repeat votes
+        if result["accepted"] != result["requests"] // 2:
+            print(f"{result['mode']} at concurrency {result['concurrency']}: "
+                  f"{result['accepted']} votes accepted, expected {result['requests'] // 2}")
+
+
+if __name__ == "__main__":
+    main()
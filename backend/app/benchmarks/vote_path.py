@@ -0,0 +1,115 @@
+"""Compare the single-statement vote path with the previous per-step one.
+
+Run from the app directory against a migrated Postgres database:
+
+    DATABASE_URL=postgresql://... python -m benchmarks.vote_path
+
+Both paths run in-process against the same polls so the difference is the
+database round trips, not HTTP overhead.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from sqlmodel import Session, select
+
+from benchmarks.harness import bench_email, percentile, print_table, seed_polls
+from core.db import count_queries, engine
+from models.common import AuthUser
+from models.poll import PollOption
+from models.vote import Vote
+from services.eligibility import get_poll_with_access
+from services.tally import record_vote
+from services.voting import VoteResult, cast_vote
+
+
+def stepwise_vote(session: Session, option_id, user: AuthUser) -> VoteResult:
+    """The vote route before the single-statement path, minus the HTTP layer."""
+    poll_option = session.get(PollOption, option_id)
+    if not poll_option:
+        return VoteResult.option_not_found
+    poll, can_vote = get_poll_with_access(session, poll_option.poll_id, user)
+    if not can_vote:
+        return VoteResult.forbidden
+    if poll.start_time > datetime.now(timezone.utc):
+        return VoteResult.not_started
+    if poll.end_time < datetime.now(timezone.utc):
+        return VoteResult.ended
+    vote = Vote(option_id=option_id, poll_id=poll.id, voter_email_hash=user.email_hash)
+    session.add(vote)
+    session.flush()
+    record_vote(session, poll.id, option_id)
+    session.commit()
+    session.refresh(vote)
+    return VoteResult.accepted
+
+
+def single_statement_vote(session: Session, option_id, user: AuthUser) -> VoteResult:
+    result = cast_vote(session, option_id, user)
+    session.commit()
+    return result
+
+
+PATHS = {"stepwise": stepwise_vote, "single": single_statement_vote}
+
+
+def run(path: str, options: list, first_roll: int, concurrency: int, total: int) -> dict:
+    cast = PATHS[path]
+    latencies, queries, errors = [], [], 0
+
+    def one(i: int):
+        roll = first_roll + i
+        user = AuthUser(email=bench_email(roll), full_name="Bench User", roll=roll)
+        started = time.perf_counter()
+        with count_queries() as counter, Session(engine) as session:
+            result = cast(session, options[i % len(options)], user)
+        return time.perf_counter() - started, counter.count, result
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for latency, count, result in executor.map(one, range(total)):
+            latencies.append(latency)
+            queries.append(count)
+            errors += result is not VoteResult.accepted
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "path": path,
+        "name": f"vote ({sum(queries) / len(queries):.1f} stmts)",
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "throughput": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    # Public polls only, so every vote is accepted unless it is a repeat
+    poll_ids = seed_polls(args.polls, private_share=0, prefix="vote-path")
+    with Session(engine) as session:
+        options = session.exec(
+            select(PollOption.id).where(PollOption.poll_id.in_(poll_ids))).all()
+
+    results = []
+    first_roll = 2_400_000
+    for concurrency in args.concurrency:
+        for path in PATHS:
+            results.append(run(path, options, first_roll, concurrency, args.requests))
+            # Fresh voters for every run so none of them has voted already
+            first_roll += args.requests
+    print_table(results, label="path")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,9 +28,45 @@ class Settings(BaseSettings):
     def SQLALCHEMY_DATABASE_URL(self) -> PostgresDsn:
         return self.DATABASE_URL
 
+    # Serve database routes on an asyncio engine (asyncpg, or aiosqlite for
+    # SQLite) instead of blocking psycopg2 calls in the threadpool
+    DB_ASYNC: bool = False
+
+    # Connection pool of each engine
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds a checkout waits for a free connection before failing
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_PRE_PING: bool = True
+    # Connections older than this many seconds are replaced (-1 keeps them)
+    DB_POOL_RECYCLE: int = 1800
+    # Requests allowed to hold a session at once; defaults to what the pool
+    # can hand out (size + overflow). Others wait up to DB_QUEUE_TIMEOUT
+    # seconds for a slot and then get a 503 with Retry-After
+    DB_MAX_CONCURRENCY: int | None = None
+    DB_QUEUE_TIMEOUT: float = 1
+    DB_RETRY_AFTER: int = 1
+    # Worker threads for sync endpoints and dependencies; defaults to twice
+    # the database concurrency (at least anyio's 40) so DB-bound requests
+    # never starve the ones that don't touch the database
+    THREADPOOL_SIZE: int | None = None
+
+    @property
+    def db_max_concurrency(self) -> int:
+        return self.DB_MAX_CONCURRENCY or self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW
+
+    @property
+    def threadpool_size(self) -> int:
+        return self.THREADPOOL_SIZE or max(40, 2 * self.db_max_concurrency)
+
     SUPABASE_URL: str
     SECRET_KEY: str
     AUDIENCE: str = "authenticated"
+    # Seconds between background refreshes of the Supabase JWKS
+    JWKS_REFRESH_INTERVAL: int = 600
+    # Verified tokens are cached until they expire, at most this many seconds
+    TOKEN_CACHE_TTL: int = 300
+    TOKEN_CACHE_SIZE: int = 10_000
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
 
@@ -42,5 +78,72 @@ class Settings(BaseSettings):
         []
     )
 
+    # Queue votes for a background writer that records them in batches with
+    # one commit each (group commit) instead of a transaction per request.
+    # A batch is written once it holds VOTE_BATCH_SIZE votes or its first
+    # vote has waited VOTE_BATCH_LINGER seconds
+    VOTE_WRITE_BEHIND: bool = False
+    VOTE_BATCH_SIZE: int = 500
+    VOTE_BATCH_LINGER: float = 0.005
+    # Votes beyond this many waiting for the writer get a 503
+    VOTE_QUEUE_SIZE: int = 10_000
+    # Times a batch aborted by a deadlock or serialization failure is retried
+    # before its votes fail
+    VOTE_BATCH_RETRIES: int = 3
+    # Options a single ballot may vote for
+    BALLOT_MAX_OPTIONS: int = 50
+    # Votes for polls that have not ended are checked against an in-memory
+    # copy of them (services.active_polls) instead of the database
+    ACTIVE_POLL_REGISTRY: bool = True
+    # Seconds between full reloads of that copy, which drop ended polls
+    ACTIVE_POLL_RELOAD_INTERVAL: int = 600
+
+    # Streamed poll tallies are refreshed at most once per this many seconds
+    LIVE_TALLY_INTERVAL: float = 0.5
+    # Seconds between keep-alive comments on idle tally streams
+    LIVE_KEEPALIVE_INTERVAL: float = 15
+    # Polls a single multiplexed tally stream may follow
+    LIVE_MAX_POLLS: int = 50
+    # Polls a single batch fetch may ask for
+    POLL_BATCH_MAX_IDS: int = 100
+    # Polls a single import request may create
+    POLL_IMPORT_MAX_POLLS: int = 500
+
+    # Results are frozen once a poll has been over for this many seconds, so
+    # votes acknowledged right before the end are already committed
+    RESULT_SETTLE_SECONDS: int = 60
+    # Frozen results kept in memory (they never change, the TTL only bounds
+    # how long an unused one lingers)
+    RESULT_CACHE_SIZE: int = 10_000
+    RESULT_CACHE_TTL: int = 60 * 60 * 24
+    # Rows fetched per round trip when streaming a poll export
+    EXPORT_BATCH_SIZE: int = 5_000
+
+    # Render poll responses straight from the loaded rows with orjson instead
+    # of building and re-validating PollResponse models
+    FAST_JSON: bool = True
+
+    # Total counts of cursor-paginated feeds are cached per filter
+    FEED_COUNT_CACHE_SIZE: int = 10_000
+    FEED_COUNT_CACHE_TTL: int = 30
+    # Which polls are on a feed page is shared by every student who sees the
+    # same polls (services.cohorts); the polls themselves are loaded fresh.
+    # The order of a shared page may lag the vote totals by up to the TTL
+    COHORT_FEED_CACHE: bool = True
+    COHORT_FEED_CACHE_SIZE: int = 10_000
+    COHORT_FEED_CACHE_TTL: float = 2
+
+    # Adds an X-Query-Count header with the number of SQL statements a request ran
+    QUERY_COUNT_HEADER: bool = False
+
+    # Per-route latency and SQL metrics on /metrics
+    REQUEST_METRICS: bool = True
+    # Bearer token scrapers must send to read /metrics, which is not served
+    # (404) while it is unset
+    METRICS_TOKEN: str | None = None
+    # Requests at least this slow are logged with their slowest statements
+    SLOW_REQUEST_SECONDS: float = 1.0
+    SLOW_REQUEST_STATEMENTS: int = 5
+
 
 settings = Settings()
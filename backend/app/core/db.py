@@ -1,8 +1,184 @@
+import heapq
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event, make_url, URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine, Session
 from core.config import settings
+from core.metrics import Counter, Gauge, Histogram
+
+pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30))
+pool_checkout_timeouts = Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection")
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            pool_checkout_wait.observe(waited)
+            for counter in _query_counters.get():
+                counter.pool_wait += waited
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_options(poolclass) -> dict:
+    # SQLite (local development only) keeps SQLAlchemy's default pooling
+    if make_url(str(settings.SQLALCHEMY_DATABASE_URL)).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
 
 # Create the engine for PostgreSQL
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URL))
+engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URL),
+                       **_pool_options(InstrumentedQueuePool))
+
+
+def to_async_url(url: str) -> URL:
+    """Swap the sync DBAPI of a database URL for its asyncio counterpart."""
+    url = make_url(url)
+    drivers = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+    url = url.set(drivername=drivers.get(url.get_backend_name(), url.drivername))
+    if "sslmode" in url.query:
+        # asyncpg spells libpq's sslmode as ssl
+        sslmode = url.query["sslmode"]
+        url = url.difference_update_query(["sslmode"]).update_query_dict(
+            {"ssl": sslmode})
+    return url
+
+
+# Engine behind the async request path, only created when it is enabled
+async_engine = (
+    create_async_engine(to_async_url(str(settings.SQLALCHEMY_DATABASE_URL)),
+                        **_pool_options(InstrumentedAsyncQueuePool))
+    if settings.DB_ASYNC else None
+)
+
+
+def _pools():
+    engines = [engine] if async_engine is None else [engine, async_engine.sync_engine]
+    return [e.pool for e in engines if isinstance(e.pool, QueuePool)]
+
+
+Gauge("db_pool_connections_in_use", "Pooled connections currently checked out",
+      function=lambda: sum(pool.checkedout() for pool in _pools()))
+Gauge("db_pool_connections_idle", "Pooled connections open and waiting to be used",
+      function=lambda: sum(pool.checkedin() for pool in _pools()))
+Gauge("db_pool_overflow", "Connections opened beyond the pool size",
+      function=lambda: sum(max(pool.overflow(), 0) for pool in _pools()))
+
+
+class QueryCounter:
+    """Statements executed while the counter is active, and what they cost.
+
+    `rows` adds up the driver's row counts: rows fetched by a SELECT, rows
+    changed by anything else. With `keep_statements` the slowest that many
+    statements are kept in `slowest` as (seconds, SQL) pairs.
+    """
+
+    def __init__(self, keep_statements: int = 0):
+        self.count = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.keep_statements = keep_statements
+        self._slowest: list[tuple[float, int, str]] = []
+
+    @property
+    def slowest(self) -> list[tuple[float, str]]:
+        return [(seconds, statement)
+                for seconds, _, statement in sorted(self._slowest, reverse=True)]
+
+    def _record(self, seconds: float, rows: int, statement: str) -> None:
+        self.seconds += seconds
+        self.rows += max(rows, 0)
+        if self.keep_statements:
+            # The position breaks ties so statements themselves are never compared
+            entry = (seconds, -self.count, statement)
+            if len(self._slowest) < self.keep_statements:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+
+# Every counter active in the context; nested ones all see the statements
+_query_counters: ContextVar[tuple[QueryCounter, ...]] = ContextVar(
+    "query_counters", default=())
+
+
+@contextmanager
+def count_queries(keep_statements: int = 0):
+    """Count the statements executed in this context (and threads it spawns)."""
+    counter = QueryCounter(keep_statements)
+    token = _query_counters.set((*_query_counters.get(), counter))
+    try:
+        yield counter
+    finally:
+        _query_counters.reset(token)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counters = _query_counters.get()
+    if counters:
+        for counter in counters:
+            counter.count += 1
+        context._query_started = time.perf_counter()
+
+
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    counters = _query_counters.get()
+    started = getattr(context, "_query_started", None)
+    if counters and started is not None:
+        seconds = time.perf_counter() - started
+        for counter in counters:
+            counter._record(seconds, cursor.rowcount, statement)
+
+
+for _engine in [engine] if async_engine is None else [engine, async_engine.sync_engine]:
+    event.listen(_engine, "before_cursor_execute", _count_query)
+    event.listen(_engine, "after_cursor_execute", _time_query)
+
+
+# SQLSTATEs of transactions Postgres aborted only because of concurrent ones
+# (deadlock_detected, serialization_failure); running them again succeeds
+TRANSIENT_CONFLICTS = {"40P01", "40001"}
+
+
+def is_transient_conflict(error: BaseException) -> bool:
+    """Whether `error` aborted a transaction that can simply be run again."""
+    orig = getattr(error, "orig", None)
+    # psycopg2 calls it pgcode, asyncpg sqlstate
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return code in TRANSIENT_CONFLICTS
+
 
 # Create a session for the database connection
 def get_session():
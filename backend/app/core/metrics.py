@@ -0,0 +1,157 @@
+import bisect
+import math
+import threading
+from collections.abc import Callable, Iterable
+
+
+class Metric:
+    """A process-local metric rendered in the Prometheus text format.
+
+    Passing `function` turns the metric into a read-only view over a value
+    that is tracked elsewhere (e.g. cache hit counters). A metric declared
+    with `labelnames` holds one child per combination of label values, see
+    `labels`.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float] | None = None,
+                 registry: "Registry | None" = None, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._function = function
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._children: dict[tuple[str, ...], Metric] = {}
+        (registry or REGISTRY).register(self)
+
+    @property
+    def value(self) -> float:
+        return self._function() if self._function else self._value
+
+    def labels(self, *values: str) -> "Metric":
+        """The child metric for these label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._child())
+        return child
+
+    def _child(self) -> "Metric":
+        return type(self)(self.name, self.documentation, registry=_UNREGISTERED)
+
+    def samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        if not self.labelnames:
+            yield from self._own_samples()
+            return
+        for values, child in list(self._children.items()):
+            labels = dict(zip(self.labelnames, values))
+            for name, child_labels, value in child._own_samples():
+                yield name, {**labels, **child_labels}, value
+
+    def _own_samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        yield self.name, {}, self.value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS,
+                 registry: "Registry | None" = None, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, registry=registry, labelnames=labelnames)
+        self.buckets = sorted(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+
+    def _child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, self.buckets, registry=_UNREGISTERED)
+
+    def observe(self, value: float) -> None:
+        # First bucket whose upper bound is >= value; past the end means +Inf only
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._value += value
+            self._count += 1
+            if i < len(self._counts):
+                self._counts[i] += 1
+
+    def _own_samples(self) -> Iterable[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            counts, total, count = list(self._counts), self._value, self._count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            yield f"{self.name}_bucket", {"le": _format_value(bound)}, cumulative
+        yield f"{self.name}_bucket", {"le": "+Inf"}, count
+        yield f"{self.name}_sum", {}, total
+        yield f"{self.name}_count", {}, count
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(
+                    f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+# Holds the children of labelled metrics, which their parent renders instead
+_UNREGISTERED = Registry()
@@ -0,0 +1,100 @@
+import logging
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.config import settings
+from core.db import count_queries
+from core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+LABELS = ("route", "method")
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+WAIT_BUCKETS = (.0001, .001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+requests_total = Counter("http_requests_total", "Requests served",
+                         labelnames=(*LABELS, "status"))
+request_duration = Histogram("http_request_duration_seconds",
+                             "Time from receiving a request to sending the last byte of its response",
+                             labelnames=LABELS)
+request_statements = Histogram("http_request_sql_statements", "SQL statements run per request",
+                               buckets=STATEMENT_BUCKETS, labelnames=LABELS)
+request_sql_seconds = Histogram("http_request_sql_seconds", "Time per request spent in SQL statements",
+                                labelnames=LABELS)
+request_sql_rows = Histogram("http_request_sql_rows", "Rows returned or changed by a request's statements",
+                             buckets=ROW_BUCKETS, labelnames=LABELS)
+request_pool_wait = Histogram("http_request_pool_wait_seconds",
+                              "Time per request spent waiting for pooled connections",
+                              buckets=WAIT_BUCKETS, labelnames=LABELS)
+
+# Requests that matched no route share one label instead of one per path
+UNMATCHED = "unmatched"
+
+# The histograms of each (route, method), looked up once per request
+_route_histograms: dict[tuple[str, str], tuple[Histogram, ...]] = {}
+
+
+class RequestMetricsMiddleware:
+    """Record latency and database cost of every request, per route template.
+
+    Statements are attributed through `count_queries`, so they are counted
+    wherever the request runs them: on the event loop, in the threadpool or
+    in a response being streamed. Requests slower than SLOW_REQUEST_SECONDS
+    are logged with their slowest statements.
+
+    A server-sent events stream is timed up to its first byte, since its
+    length is up to the client.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+        first_byte = None
+
+        async def send_timed(message: Message) -> None:
+            nonlocal status_code, first_byte
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if any(key == b"content-type" and value.startswith(b"text/event-stream")
+                       for key, value in message.get("headers", ())):
+                    first_byte = time.perf_counter()
+            await send(message)
+
+        with count_queries(keep_statements=settings.SLOW_REQUEST_STATEMENTS) as queries:
+            try:
+                await self.app(scope, receive, send_timed)
+            finally:
+                duration = (first_byte or time.perf_counter()) - started
+                # Set by the router once a route matched, e.g. /api/v1/polls/{poll_id}
+                route = scope.get("route")
+                labels = (getattr(route, "path", UNMATCHED), scope["method"])
+                self.record(labels, status_code, duration, queries)
+
+    @staticmethod
+    def record(labels: tuple[str, str], status_code: int, duration: float, queries) -> None:
+        histograms = _route_histograms.get(labels)
+        if histograms is None:
+            histograms = _route_histograms.setdefault(labels, tuple(
+                histogram.labels(*labels) for histogram in
+                (request_duration, request_statements, request_sql_seconds,
+                 request_sql_rows, request_pool_wait)))
+        requests_total.labels(*labels, str(status_code)).inc()
+        for histogram, value in zip(histograms, (duration, queries.count, queries.seconds,
+                                                 queries.rows, queries.pool_wait)):
+            histogram.observe(value)
+
+        if duration >= settings.SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request %s %s: %.3fs, %d statements in %.3fs, %.3fs waiting for connections%s",
+                labels[1], labels[0], duration, queries.count, queries.seconds, queries.pool_wait,
+                "".join(f"\n  {seconds * 1000:.1f} ms: {' '.join(statement.split())[:500]}"
+                        for seconds, statement in queries.slowest))
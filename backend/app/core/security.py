@@ -1,6 +1,12 @@
+import asyncio
 import hashlib
-from jwt import PyJWKClient
+import logging
+
+from jwt import PyJWKClient, PyJWKClientError
 from core.config import settings
+from core.metrics import Counter
+
+logger = logging.getLogger(__name__)
 
 
 def hash_email(email: str) -> str:
@@ -10,6 +16,26 @@ def hash_email(email: str) -> str:
 
 ALGORITHM = "ES256"
 
-# Fetch Supabase's public signing key via JWKS
+# Fetch Supabase's public signing key via JWKS. The key set is refreshed in
+# the background (see refresh_jwks_periodically), so the client-side cache
+# lifespan only matters if the refresher stops.
 JWKS_URL = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
-jwks_client = PyJWKClient(JWKS_URL)
+jwks_client = PyJWKClient(JWKS_URL, lifespan=settings.JWKS_REFRESH_INTERVAL * 3)
+
+jwks_refresh_failures = Counter(
+    "auth_jwks_refresh_failures_total", "Failed background refreshes of the JWKS")
+
+
+def refresh_jwks() -> None:
+    """Fetch the JWKS now and replace the cached key set."""
+    try:
+        jwks_client.get_jwk_set(refresh=True)
+    except PyJWKClientError as e:
+        jwks_refresh_failures.inc()
+        logger.warning("Could not refresh the JWKS from %s: %s", JWKS_URL, e)
+
+
+async def refresh_jwks_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.JWKS_REFRESH_INTERVAL)
+        await asyncio.to_thread(refresh_jwks)
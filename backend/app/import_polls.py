@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from sqlmodel import Session
+
+from core.config import settings
+from core.db import engine
+from services.poll_import import import_polls, parse_csv
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Create polls with their options and roll ranges from a JSON or CSV file.")
+    parser.add_argument("file", type=Path,
+                        help="a .csv file, or JSON holding a list of polls or {\"polls\": [...]}")
+    parser.add_argument("--creator", required=True, help="email of the user the polls belong to")
+    parser.add_argument("--batch-size", type=int, default=settings.POLL_IMPORT_MAX_POLLS,
+                        help="polls created per transaction")
+    args = parser.parse_args()
+
+    text = args.file.read_text()
+    if args.file.suffix.lower() == ".csv":
+        items = parse_csv(text)
+    else:
+        items = json.loads(text)
+        if isinstance(items, dict):
+            items = items["polls"]
+
+    created = failed = 0
+    for offset in range(0, len(items), args.batch_size):
+        with Session(engine) as session:
+            results = import_polls(session, args.creator, items[offset:offset + args.batch_size])
+        for result in results:
+            if result.poll_id is not None:
+                created += 1
+            else:
+                failed += 1
+                print(f"poll {offset + result.index + 1}: {result.error}")
+    print(f"Created {created} polls, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
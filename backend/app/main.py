@@ -1,11 +1,53 @@
-from fastapi import FastAPI
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import Annotated
+
+from anyio import to_thread
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from core import security
 from core.config import settings
+from core.db import count_queries
+from core.metrics import REGISTRY
+from core.request_metrics import RequestMetricsMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from api.main import api_router
+from services.active_polls import active_polls
+from services.live import tally_hub
+from services.poll_events import poll_event_listener
+from services.vote_writer import vote_writer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Sync endpoints and dependencies run in anyio's threadpool; size it to
+    # the database concurrency limit instead of leaving it at the default
+    to_thread.current_default_thread_limiter().total_tokens = settings.threadpool_size
+    # Load the signing keys before serving so no request waits on the JWKS
+    await asyncio.to_thread(security.refresh_jwks)
+    jwks_refresher = asyncio.create_task(security.refresh_jwks_periodically())
+    if settings.ACTIVE_POLL_REGISTRY:
+        # Likewise the open polls votes are checked against
+        await asyncio.to_thread(active_polls.load)
+    if settings.VOTE_WRITE_BEHIND:
+        vote_writer.start()
+    tally_hub.start(asyncio.get_running_loop())
+    # Poll changes made by other workers reach this worker's caches
+    poll_event_listener.start()
+    yield
+    jwks_refresher.cancel()
+    await asyncio.to_thread(tally_hub.stop)
+    await asyncio.to_thread(poll_event_listener.stop)
+    if settings.VOTE_WRITE_BEHIND:
+        # Queued votes are written before shutting down
+        await asyncio.to_thread(vote_writer.stop)
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 
@@ -14,6 +56,28 @@ def read_root():
     return {"message": "Server is running"}
 
 
+def check_metrics_token(
+    token: Annotated[HTTPAuthorizationCredentials | None, Depends(HTTPBearer(auto_error=False))],
+) -> None:
+    """Only scrapers sending METRICS_TOKEN as a bearer token may read the metrics."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if token is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not secrets.compare_digest(token.credentials.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid metrics token")
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False,
+         dependencies=[Depends(check_metrics_token)])
+def read_metrics():
+    return REGISTRY.render()
+
+
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
         CORSMiddleware,
@@ -25,4 +89,16 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+if settings.QUERY_COUNT_HEADER:
+    @app.middleware("http")
+    async def add_query_count_header(request: Request, call_next):
+        with count_queries() as counter:
+            response = await call_next(request)
+        response.headers["X-Query-Count"] = str(counter.count)
+        return response
+
+if settings.REQUEST_METRICS:
+    # Added last so it is the outermost middleware and times the others too
+    app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
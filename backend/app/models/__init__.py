@@ -3,6 +3,7 @@ from .poll import(
     Poll, 
     PollCreate, 
     PollCreateResponse,
+    PollFinalResult,
     PollOption, 
     PollOptions, 
     PollOptionsCreate, 
@@ -1,5 +1,9 @@
+from functools import cached_property
+
 from pydantic import EmailStr, BaseModel
 
+from core.security import hash_email
+
 
 class Message(BaseModel):
     message: str
@@ -10,3 +14,7 @@ class AuthUser(BaseModel):
     full_name: str
     roll: int
     avatar_url: str = None
+
+    @cached_property
+    def email_hash(self) -> str:
+        return hash_email(self.email)
@@ -2,8 +2,9 @@ import uuid
 from uuid import UUID
 from datetime import datetime, timezone, timedelta
 from pydantic import BaseModel
+from sqlalchemy import JSON, DateTime
 from sqlmodel import SQLModel, Field, Relationship
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Optional
 
 if TYPE_CHECKING:
     from models.vote import Vote
@@ -13,7 +14,7 @@ class RollRange(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     start: int = Field(default=10 ** 6)
     end: int = Field(default=10 ** 7)
-    poll_id: UUID = Field(foreign_key="poll.id", ondelete="CASCADE")
+    poll_id: UUID = Field(foreign_key="poll.id", ondelete="CASCADE", index=True)
     poll: "Poll" = Relationship(back_populates="roll_ranges")
 
 
@@ -32,15 +33,23 @@ class Poll(SQLModel, table=True):
     description: str = Field(max_length=1024)
     is_private: bool = Field(default=False)
     created_at: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc)
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True)
     )
     creator_email: str = Field(max_length=255)
     start_time: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc)
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True)
     )
     end_time: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc) + timedelta(days=1)
+        default_factory=lambda: datetime.now(timezone.utc) + timedelta(days=1),
+        sa_type=DateTime(timezone=True)
     )
+    total_votes: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"})
+    # Bumped whenever the poll's options or roll ranges change, for ETags
+    version: int = Field(
+        default=0, sa_column_kwargs={"server_default": "0"})
     options: list["PollOption"] = Relationship(
         back_populates="poll", cascade_delete=True)
     roll_ranges: list["RollRange"] = Relationship(
@@ -62,6 +71,27 @@ class PollCreateResponse(BaseModel):
     poll_id: UUID
 
 
+class PollImport(PollCreate):
+    option_texts: list[str]
+    roll_ranges: list[tuple[int, int]] = []
+
+
+class PollImportRequest(BaseModel):
+    # Validated one by one as PollImport, so a bad poll does not reject the rest
+    polls: list[dict[str, Any]]
+
+
+class PollImportItem(BaseModel):
+    index: int
+    poll_id: UUID | None = None
+    error: str | None = None
+
+
+class PollImportResponse(BaseModel):
+    data: list[PollImportItem]
+    created: int
+
+
 class PollResponse(BaseModel):
     id: UUID
     title: str
@@ -79,13 +109,20 @@ class PollResponse(BaseModel):
 
 class PollsResponse(BaseModel):
     data: list[PollResponse]
-    count: int
+    # Polls matching the feed, not just this page: exact on offset pages
+    # (also past the last one), up to FEED_COUNT_CACHE_TTL seconds old on
+    # cursor pages, and None with with_count=false
+    count: int | None
+    next_cursor: str | None = None
 
 
 class PollOption(SQLModel, table=True):
     id: UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    poll_id: UUID = Field(foreign_key="poll.id", ondelete="CASCADE")
+    poll_id: UUID = Field(foreign_key="poll.id", ondelete="CASCADE", index=True)
     option_text: str = Field(max_length=255)
+    # Per-option tallies stay hidden until the result is published
+    total_votes: int = Field(
+        default=0, exclude=True, sa_column_kwargs={"server_default": "0"})
     poll: Poll = Relationship(back_populates="options")
     votes: list["Vote"] = Relationship(
         back_populates="poll_option", cascade_delete=True)
@@ -101,6 +138,7 @@ class PollOptionsCreate(BaseModel):
 
 
 class PollOptionResult(BaseModel):
+    option_id: UUID
     option_text: str
     votes: int
 
@@ -108,3 +146,15 @@ class PollOptionResult(BaseModel):
 class PollResult(BaseModel):
     data: list[PollOptionResult]
     total_votes: int
+
+
+class PollFinalResult(SQLModel, table=True):
+    """Result of an ended poll, stored the first time it is requested."""
+    poll_id: UUID = Field(foreign_key="poll.id", ondelete="CASCADE", primary_key=True)
+    # PollResult as served, and the strong ETag of that body
+    result: dict = Field(sa_type=JSON)
+    etag: str = Field(max_length=64)
+    finalized_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True)
+    )
@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import DateTime, UniqueConstraint
 from pydantic import BaseModel
 from uuid import uuid4, UUID
 from datetime import datetime, timezone
@@ -19,9 +19,25 @@ class Vote(SQLModel, table=True):
                             ondelete="CASCADE", index=True)
     voter_email_hash: str = Field(max_length=255)
     timestamp: datetime = Field(
-        default_factory=lambda: datetime.now(timezone.utc))
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True))
     poll_option: "PollOption" = Relationship(back_populates="votes")
 
 
 class VoteCreateRequest(BaseModel):
     option_id: UUID
+
+
+class BallotCreateRequest(BaseModel):
+    option_ids: list[UUID]
+
+
+class BallotItem(BaseModel):
+    option_id: UUID
+    result: str
+    detail: str | None = None
+
+
+class BallotResponse(BaseModel):
+    data: list[BallotItem]
+    accepted: int
@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from sqlmodel import Session
+
+from core.db import engine
+from services.tally import reconcile_tallies
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Check the denormalized vote tallies against the vote table.")
+    parser.add_argument("--fix", action="store_true",
+                        help="recount drifted tallies instead of only reporting them")
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        drift = reconcile_tallies(session, fix=args.fix)
+
+    for item in drift:
+        print(f"{item.table} {item.id}: stored={item.stored} actual={item.actual}")
+    if not drift:
+        print("All tallies match the vote table")
+        return 0
+    if args.fix:
+        print(f"Recounted {len(drift)} tallies")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import bisect
+import logging
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.db import engine
+from core.metrics import Counter, Gauge
+from models.common import AuthUser
+from models.poll import Poll, PollOption, RollRange
+from services.eligibility import merge_roll_ranges
+from services.poll_events import on_polls_changed
+from utils.timestamps import as_utc
+
+logger = logging.getLogger(__name__)
+
+checks_from_memory = Counter("active_poll_checks_total",
+                             "Votes checked against the in-memory active polls")
+
+
+class ActivePoll:
+    """What checking a vote needs to know about one poll."""
+
+    __slots__ = ("id", "option_ids", "is_private", "creator_email", "start_time", "end_time",
+                 "roll_starts", "roll_ends")
+
+    def __init__(self, id: UUID, option_ids: tuple[UUID, ...], is_private: bool, creator_email: str,
+                 start_time: datetime, end_time: datetime, roll_ranges: list[tuple[int, int]]):
+        self.id = id
+        self.option_ids = option_ids
+        self.is_private = is_private
+        self.creator_email = creator_email
+        self.start_time = as_utc(start_time).timestamp()
+        self.end_time = as_utc(end_time).timestamp()
+        roll_ranges = merge_roll_ranges(roll_ranges)
+        self.roll_starts = array("q", [start for start, _ in roll_ranges])
+        self.roll_ends = array("q", [end for _, end in roll_ranges])
+
+    def allows(self, user: AuthUser) -> bool:
+        """Whether the user may see the poll, like `visible_to`."""
+        if not self.is_private or self.creator_email == user.email:
+            return True
+        i = bisect.bisect_right(self.roll_starts, user.roll) - 1
+        return i >= 0 and user.roll <= self.roll_ends[i]
+
+
+class ActivePollRegistry:
+    """Polls that have not ended yet, kept in memory to check votes without a query.
+
+    Everything is loaded on first use and again every `reload_interval`
+    seconds, which also drops polls that have ended since. In between, polls
+    announced by `polls_changed` (services.poll_events) are read again, with
+    the session of the next check, before it is answered. Options it does
+    not know, such as those of ended polls or of polls it cannot hold, are
+    left to the database.
+    """
+
+    def __init__(self, reload_interval: float):
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._polls: dict[UUID, ActivePoll] = {}
+        self._options: dict[UUID, ActivePoll] = {}
+        # When everything was last loaded; None to load it on the next check
+        self._loaded_at: float | None = None
+        self._changed: set[UUID] = set()
+
+    def __len__(self) -> int:
+        return len(self._polls)
+
+    def polls_changed(self, poll_ids: set[UUID] | None) -> None:
+        with self._lock:
+            if poll_ids is None:
+                self._loaded_at = None
+            else:
+                self._changed.update(poll_ids)
+
+    def load(self) -> None:
+        """Load every poll now instead of on the first check."""
+        self.polls_changed(None)
+        with Session(engine) as session:
+            self._refresh(session)
+
+    def check(self, session: Session, option_id: UUID, user: AuthUser,
+              now: datetime) -> tuple[UUID, bool, bool, bool] | None:
+        """The option's poll id, whether the user may vote in it, and whether it has
+        not started or has ended; None when the option is not known here.
+        """
+        if not settings.ACTIVE_POLL_REGISTRY:
+            return None
+        self._refresh(session)
+        poll = self._options.get(option_id)
+        if poll is None:
+            return None
+        checks_from_memory.inc()
+        now = now.timestamp()
+        return poll.id, poll.allows(user), poll.start_time > now, poll.end_time < now
+
+    def _refresh(self, session: Session) -> None:
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            reload = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_interval
+            if reload:
+                # Other threads keep checking against what is loaded meanwhile
+                self._loaded_at = time.monotonic()
+        if not reload and not changed:
+            return
+        try:
+            if reload:
+                polls = self._read(session, Poll.end_time >= datetime.now(timezone.utc))
+            else:
+                polls = self._read(session, Poll.id.in_(changed))
+        except Exception:
+            logger.exception("Could not read the active polls")
+            # Nothing possibly outdated is used until a load succeeds
+            with self._lock:
+                self._loaded_at = None
+                self._polls, self._options = {}, {}
+            return
+
+        with self._lock:
+            registry = {} if reload else dict(self._polls)
+            for poll_id in changed:
+                registry.pop(poll_id, None)
+            registry.update((poll.id, poll) for poll in polls)
+            self._polls = registry
+            self._options = {option_id: poll for poll in registry.values() for option_id in poll.option_ids}
+
+    @staticmethod
+    def _read(session: Session, condition) -> list[ActivePoll]:
+        options, roll_ranges = defaultdict(list), defaultdict(list)
+        for poll_id, option_id in session.exec(
+                select(PollOption.poll_id, PollOption.id).join(Poll).where(condition)).all():
+            options[poll_id].append(option_id)
+        for poll_id, start, end in session.exec(
+                select(RollRange.poll_id, RollRange.start, RollRange.end).join(Poll)
+                .where(condition, Poll.is_private.is_(True))).all():
+            roll_ranges[poll_id].append((start, end))
+        polls = []
+        for poll_id, is_private, creator_email, start_time, end_time in session.exec(
+                select(Poll.id, Poll.is_private, Poll.creator_email, Poll.start_time, Poll.end_time)
+                .where(condition)).all():
+            try:
+                polls.append(ActivePoll(poll_id, tuple(options[poll_id]), is_private, creator_email,
+                                        start_time, end_time, roll_ranges[poll_id]))
+            except ValueError as e:
+                # Such as a legacy roll range that ends before it starts; the
+                # poll's votes are left to the database instead of failing
+                # the whole load
+                logger.warning("Could not hold poll %s in memory: %s", poll_id, e)
+        return polls
+
+
+active_polls = ActivePollRegistry(reload_interval=settings.ACTIVE_POLL_RELOAD_INTERVAL)
+on_polls_changed(active_polls.polls_changed)
+Gauge("active_polls", "Polls held in memory for checking votes", function=lambda: len(active_polls))
@@ -0,0 +1,81 @@
+import bisect
+import threading
+from collections.abc import Hashable
+
+from sqlmodel import Session, select
+
+from models.common import AuthUser
+from models.poll import Poll, RollRange
+from services.poll_events import on_polls_changed
+
+
+class CohortIndex:
+    """Splits the rolls into intervals whose students see the same polls.
+
+    Which private polls a roll may see only changes at the endpoints of
+    their roll ranges, so between two consecutive endpoints (the starts and
+    ends + 1 of every private poll's ranges) all rolls share one visibility,
+    and rolls outside every range share the public polls alone. Creators of
+    private polls also see their own, so each of them is a cohort of one.
+
+    The endpoints are loaded on first use and again after any poll changes,
+    with the session of the request that needs them, so under DB_ASYNC they
+    are read through the asyncio driver like the rest of the request.
+    Requests that miss at the same time each load them; no lock is held
+    across the queries, which would stall the event loop. Cohorts carry the
+    generation of the endpoints they came from, so nothing keyed by an
+    outdated cohort is matched after a reload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = 0
+        # (generation, endpoints, whether the rolls from each endpoint on are
+        # in some range, creators of private polls)
+        self._state: tuple[int, list[int], list[bool], frozenset[str]] | None = None
+
+    def invalidate(self, poll_ids=None) -> None:
+        with self._lock:
+            self._generation += 1
+            self._state = None
+
+    def _load(self, session: Session) -> tuple[int, list[int], list[bool], frozenset[str]]:
+        with self._lock:
+            generation = self._generation
+        ranges = session.exec(
+            select(RollRange.start, RollRange.end)
+            .join(Poll, Poll.id == RollRange.poll_id)
+            .where(Poll.is_private.is_(True))).all()
+        creators = frozenset(session.exec(
+            select(Poll.creator_email).where(Poll.is_private.is_(True)).distinct()).all())
+
+        changes: dict[int, int] = {}
+        for start, end in ranges:
+            changes[start] = changes.get(start, 0) + 1
+            changes[end + 1] = changes.get(end + 1, 0) - 1
+        endpoints = sorted(changes)
+        covered, depth = [], 0
+        for endpoint in endpoints:
+            depth += changes[endpoint]
+            covered.append(depth > 0)
+
+        state = (generation, endpoints, covered, creators)
+        with self._lock:
+            if self._generation == generation:
+                self._state = state
+        return state
+
+    def cohort_of(self, session: Session, user: AuthUser) -> Hashable:
+        """A key shared by every user who sees exactly the same polls as `user`."""
+        state = self._state or self._load(session)
+        generation, endpoints, covered, creators = state
+        if user.email in creators:
+            return generation, user.email
+        i = bisect.bisect_right(endpoints, user.roll)
+        if i == 0 or not covered[i - 1]:
+            return generation, None
+        return generation, endpoints[i - 1], endpoints[i] - 1
+
+
+cohort_index = CohortIndex()
+on_polls_changed(cohort_index.invalidate)
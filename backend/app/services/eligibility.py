@@ -0,0 +1,89 @@
+from collections.abc import Iterable
+from uuid import UUID
+
+from sqlalchemy import Boolean, Uuid, bindparam, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlmodel import Session, exists, select, text, or_
+
+from models.common import AuthUser
+from models.poll import Poll, RollRange
+
+
+def merge_roll_ranges(roll_ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Merge overlapping and adjacent inclusive roll ranges into sorted, disjoint ones.
+
+    Raises ValueError for a range whose start is after its end.
+    """
+    merged: list[list[int]] = []
+    for start, end in sorted(roll_ranges):
+        if start > end:
+            raise ValueError(
+                f"Roll range start must not exceed its end ({start}, {end})")
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class poll_allows_roll(FunctionElement):
+    """True when a roll falls inside one of the poll's roll ranges.
+
+    On Postgres this is a single containment test against the GiST-indexed
+    `poll.allowed_rolls` multirange, elsewhere an EXISTS over `rollrange`.
+    """
+    type = Boolean()
+    inherit_cache = True
+    name = "poll_allows_roll"
+
+
+@compiles(poll_allows_roll)
+def _compile_allows_roll(element, compiler, **kw):
+    roll, = element.clauses
+    return compiler.process(
+        exists().where(RollRange.poll_id == Poll.id,
+                       RollRange.start <= roll, RollRange.end >= roll),
+        **kw
+    )
+
+
+@compiles(poll_allows_roll, "postgresql")
+def _compile_allows_roll_postgresql(element, compiler, **kw):
+    roll, = element.clauses
+    return compiler.process(
+        literal_column("poll.allowed_rolls").op("@>")(roll), **kw)
+
+
+def visible_to(user: AuthUser):
+    """Filter for the polls a user may see: public, their own or in their roll range."""
+    return or_(
+        Poll.is_private.is_(False),
+        Poll.creator_email == user.email,
+        poll_allows_roll(user.roll),
+    )
+
+
+def get_poll_with_access(session: Session, poll_id: UUID, user: AuthUser) -> tuple[Poll | None, bool]:
+    """Load a poll together with whether the user may see it, in one query."""
+    row = session.exec(
+        select(Poll, visible_to(user)).where(Poll.id == poll_id)
+    ).first()
+    return (row[0], row[1]) if row else (None, False)
+
+
+def refresh_allowed_rolls(session: Session, *poll_ids: UUID) -> None:
+    """Rebuild the polls' `allowed_rolls` multiranges from their roll ranges."""
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    session.exec(
+        text("""
+            UPDATE poll
+            SET allowed_rolls = coalesce((
+                SELECT range_agg(int4range(rollrange.start, rollrange."end", '[]'))
+                FROM rollrange
+                WHERE rollrange.poll_id = poll.id
+            ), '{}'::int4multirange)
+            WHERE poll.id IN :poll_ids
+        """).bindparams(bindparam("poll_ids", list(poll_ids), type_=Uuid(), expanding=True))
+    )
@@ -0,0 +1,77 @@
+import csv
+import io
+from collections.abc import Iterator
+from enum import Enum
+from uuid import UUID
+
+import orjson
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from models.poll import PollOption
+from models.vote import Vote
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv",
+    ExportFormat.ndjson: "application/x-ndjson",
+}
+
+
+def vote_timeline_query(poll_id: UUID):
+    """Every vote of a poll in the order it was cast, without the voter."""
+    return (
+        select(Vote.timestamp, Vote.option_id, PollOption.option_text)
+        .join(PollOption, PollOption.id == Vote.option_id)
+        .where(Vote.poll_id == poll_id)
+        .order_by(Vote.timestamp, Vote.id)
+    )
+
+
+def result_query(poll_id: UUID):
+    """The per-option tallies of a poll, in the order of `count_result`."""
+    return (
+        select(PollOption.id.label("option_id"), PollOption.option_text,
+               PollOption.total_votes.label("votes"))
+        .where(PollOption.poll_id == poll_id)
+        .order_by(PollOption.id)
+    )
+
+
+def _csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        for row in rows)
+    return buffer.getvalue().encode()
+
+
+def _ndjson_chunk(columns, rows) -> bytes:
+    return b"".join(
+        orjson.dumps(dict(zip(columns, row)), option=orjson.OPT_UTC_Z) + b"\n"
+        for row in rows)
+
+
+def stream_rows(engine: Engine, query, format: ExportFormat, batch_size: int) -> Iterator[bytes]:
+    """Render the rows of `query` as CSV or NDJSON, one chunk per batch.
+
+    Rows are read through a server-side cursor `batch_size` at a time, so
+    memory use does not grow with the number of rows. The session is opened
+    on the first chunk and closed with the last, and holds its pooled
+    connection only for that long.
+    """
+    with Session(engine) as session:
+        result = session.exec(query.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        if format == ExportFormat.csv:
+            yield _csv_chunk([columns])
+        for rows in result.partitions():
+            if format == ExportFormat.csv:
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(columns, rows)
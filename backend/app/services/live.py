@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import select as io_select
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from uuid import UUID
+
+from sqlalchemy import Engine
+from sqlmodel import Session, select
+
+from core.config import settings
+from core.db import engine
+from core.metrics import Counter, Gauge
+from models.poll import Poll
+
+logger = logging.getLogger(__name__)
+
+# Vote statements notify this channel with the poll id; Postgres delivers
+# each distinct payload once per commit
+POLL_CHANGES_CHANNEL = "poll_changes"
+
+refresh_queries = Counter("live_tally_refresh_queries_total",
+                          "Queries run to refresh the tallies of streamed polls")
+events_sent = Counter("live_tally_events_total", "Tally updates handed to subscribers")
+
+
+class Subscription:
+    """Latest tallies of a set of polls, for one streaming client.
+
+    Updates that arrive faster than the client reads them overwrite each
+    other, so a slow client only ever holds one value per poll.
+    """
+
+    def __init__(self, poll_ids: Iterable[UUID]):
+        self.poll_ids = frozenset(poll_ids)
+        self._pending: dict[UUID, int] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, poll_id: UUID, total_votes: int) -> None:
+        self._pending[poll_id] = total_votes
+        self._ready.set()
+
+    async def get(self) -> dict[UUID, int]:
+        await self._ready.wait()
+        self._ready.clear()
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+class TallyHub:
+    """Fans poll tally changes out to streaming clients from one listener per worker.
+
+    On Postgres a background thread LISTENs on POLL_CHANGES_CHANNEL, collects
+    the polls that changed and, every `interval` seconds, reads the totals of
+    those that have subscribers in one query. Elsewhere it re-reads every
+    subscribed poll each interval. Either way the database load depends on
+    the number of workers, not on the number of viewers.
+    """
+
+    def __init__(self, engine: Engine, interval: float):
+        self.engine = engine
+        self.interval = interval
+        self._subscribers: dict[UUID, set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._changed: set[UUID] = set()
+        # Polls whose next read is pushed even if unchanged, for new subscribers
+        self._resync: set[UUID] = set()
+        self._totals: dict[UUID, int] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="tally-hub", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def subscribe(self, poll_ids: Iterable[UUID]) -> Subscription:
+        """Register a client; call from the event loop."""
+        subscription = Subscription(poll_ids)
+        with self._lock:
+            for poll_id in subscription.poll_ids:
+                self._subscribers[poll_id].add(subscription)
+            # Whatever changed between the client's snapshot and now
+            self._resync.update(subscription.poll_ids)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            for poll_id in subscription.poll_ids:
+                subscribers = self._subscribers.get(poll_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[poll_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                if self.engine.dialect.name == "postgresql":
+                    self._listen()
+                else:
+                    self._poll()
+            except Exception:
+                logger.exception("Live tally listener failed, restarting")
+                # Notifications may have been missed while disconnected
+                with self._lock:
+                    self._resync.update(self._subscribers)
+                self._stopping.wait(self.interval)
+
+    def _listen(self) -> None:
+        cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+        connection = self.engine.dialect.connect(*cargs, **cparams)
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {POLL_CHANGES_CHANNEL}")
+            next_flush = time.monotonic() + self.interval
+            while not self._stopping.is_set():
+                timeout = max(next_flush - time.monotonic(), 0)
+                if io_select.select([connection], [], [], timeout)[0]:
+                    connection.poll()
+                    changed = {UUID(notify.payload) for notify in connection.notifies}
+                    connection.notifies.clear()
+                    with self._lock:
+                        self._changed.update(changed)
+                if time.monotonic() >= next_flush:
+                    self._flush()
+                    next_flush = time.monotonic() + self.interval
+        finally:
+            connection.close()
+
+    def _poll(self) -> None:
+        while not self._stopping.wait(self.interval):
+            with self._lock:
+                self._changed.update(self._subscribers)
+            self._flush()
+
+    def _flush(self) -> None:
+        with self._lock:
+            subscribed = set(self._subscribers)
+            wanted = (self._changed | self._resync) & subscribed
+            resync = self._resync & subscribed
+            self._changed.clear()
+            self._resync.clear()
+        for poll_id in self._totals.keys() - subscribed:
+            del self._totals[poll_id]
+        if not wanted:
+            return
+
+        refresh_queries.inc()
+        with Session(self.engine) as session:
+            rows = session.exec(
+                select(Poll.id, Poll.total_votes).where(Poll.id.in_(wanted))).all()
+        updates = {}
+        for poll_id, total_votes in rows:
+            if poll_id in resync or self._totals.get(poll_id) != total_votes:
+                updates[poll_id] = total_votes
+            self._totals[poll_id] = total_votes
+        if updates:
+            self._loop.call_soon_threadsafe(self._publish, updates)
+
+    def _publish(self, updates: dict[UUID, int]) -> None:
+        with self._lock:
+            targets = [(subscription, poll_id, total_votes)
+                       for poll_id, total_votes in updates.items()
+                       for subscription in self._subscribers.get(poll_id, ())]
+        for subscription, poll_id, total_votes in targets:
+            subscription.push(poll_id, total_votes)
+        events_sent.inc(len(targets))
+
+
+tally_hub = TallyHub(engine, interval=settings.LIVE_TALLY_INTERVAL)
+Gauge("live_tally_subscribers", "Clients streaming poll tallies",
+      function=tally_hub.subscriber_count)
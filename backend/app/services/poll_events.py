@@ -0,0 +1,121 @@
+import logging
+import select as io_select
+import threading
+from collections.abc import Callable
+from uuid import UUID
+
+from sqlalchemy import Engine, event
+from sqlmodel import Session, text
+
+from core.db import engine
+
+logger = logging.getLogger(__name__)
+
+# Poll creation and deletion and changes to options and roll ranges notify
+# this channel with the poll id. Votes go to services.live's channel instead
+POLL_DEFINITIONS_CHANNEL = "poll_definitions"
+
+NOTIFY_POLLS_CHANGED = text(f"""
+    SELECT pg_notify('{POLL_DEFINITIONS_CHANNEL}', poll_id)
+    FROM unnest(CAST(:poll_ids AS text[])) AS poll_id
+""")
+
+# Called with the ids of the changed polls, or None when any poll may have
+# changed
+_handlers: list[Callable[[set[UUID] | None], None]] = []
+
+
+def on_polls_changed(handler: Callable[[set[UUID] | None], None]) -> Callable[[set[UUID] | None], None]:
+    """Register `handler` to run in every worker once a poll change commits."""
+    _handlers.append(handler)
+    return handler
+
+
+def _dispatch(poll_ids: set[UUID] | None) -> None:
+    for handler in _handlers:
+        try:
+            handler(poll_ids)
+        except Exception:
+            logger.exception("Poll change handler %r failed", handler)
+
+
+def polls_changed(session: Session, *poll_ids: UUID) -> None:
+    """Announce that the polls change with the session's transaction.
+
+    Call before committing. The handlers run in this worker right after the
+    commit and, on Postgres, in the other workers once the notification sent
+    with the transaction reaches them; nothing is announced on rollback.
+    """
+    session.info.setdefault("changed_polls", set()).update(poll_ids)
+    if session.get_bind().dialect.name == "postgresql":
+        session.exec(NOTIFY_POLLS_CHANGED, params={"poll_ids": [str(poll_id) for poll_id in poll_ids]})
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session) -> None:
+    poll_ids = session.info.pop("changed_polls", None)
+    if poll_ids:
+        _dispatch(poll_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session) -> None:
+    session.info.pop("changed_polls", None)
+
+
+class PollEventListener:
+    """Runs the handlers for poll changes committed by other workers.
+
+    Only Postgres can tell other processes; elsewhere there is a single
+    worker and `polls_changed` already ran the handlers. Notifications sent
+    while the listener was disconnected are lost, so the handlers are told
+    that anything may have changed whenever it (re)connects.
+    """
+
+    def __init__(self, engine: Engine, retry_interval: float = 1.0):
+        self.engine = engine
+        self.retry_interval = retry_interval
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self.engine.dialect.name != "postgresql":
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="poll-events", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._listen()
+            except Exception:
+                logger.exception("Poll change listener failed, restarting")
+                self._stopping.wait(self.retry_interval)
+
+    def _listen(self) -> None:
+        cargs, cparams = self.engine.dialect.create_connect_args(self.engine.url)
+        connection = self.engine.dialect.connect(*cargs, **cparams)
+        try:
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {POLL_DEFINITIONS_CHANNEL}")
+            _dispatch(None)
+            while not self._stopping.is_set():
+                if io_select.select([connection], [], [], self.retry_interval)[0]:
+                    connection.poll()
+                    poll_ids = {UUID(notify.payload) for notify in connection.notifies}
+                    connection.notifies.clear()
+                    if poll_ids:
+                        _dispatch(poll_ids)
+        finally:
+            connection.close()
+
+
+poll_event_listener = PollEventListener(engine)
@@ -0,0 +1,116 @@
+import csv
+import io
+import uuid
+from collections.abc import Iterable
+from datetime import datetime, timezone
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from models.poll import Poll, PollImport, PollImportItem, PollOption, RollRange
+from services.eligibility import merge_roll_ranges, refresh_allowed_rolls
+from services.poll_events import polls_changed
+
+MAX_OPTIONS = 20
+
+
+def check_options(option_texts: list[str]) -> None:
+    """Raise ValueError unless the options fit a poll."""
+    if len(option_texts) < 2:
+        raise ValueError("At least two options are required")
+    if len(option_texts) > MAX_OPTIONS:
+        raise ValueError(f"A poll can have at most {MAX_OPTIONS} options")
+    if len(option_texts) != len(set(option_texts)):
+        raise ValueError("Options must be unique")
+
+
+def check_roll_ranges(is_private: bool, roll_ranges: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Merge the roll ranges of a poll, raising ValueError if they do not fit it."""
+    roll_ranges = list(roll_ranges)
+    if is_private and len(roll_ranges) == 0:
+        raise ValueError("At least one roll range is required")
+    return merge_roll_ranges(roll_ranges)
+
+
+def _validation_message(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in e.errors())
+
+
+def parse_csv(text: str) -> list[dict[str, Any]]:
+    """Read polls from CSV, one per row.
+
+    Columns are PollImport's fields. `option_texts` holds the options
+    separated by `|` and `roll_ranges` the ranges as `start-end` separated
+    by `;`; empty cells fall back to the field defaults.
+    """
+    polls = []
+    for row in csv.DictReader(io.StringIO(text)):
+        poll = {key: value for key, value in row.items() if key and value not in (None, "")}
+        if "option_texts" in poll:
+            poll["option_texts"] = [text.strip() for text in poll["option_texts"].split("|")]
+        if "roll_ranges" in poll:
+            poll["roll_ranges"] = [
+                tuple(part.strip() for part in roll_range.split("-", 1))
+                for roll_range in poll["roll_ranges"].split(";") if roll_range.strip()
+            ]
+        polls.append(poll)
+    return polls
+
+
+def import_polls(session: Session, creator_email: str, items: list[dict[str, Any]]) -> list[PollImportItem]:
+    """Validate and create many polls with their options and roll ranges.
+
+    Every item is checked in memory first and reported on its own. The valid
+    ones are then written in the session's transaction with one multi-row
+    INSERT per table and one `allowed_rolls` refresh, and committed together;
+    if that fails, nothing is created and every valid item reports the error.
+    """
+    results = [PollImportItem(index=index) for index in range(len(items))]
+    poll_rows, option_rows, range_rows = [], [], []
+    now = datetime.now(timezone.utc)
+    for result, item in zip(results, items):
+        try:
+            poll = PollImport.model_validate(item)
+            if poll.description is None:
+                raise ValueError("Description is required")
+            check_options(poll.option_texts)
+            roll_ranges = check_roll_ranges(poll.is_private, poll.roll_ranges)
+        except ValidationError as e:
+            result.error = _validation_message(e)
+            continue
+        except ValueError as e:
+            result.error = str(e)
+            continue
+
+        result.poll_id = uuid.uuid4()
+        poll_rows.append({
+            "id": result.poll_id, "title": poll.title, "description": poll.description,
+            "is_private": poll.is_private, "creator_email": creator_email,
+            "created_at": now, "start_time": poll.start_time, "end_time": poll.end_time,
+        })
+        option_rows.extend({"id": uuid.uuid4(), "poll_id": result.poll_id, "option_text": text}
+                           for text in poll.option_texts)
+        range_rows.extend({"id": uuid.uuid4(), "poll_id": result.poll_id, "start": start, "end": end}
+                          for start, end in roll_ranges)
+
+    if not poll_rows:
+        return results
+    try:
+        session.exec(insert(Poll), params=poll_rows)
+        session.exec(insert(PollOption), params=option_rows)
+        if range_rows:
+            session.exec(insert(RollRange), params=range_rows)
+            refresh_allowed_rolls(session, *{row["poll_id"] for row in range_rows})
+        polls_changed(session, *(row["id"] for row in poll_rows))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        for result in results:
+            if result.poll_id is not None:
+                result.poll_id = None
+                result.error = f"Failed to create poll. {str(e)}"
+    return results
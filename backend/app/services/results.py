@@ -0,0 +1,62 @@
+from uuid import UUID
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from core.cache import TTLCache
+from core.config import settings
+from models.poll import PollFinalResult, PollOption, PollOptionResult, PollResult
+from utils.etag import strong_etag
+
+# Final results never change, so entries only leave the cache to make room
+_final_results = TTLCache(maxsize=settings.RESULT_CACHE_SIZE, ttl=settings.RESULT_CACHE_TTL)
+
+
+def count_result(session: Session, poll_id: UUID) -> PollResult:
+    """Read a poll's result from the per-option tallies."""
+    options = session.exec(
+        select(PollOption.id, PollOption.option_text, PollOption.total_votes)
+        .where(PollOption.poll_id == poll_id)
+        .order_by(PollOption.id)
+    ).all()
+    data = [
+        PollOptionResult(option_id=option_id, option_text=option_text, votes=votes)
+        for option_id, option_text, votes in options
+    ]
+    return PollResult(data=data, total_votes=sum(option.votes for option in data))
+
+
+def result_etag(result: PollResult) -> str:
+    return strong_etag(result.model_dump_json().encode())
+
+
+def get_final_result(session: Session, poll_id: UUID) -> tuple[PollResult, str]:
+    """Return the frozen result of a settled poll and its ETag.
+
+    The result is counted and stored in `pollfinalresult` the first time it
+    is asked for; afterwards it comes from that row or from memory.
+    """
+    cached = _final_results.get(poll_id)
+    if cached is not None:
+        return cached
+
+    final = session.get(PollFinalResult, poll_id)
+    if final is None:
+        result = count_result(session, poll_id)
+        final = PollFinalResult(poll_id=poll_id, result=result.model_dump(mode="json"),
+                                etag=result_etag(result))
+        session.add(final)
+        try:
+            session.commit()
+        except IntegrityError:
+            # Another request stored it first; both counted the same tallies
+            session.rollback()
+            final = session.get(PollFinalResult, poll_id)
+
+    entry = (PollResult.model_validate(final.result), final.etag)
+    _final_results.set(poll_id, entry)
+    return entry
+
+
+def forget_final_result(poll_id: UUID) -> None:
+    _final_results.pop(poll_id)
@@ -0,0 +1,37 @@
+from enum import Enum
+
+from sqlalchemy import literal_column
+from sqlmodel import func, case
+from sqlalchemy.sql import or_
+
+from models.poll import Poll
+
+
+class SearchMode(str, Enum):
+    contains = "contains"
+    ranked = "ranked"
+
+
+# Generated tsvector column maintained by Postgres, see the search index migration
+search_vector = literal_column("poll.search_vector")
+
+
+def search_clause(search: str):
+    """Substring match on title or description, served by the trigram indexes."""
+    pattern = f"%{search}%"
+    return or_(Poll.title.ilike(pattern), Poll.description.ilike(pattern))
+
+
+def ranked_search(dialect_name: str, search: str):
+    """Return the filter and rank expression of a ranked full-text search.
+
+    Postgres matches the indexed `search_vector`; other databases (SQLite in
+    local runs) fall back to a substring match ranking title hits first.
+    """
+    if dialect_name == "postgresql":
+        query = func.websearch_to_tsquery("simple", search)
+        return search_vector.op("@@")(query), func.ts_rank_cd(search_vector, query)
+
+    pattern = f"%{search}%"
+    rank = case((Poll.title.ilike(pattern), 2.0), else_=1.0)
+    return search_clause(search), rank
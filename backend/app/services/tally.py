@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from uuid import UUID
+
+from sqlmodel import Session, select, func, update
+
+from models.poll import Poll, PollOption
+from models.vote import Vote
+
+
+@dataclass
+class TallyDrift:
+    table: str
+    id: UUID
+    stored: int
+    actual: int
+
+
+def record_vote(session: Session, poll_id: UUID, option_id: UUID) -> None:
+    """Bump the option and poll tallies inside the caller's vote transaction."""
+    session.exec(
+        update(PollOption)
+        .where(PollOption.id == option_id)
+        .values(total_votes=PollOption.total_votes + 1)
+    )
+    session.exec(
+        update(Poll)
+        .where(Poll.id == poll_id)
+        .values(total_votes=Poll.total_votes + 1)
+    )
+
+
+def find_tally_drift(session: Session) -> list[TallyDrift]:
+    """Compare the stored tallies against a full count of the vote table."""
+    option_counts = (
+        select(Vote.option_id, func.count(Vote.id).label("actual"))
+        .group_by(Vote.option_id)
+        .subquery()
+    )
+    option_rows = session.exec(
+        select(PollOption.id, PollOption.total_votes,
+               func.coalesce(option_counts.c.actual, 0))
+        .outerjoin(option_counts, option_counts.c.option_id == PollOption.id)
+        .where(PollOption.total_votes != func.coalesce(option_counts.c.actual, 0))
+    ).all()
+
+    poll_counts = (
+        select(PollOption.poll_id, func.count(Vote.id).label("actual"))
+        .join(Vote, Vote.option_id == PollOption.id)
+        .group_by(PollOption.poll_id)
+        .subquery()
+    )
+    poll_rows = session.exec(
+        select(Poll.id, Poll.total_votes,
+               func.coalesce(poll_counts.c.actual, 0))
+        .outerjoin(poll_counts, poll_counts.c.poll_id == Poll.id)
+        .where(Poll.total_votes != func.coalesce(poll_counts.c.actual, 0))
+    ).all()
+
+    return (
+        [TallyDrift("polloption", id, stored, actual)
+         for id, stored, actual in option_rows]
+        + [TallyDrift("poll", id, stored, actual)
+           for id, stored, actual in poll_rows]
+    )
+
+
+def reconcile_tallies(session: Session, fix: bool = False) -> list[TallyDrift]:
+    """Report drifted tallies and, with `fix`, recount them from the vote table."""
+    drift = find_tally_drift(session)
+    if fix and drift:
+        # Recount in the UPDATE itself so votes cast since the scan are kept
+        option_ids = [item.id for item in drift if item.table == "polloption"]
+        poll_ids = [item.id for item in drift if item.table == "poll"]
+        if option_ids:
+            session.exec(
+                update(PollOption)
+                .where(PollOption.id.in_(option_ids))
+                .values(total_votes=select(func.count(Vote.id))
+                        .where(Vote.option_id == PollOption.id)
+                        .scalar_subquery())
+            )
+        if poll_ids:
+            session.exec(
+                update(Poll)
+                .where(Poll.id.in_(poll_ids))
+                .values(total_votes=select(func.count(Vote.id))
+                        .join(PollOption, PollOption.id == Vote.option_id)
+                        .where(PollOption.poll_id == Poll.id)
+                        .scalar_subquery())
+            )
+        session.commit()
+    return drift
@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from core.config import settings
+from core.db import engine, is_transient_conflict
+from core.metrics import Gauge, Histogram
+from models.common import AuthUser
+from services.voting import PendingVote, VoteResult, cast_vote, cast_votes
+
+logger = logging.getLogger(__name__)
+
+vote_batch_size = Histogram("vote_writer_batch_size", "Votes written per group commit",
+                            buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+
+class VoteWriter:
+    """Write-behind vote ingestion with group commit.
+
+    Submitted votes are queued and a writer thread records them in batches
+    of up to `batch_size`, waiting at most `linger` seconds for a batch to
+    fill. Each batch is one statement and one commit; a vote's future
+    resolves with its VoteResult only once that commit has succeeded.
+    """
+
+    def __init__(self, engine: Engine, batch_size: int, linger: float, max_queued: int,
+                 retries: int = 0):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retries = retries
+        self._queue: queue.Queue[tuple[PendingVote, Future] | None] = queue.Queue(max_queued)
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="vote-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write out every vote queued so far and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, option_id: UUID, user: AuthUser) -> Future:
+        """Queue a vote; raises queue.Full when the writer is too far behind."""
+        future = Future()
+        vote = PendingVote(option_id=option_id, user=user, now=datetime.now(timezone.utc))
+        self._queue.put_nowait((vote, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write(batch)
+                    return
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: list[tuple[PendingVote, Future]]) -> None:
+        votes = [vote for vote, _ in batch]
+        vote_batch_size.observe(len(votes))
+        try:
+            if self.engine.dialect.name == "postgresql":
+                results = self._write_batch(votes)
+            else:
+                # No batched statement elsewhere (SQLite in local runs)
+                results = []
+                for vote in votes:
+                    with Session(self.engine) as session:
+                        results.append(cast_vote(session, vote.option_id, vote.user, vote.now))
+                        session.commit()
+        except Exception as e:
+            logger.exception("Could not write a batch of %d votes", len(votes))
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write_batch(self, votes: list[PendingVote]) -> list[VoteResult]:
+        # A batch Postgres aborted for a deadlock or serialization failure
+        # wrote nothing and is simply run again
+        for attempt in range(self.retries + 1):
+            try:
+                with Session(self.engine) as session:
+                    results = cast_votes(session, votes)
+                    session.commit()
+                return results
+            except Exception as e:
+                if attempt == self.retries or not is_transient_conflict(e):
+                    raise
+                logger.warning("Retrying a batch of %d votes after a conflict: %s", len(votes), e)
+
+
+vote_writer = VoteWriter(engine, batch_size=settings.VOTE_BATCH_SIZE,
+                         linger=settings.VOTE_BATCH_LINGER, max_queued=settings.VOTE_QUEUE_SIZE,
+                         retries=settings.VOTE_BATCH_RETRIES)
+Gauge("vote_writer_queued", "Votes waiting for the writer", function=lambda: len(vote_writer))
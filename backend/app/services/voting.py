@@ -0,0 +1,351 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from enum import Enum
+from uuid import UUID, uuid4
+
+from sqlalchemy import DateTime, Integer, Uuid, bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select, text
+
+from models.common import AuthUser
+from models.poll import Poll, PollOption
+from models.vote import Vote
+from services.active_polls import active_polls
+from services.eligibility import visible_to
+from services.tally import record_vote
+
+
+class VoteResult(str, Enum):
+    accepted = "accepted"
+    option_not_found = "option_not_found"
+    forbidden = "forbidden"
+    not_started = "not_started"
+    ended = "ended"
+    duplicate = "duplicate"
+
+
+def _refusal(can_vote: bool, not_started: bool, ended: bool) -> VoteResult | None:
+    if not can_vote:
+        return VoteResult.forbidden
+    if not_started:
+        return VoteResult.not_started
+    if ended:
+        return VoteResult.ended
+    return None
+
+
+def _check_vote(session: Session, option_id: UUID, user: AuthUser, now: datetime,
+                registry: bool = True) -> tuple[UUID | None, VoteResult | None]:
+    """Return the option's poll id and why the vote would be refused, if it would.
+
+    Options of polls that have not ended are checked in memory (see
+    services.active_polls and `_registry_refusal`) unless `registry` is
+    false, any other with a query.
+    """
+    known = registry and active_polls.check(session, option_id, user, now)
+    if known:
+        return known[0], _registry_refusal(session, option_id, user, now, known)
+    row = session.exec(
+        select(Poll.id, visible_to(user), Poll.start_time > now, Poll.end_time < now)
+        .join(PollOption, PollOption.poll_id == Poll.id)
+        .where(PollOption.id == option_id)
+    ).first()
+    if row is None:
+        return None, VoteResult.option_not_found
+    poll_id, *checks = row
+    return poll_id, _refusal(*checks)
+
+
+def _registry_refusal(session: Session, option_id: UUID, user: AuthUser, now: datetime,
+                      known: tuple | None) -> VoteResult | None:
+    """Why the vote is refused going by the registry's `known` checks, if it is.
+
+    Roll ranges added on another worker only reach this one's registry with
+    their notification, so a voter it finds ineligible, or a poll it finds
+    not started, is checked again in the database. When the database lets
+    the vote through, the registry reads that poll again.
+    """
+    refusal = _refusal(*known[1:]) if known else None
+    if refusal in (VoteResult.forbidden, VoteResult.not_started):
+        _, refusal = _check_vote(session, option_id, user, now, registry=False)
+        if refusal is None:
+            active_polls.polls_changed({known[0]})
+    return refusal
+
+
+def _not_inserted(session: Session, option_id: UUID, user: AuthUser, now: datetime,
+                  known: tuple | None) -> VoteResult:
+    """Why the insert statement recorded nothing for a vote it was given.
+
+    The database decides: a vote the registry let through (`known`) may be
+    for a poll changed behind its back, so it is not assumed to be a repeat.
+    A refusal the registry missed has it read that poll again.
+    """
+    _, reason = _check_vote(session, option_id, user, now, registry=False)
+    if reason and known is not None:
+        active_polls.polls_changed({known[0]})
+    return reason or VoteResult.duplicate
+
+
+# The checks, the insert and both tally updates as one statement. The SELECT
+# only yields the option when it exists and its poll is open and visible to
+# the voter, ON CONFLICT drops a repeat vote, and the row comes back only
+# when the vote was recorded. Written as SQL because SQLAlchemy cannot cache
+# the compiled form of a Postgres INSERT ... ON CONFLICT. The poll id is
+# sent on the poll_changes channel for live tallies (services.live).
+INSERT_VOTE = text("""
+    WITH inserted AS (
+        INSERT INTO vote (id, option_id, poll_id, voter_email_hash, timestamp)
+        SELECT :vote_id, polloption.id, polloption.poll_id, :voter_email_hash, :now
+        FROM polloption
+        JOIN poll ON poll.id = polloption.poll_id
+        WHERE polloption.id = :option_id
+          AND (poll.is_private IS false
+               OR poll.creator_email = :email
+               OR poll.allowed_rolls @> :roll)
+          AND poll.start_time <= :now
+          AND poll.end_time >= :now
+        ON CONFLICT ON CONSTRAINT unique_voter_poll DO NOTHING
+        RETURNING option_id, poll_id
+    ), locked_options AS (
+        -- Locked option first, then poll, like INSERT_VOTES does, so single
+        -- and batched votes never wait for each other in opposite orders
+        SELECT id FROM polloption
+        WHERE id IN (SELECT option_id FROM inserted)
+        FOR NO KEY UPDATE
+    ), locked_polls AS (
+        SELECT id FROM poll
+        WHERE id IN (SELECT poll_id FROM inserted)
+          AND (SELECT count(*) FROM locked_options) IS NOT NULL
+        FOR NO KEY UPDATE
+    ), option_tally AS (
+        UPDATE polloption SET total_votes = total_votes + 1
+        WHERE id IN (SELECT option_id FROM inserted)
+          AND (SELECT count(*) FROM locked_polls) IS NOT NULL
+    ), poll_tally AS (
+        UPDATE poll SET total_votes = total_votes + 1
+        WHERE id IN (SELECT poll_id FROM inserted)
+          AND (SELECT count(*) FROM locked_polls) IS NOT NULL
+    )
+    SELECT poll_id, pg_notify('poll_changes', poll_id::text) FROM inserted
+""").bindparams(
+    bindparam("vote_id", type_=Uuid()),
+    bindparam("option_id", type_=Uuid()),
+    bindparam("roll", type_=Integer()),
+    bindparam("now", type_=DateTime(timezone=True)),
+)
+
+
+# INSERT_VOTE for many votes at once, each tally bumped by its number of new votes
+INSERT_VOTES = text("""
+    WITH batch AS (
+        SELECT *
+        FROM unnest(CAST(:vote_ids AS uuid[]), CAST(:option_ids AS uuid[]),
+                    CAST(:voter_email_hashes AS text[]), CAST(:emails AS text[]),
+                    CAST(:rolls AS integer[]), CAST(:nows AS timestamptz[]))
+             WITH ORDINALITY AS batch (vote_id, option_id, voter_email_hash, email, roll, now, position)
+    ), inserted AS (
+        INSERT INTO vote (id, option_id, poll_id, voter_email_hash, timestamp)
+        SELECT batch.vote_id, polloption.id, polloption.poll_id, batch.voter_email_hash, batch.now
+        FROM batch
+        JOIN polloption ON polloption.id = batch.option_id
+        JOIN poll ON poll.id = polloption.poll_id
+        WHERE (poll.is_private IS false
+               OR poll.creator_email = batch.email
+               OR poll.allowed_rolls @> batch.roll)
+          AND poll.start_time <= batch.now
+          AND poll.end_time >= batch.now
+        ORDER BY batch.position
+        ON CONFLICT ON CONSTRAINT unique_voter_poll DO NOTHING
+        RETURNING id, option_id, poll_id
+    ), locked_options AS (
+        -- The tally rows are locked in id order, options before polls, before
+        -- any is updated, so concurrent vote statements wait for each other
+        -- instead of deadlocking. NO KEY UPDATE is what the UPDATEs take and
+        -- leaves the foreign key checks of other votes' inserts alone
+        SELECT id FROM polloption
+        WHERE id IN (SELECT option_id FROM inserted)
+        ORDER BY id
+        FOR NO KEY UPDATE
+    ), locked_polls AS (
+        SELECT id FROM poll
+        WHERE id IN (SELECT poll_id FROM inserted)
+          AND (SELECT count(*) FROM locked_options) IS NOT NULL
+        ORDER BY id
+        FOR NO KEY UPDATE
+    ), option_tally AS (
+        UPDATE polloption SET total_votes = total_votes + counts.votes
+        FROM (SELECT option_id, count(*) AS votes FROM inserted GROUP BY option_id) AS counts
+        WHERE polloption.id = counts.option_id
+          AND (SELECT count(*) FROM locked_polls) IS NOT NULL
+    ), poll_tally AS (
+        UPDATE poll SET total_votes = total_votes + counts.votes
+        FROM (SELECT poll_id, count(*) AS votes FROM inserted GROUP BY poll_id) AS counts
+        WHERE poll.id = counts.poll_id
+          AND (SELECT count(*) FROM locked_polls) IS NOT NULL
+    )
+    -- Identical notifications are delivered once per commit, so each poll
+    -- in the batch is announced once
+    SELECT id, pg_notify('poll_changes', poll_id::text) FROM inserted
+""")
+
+
+@dataclass
+class PendingVote:
+    option_id: UUID
+    user: AuthUser
+    # When the vote was submitted, which decides whether the poll was open
+    now: datetime
+
+
+def cast_vote(session: Session, option_id: UUID, user: AuthUser,
+              now: datetime | None = None) -> VoteResult:
+    """Record the user's vote for an option within the caller's transaction.
+
+    On Postgres the checks, the insert and the tally updates are a single
+    statement. A vote for a poll in the active poll registry is checked in
+    memory first, so one for an ended poll never reaches the database, and
+    other refusals are confirmed there (see `_registry_refusal`); otherwise
+    only a refused vote costs a second query to find out why. Other
+    databases check first and then insert.
+    """
+    now = now or datetime.now(timezone.utc)
+    if session.get_bind().dialect.name == "postgresql":
+        known = active_polls.check(session, option_id, user, now)
+        refusal = _registry_refusal(session, option_id, user, now, known)
+        if refusal:
+            return refusal
+        row = session.exec(INSERT_VOTE, params={
+            "vote_id": uuid4(), "option_id": option_id, "voter_email_hash": user.email_hash,
+            "email": user.email, "roll": user.roll, "now": now,
+        }).first()
+        if row:
+            return VoteResult.accepted
+        return _not_inserted(session, option_id, user, now, known)
+
+    poll_id, reason = _check_vote(session, option_id, user, now)
+    if reason:
+        return reason
+    try:
+        session.add(Vote(option_id=option_id, poll_id=poll_id,
+                         voter_email_hash=user.email_hash))
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        return VoteResult.duplicate
+    record_vote(session, poll_id, option_id)
+    return VoteResult.accepted
+
+
+def _insert_votes(session: Session, votes: list[PendingVote]) -> list[bool]:
+    """Run INSERT_VOTES and tell, in the order of `votes`, which were recorded."""
+    if not votes:
+        return []
+    vote_ids = [str(uuid4()) for _ in votes]
+    inserted = {str(vote_id) for vote_id in session.exec(INSERT_VOTES, params={
+        "vote_ids": vote_ids,
+        "option_ids": [str(vote.option_id) for vote in votes],
+        "voter_email_hashes": [vote.user.email_hash for vote in votes],
+        "emails": [vote.user.email for vote in votes],
+        "rolls": [vote.user.roll for vote in votes],
+        "nows": [vote.now for vote in votes],
+    }).scalars()}
+    return [vote_id in inserted for vote_id in vote_ids]
+
+
+def cast_votes(session: Session, votes: list[PendingVote]) -> list[VoteResult]:
+    """Record a batch of votes in one Postgres statement, within the caller's transaction.
+
+    Results are in the order of `votes`. When two votes in the batch
+    conflict, the first one wins and the other is reported as a duplicate.
+    Votes the active poll registry refuses are left out of the statement.
+    """
+    known = [active_polls.check(session, vote.option_id, vote.user, vote.now) for vote in votes]
+    refusals = [_registry_refusal(session, vote.option_id, vote.user, vote.now, checks)
+                for vote, checks in zip(votes, known)]
+    inserted = iter(_insert_votes(session, [vote for vote, refusal in zip(votes, refusals) if not refusal]))
+    results = []
+    for vote, checks, refusal in zip(votes, known, refusals):
+        if refusal:
+            results.append(refusal)
+        elif next(inserted):
+            results.append(VoteResult.accepted)
+        else:
+            results.append(_not_inserted(session, vote.option_id, vote.user, vote.now, checks))
+    return results
+
+
+def cast_ballot(session: Session, option_ids: list[UUID], user: AuthUser,
+                now: datetime | None = None) -> list[VoteResult]:
+    """Record one user's votes for several options, within the caller's transaction.
+
+    Options are checked against their polls in memory when the active poll
+    registry knows them and in one query otherwise, and the votes that pass
+    are inserted together: on Postgres as one INSERT_VOTES statement,
+    elsewhere after one lookup of the polls already voted in. Results are in
+    the order of `option_ids`; a second option of the same poll is a
+    duplicate.
+    """
+    now = now or datetime.now(timezone.utc)
+    checks = {}
+    for option_id in set(option_ids):
+        row = active_polls.check(session, option_id, user, now)
+        if row is not None:
+            checks[option_id] = row
+    unknown = set(option_ids) - checks.keys()
+    if unknown:
+        checks.update(
+            (option_id, row)
+            for option_id, *row in session.exec(
+                select(PollOption.id, Poll.id, visible_to(user), Poll.start_time > now, Poll.end_time < now)
+                .join(Poll, Poll.id == PollOption.poll_id)
+                .where(PollOption.id.in_(unknown))
+            ).all()
+        )
+
+    results: list[VoteResult | None] = []
+    pending: dict[UUID, tuple[int, UUID]] = {}
+    for i, option_id in enumerate(option_ids):
+        if option_id not in checks:
+            results.append(VoteResult.option_not_found)
+            continue
+        poll_id, *poll_checks = checks[option_id]
+        refusal = (_refusal(*poll_checks) if option_id in unknown
+                   else _registry_refusal(session, option_id, user, now, checks[option_id]))
+        if refusal:
+            results.append(refusal)
+        elif poll_id in pending:
+            results.append(VoteResult.duplicate)
+        else:
+            pending[poll_id] = (i, option_id)
+            results.append(None)
+
+    if pending and session.get_bind().dialect.name == "postgresql":
+        votes = [PendingVote(option_id=option_id, user=user, now=now)
+                 for _, option_id in pending.values()]
+        # The statement checks each vote again
+        for (i, option_id), inserted in zip(pending.values(), _insert_votes(session, votes)):
+            results[i] = VoteResult.accepted if inserted else _not_inserted(
+                session, option_id, user, now, None if option_id in unknown else checks[option_id])
+    elif pending:
+        voted = set(session.exec(
+            select(Vote.poll_id)
+            .where(Vote.voter_email_hash == user.email_hash, Vote.poll_id.in_(pending))
+        ).all())
+        for poll_id, (i, option_id) in pending.items():
+            if poll_id in voted:
+                results[i] = VoteResult.duplicate
+            else:
+                session.add(Vote(option_id=option_id, poll_id=poll_id,
+                                 voter_email_hash=user.email_hash))
+                results[i] = VoteResult.accepted
+        try:
+            session.flush()
+        except IntegrityError:
+            # A vote of the same user landed in between; start over seeing it
+            session.rollback()
+            return cast_ballot(session, option_ids, user, now)
+        for poll_id, (i, option_id) in pending.items():
+            if results[i] is VoteResult.accepted:
+                record_vote(session, poll_id, option_id)
+    return results
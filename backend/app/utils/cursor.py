@@ -0,0 +1,31 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+
+def encode_cursor(key: str, value, id: UUID) -> str:
+    """Encode the sort key, sort value and id of the last row of a page."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([key, value, str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str, python_type: type) -> tuple:
+    """Decode a cursor made by `encode_cursor` for the same sort key.
+
+    Raises ValueError when the cursor is malformed or belongs to another sort.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_key, value, id = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_key != key:
+            raise ValueError("cursor belongs to a different sort order")
+        if python_type is datetime:
+            value = datetime.fromisoformat(value)
+        else:
+            value = python_type(value)
+        return value, UUID(id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor. {e}") from e
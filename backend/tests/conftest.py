@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# The settings are read on import, so the app runs on a throwaway SQLite
+# database unless DATABASE_URL points elsewhere
+os.environ.setdefault("PROJECT_NAME", "cavs-test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(
+    tempfile.mkdtemp(prefix="cavs-test-"), "test.sqlite"))
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The app with X-Bench-Roll authentication (see benchmarks.harness)."""
+    from benchmarks.harness import load_app
+
+    return load_app()
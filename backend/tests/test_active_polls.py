@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, select
+
+from benchmarks.harness import API, bench_email, client_for, seed_polls
+from core.db import engine
+from models.common import AuthUser
+from models.poll import Poll, PollOption, RollRange
+from services import poll_events
+from services.active_polls import active_polls
+from services.eligibility import refresh_allowed_rolls
+from services.poll_import import import_polls
+
+STUDENT = 1904001
+# Let into CREATOR's private poll behind the registry's back
+CREATOR = 2204000
+LATECOMER = 2204001
+
+
+@pytest.fixture(scope="module")
+def polls(app):
+    """An ordinary poll, and a private one with a legacy roll range that ends before it starts."""
+    good_id, bad_id = seed_polls(2, private_share=0, prefix="active polls")
+    with Session(engine) as session:
+        session.get(Poll, bad_id).is_private = True
+        legacy = RollRange(poll_id=bad_id, start=STUDENT + 10, end=STUDENT)
+        session.add(legacy)
+        session.commit()
+        options = {poll_id: session.exec(select(PollOption.id).where(PollOption.poll_id == poll_id)).first()
+                   for poll_id in (good_id, bad_id)}
+        # Written behind the app's back, so the caches are told here
+        poll_events._dispatch({good_id, bad_id})
+        yield good_id, bad_id, options
+        session.delete(legacy)
+        session.commit()
+    poll_events._dispatch({bad_id})
+
+
+def test_unmergeable_poll_is_left_to_the_database(polls):
+    good_id, bad_id, options = polls
+    active_polls.load()
+    student = AuthUser(email=bench_email(STUDENT), full_name="student", roll=STUDENT)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        assert active_polls.check(session, options[good_id], student, now) == (good_id, True, False, False)
+        assert active_polls.check(session, options[bad_id], student, now) is None
+
+
+@pytest.fixture
+def latecomer_option(app):
+    """An option of a private poll the registry holds, which LATECOMER has since been let into."""
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        poll_id = import_polls(session, bench_email(CREATOR), [{
+            "title": "active polls latecomer", "description": "private", "is_private": True,
+            "start_time": now - timedelta(hours=1), "end_time": now + timedelta(days=1),
+            "option_texts": ["a", "b"], "roll_ranges": [(CREATOR, CREATOR)]}])[0].poll_id
+        active_polls.load()
+        # As another worker would, before its notification arrives here
+        session.add(RollRange(poll_id=poll_id, start=LATECOMER, end=LATECOMER))
+        session.flush()
+        refresh_allowed_rolls(session, poll_id)
+        session.commit()
+        option_id = session.exec(select(PollOption.id).where(PollOption.poll_id == poll_id)).first()
+    latecomer = AuthUser(email=bench_email(LATECOMER), full_name="latecomer", roll=LATECOMER)
+    with Session(engine) as session:
+        assert active_polls.check(session, option_id, latecomer, now)[1] is False
+    yield option_id
+    poll_events._dispatch({poll_id})
+
+
+@pytest.mark.parametrize("path, body", [
+    ("vote", lambda option_id: {"option_id": str(option_id)}),
+    ("ballot", lambda option_id: {"option_ids": [str(option_id)]}),
+])
+def test_registry_refusal_is_confirmed_by_the_database(app, latecomer_option, path, body):
+    async def post():
+        async with client_for(app) as client:
+            return await client.post(f"{API}/votes/{path}", json=body(latecomer_option),
+                                     headers={"X-Bench-Roll": str(LATECOMER)})
+    response = asyncio.run(post())
+    assert response.status_code == 200, response.text
+    if path == "ballot":
+        assert response.json()["accepted"] == 1
+
+    # The registry was told to read the poll again
+    latecomer = AuthUser(email=bench_email(LATECOMER), full_name="latecomer", roll=LATECOMER)
+    with Session(engine) as session:
+        assert active_polls.check(session, latecomer_option, latecomer, datetime.now(timezone.utc))[1] is True
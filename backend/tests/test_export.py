@@ -0,0 +1,78 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api import deps
+from benchmarks.harness import API, bench_email
+from core.config import settings
+
+CREATOR = 1904001
+
+
+@pytest.fixture(scope="module")
+def ended_poll(app):
+    from sqlmodel import Session, select
+
+    from core.db import engine
+    from models.common import AuthUser
+    from models.poll import PollOption
+    from services.poll_import import import_polls
+    from services.voting import VoteResult, cast_vote
+
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        poll_id, = (result.poll_id for result in import_polls(session, bench_email(CREATOR), [{
+            "title": "export", "description": "over", "option_texts": ["a", "b"],
+            "start_time": now - timedelta(days=2), "end_time": now - timedelta(days=1)}]))
+        option_ids = session.exec(select(PollOption.id).where(PollOption.poll_id == poll_id)).all()
+        for i in range(20):
+            voter = AuthUser(email=bench_email(2100000 + i), full_name="Voter", roll=2100000 + i)
+            assert cast_vote(session, option_ids[i % 2], voter, now - timedelta(days=1, hours=1)) \
+                is VoteResult.accepted
+        session.commit()
+    return poll_id
+
+
+def free_slots_while_sent(app, path: str, roll: int = CREATOR) -> tuple[int, list[int]]:
+    """The status of `path`, and the free database slots as each body chunk was sent."""
+    status, free = None, []
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            # The client stays connected
+            await asyncio.Event().wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            free.append(deps._db_slots.value)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": f"{API}{path}", "raw_path": f"{API}{path}".encode(),
+             "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1),
+             "headers": [(b"x-bench-roll", str(roll).encode())]}
+    asyncio.run(app(scope, receive, send))
+    return status, free
+
+
+@pytest.mark.parametrize("export", ["votes", "results"])
+def test_export_holds_a_database_slot_while_streaming(app, ended_poll, monkeypatch, export):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 5)
+    status, free = free_slots_while_sent(app, f"/polls/{ended_poll}/export/{export}")
+    assert status == 200
+    # Every chunk with rows is read while the slot is held
+    assert free[:-1] and set(free[:-1]) == {settings.db_max_concurrency - 1}
+    assert deps._db_slots.value == settings.db_max_concurrency
+
+
+def test_refused_export_releases_its_slot(app, ended_poll):
+    status, _ = free_slots_while_sent(app, f"/polls/{ended_poll}/export/votes", roll=CREATOR + 1)
+    assert status == 403
+    assert deps._db_slots.value == settings.db_max_concurrency
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi.responses import JSONResponse
+from pydantic_core import to_jsonable_python
+
+from api.responses import ORJSONResponse
+from benchmarks.harness import API, bench_email, client_for, seed_polls
+from core.config import settings
+
+# Votes in the polls; OTHER is in the same cohort and sees the same polls
+VOTER = 1904001
+OTHER = 1904002
+
+
+class AsyncpgUUID(UUID):
+    """Stands in for asyncpg's UUID subclass, which orjson does not take as is."""
+
+
+@pytest.fixture(scope="module")
+def polls(app):
+    from sqlmodel import Session
+
+    from core.db import engine
+    from services.poll_import import import_polls
+
+    # Public ones first, so the voter can vote in and view them
+    poll_ids = (seed_polls(2, private_share=0, prefix="fast json")
+                + seed_polls(30, private_share=0.3, prefix="fast json"))
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        ended_id, = (result.poll_id for result in import_polls(session, bench_email(VOTER), [{
+            "title": "fast json ended", "description": "over",
+            "start_time": now - timedelta(days=2), "end_time": now - timedelta(days=1),
+            "option_texts": ["a", "b", "c"]}]))
+
+    async def vote():
+        async with client_for(app) as client:
+            options = (await client.get(f"{API}/polls/{poll_ids[0]}/options",
+                                        headers={"X-Bench-Roll": str(VOTER)})).json()["data"]
+            response = await client.post(f"{API}/votes/vote", json={"option_id": options[0]["id"]},
+                                         headers={"X-Bench-Roll": str(VOTER)})
+            assert response.status_code == 200, response.text
+    asyncio.run(vote())
+    return poll_ids, ended_id
+
+
+def bodies(app, monkeypatch, path: str, roll: int = VOTER) -> dict[bool, tuple[int, bytes]]:
+    """The response to `path` with FAST_JSON off and on."""
+    async def get():
+        async with client_for(app) as client:
+            response = await client.get(f"{API}{path}", headers={"X-Bench-Roll": str(roll)})
+        return response.status_code, response.content
+
+    rendered = {}
+    for fast in (False, True):
+        monkeypatch.setattr(settings, "FAST_JSON", fast)
+        rendered[fast] = asyncio.run(get())
+    return rendered
+
+
+@pytest.mark.parametrize("path", [
+    "/polls/?limit=20",
+    "/polls/?limit=20&with_count=false",
+    "/polls/public?limit=20",
+    "/polls/ongoing-polls?limit=20",
+    "/polls/ended-polls?limit=20",
+])
+def test_feeds_render_identically(app, polls, monkeypatch, path):
+    # The second user is served the page the first one left in the cohort's cache
+    for roll in (VOTER, OTHER):
+        rendered = bodies(app, monkeypatch, path, roll)
+        assert rendered[False][0] == 200
+        assert rendered[True] == rendered[False]
+
+
+def test_poll_renders_identically(app, polls, monkeypatch):
+    poll_ids, _ = polls
+    for poll_id in poll_ids[:2]:
+        rendered = bodies(app, monkeypatch, f"/polls/{poll_id}")
+        assert rendered[False][0] == 200
+        assert rendered[True] == rendered[False]
+
+
+def test_batch_renders_identically(app, polls, monkeypatch):
+    poll_ids, ended_id = polls
+    query = "&".join(f"ids={poll_id}" for poll_id in [*poll_ids[:10], ended_id])
+    rendered = bodies(app, monkeypatch, f"/polls/batch?{query}")
+    assert rendered[False][0] == 200
+    assert rendered[True] == rendered[False]
+
+
+def test_result_renders_identically(app, polls, monkeypatch):
+    _, ended_id = polls
+    rendered = bodies(app, monkeypatch, f"/polls/{ended_id}/result")
+    assert rendered[False][0] == 200
+    assert rendered[True] == rendered[False]
+
+
+@pytest.mark.parametrize("payload", [
+    {"id": uuid4(), "selected_option": None, "count": 3, "next_cursor": None},
+    {"id": AsyncpgUUID(int=uuid4().int), "options": [{"id": AsyncpgUUID(int=1), "votes": 0}]},
+    {"created_at": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+     "start_time": datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc),
+     "end_time": datetime(2024, 5, 2, 8, 0)},
+    {"title": "Ünïcode “quotes” and \\ slashes", "description": None, "is_private": False},
+])
+def test_orjson_response_matches_json_response(payload):
+    # What FastAPI renders after dumping a response model in JSON mode
+    assert ORJSONResponse(payload).body == JSONResponse(to_jsonable_python(payload)).body
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from benchmarks.harness import API, client_for, seed_polls
+from core.db import count_queries
+
+# More polls than the largest page in every feed they show up in
+FEEDS = ("/polls/", "/polls/public", "/polls/popular-polls", "/polls/ongoing-polls")
+
+
+@pytest.fixture(scope="module")
+def polls(app):
+    return seed_polls(150, private_share=0.2, prefix="query counts")
+
+
+def statements(app, path: str, **params) -> int:
+    async def get():
+        async with client_for(app) as client:
+            response = await client.get(f"{API}{path}", params=params)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    with count_queries() as counter:
+        body = asyncio.run(get())
+    assert body["next_cursor"], "the page should not be the last one"
+    return counter.count
+
+
+@pytest.mark.parametrize("feed", FEEDS)
+def test_feed_page_size_does_not_change_query_count(app, polls, feed):
+    # Loads what the first request of any feed loads once (the cohorts)
+    statements(app, feed, limit=5)
+    assert statements(app, feed, limit=1) == statements(app, feed, limit=50)
+
+
+@pytest.mark.parametrize("feed", FEEDS)
+def test_sparse_feed_page_size_does_not_change_query_count(app, polls, feed):
+    statements(app, feed, limit=5, fields="title,options")
+    assert (statements(app, feed, limit=1, fields="title,options")
+            == statements(app, feed, limit=50, fields="title,options"))
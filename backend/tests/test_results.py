@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from benchmarks.harness import API, bench_email, client_for
+from core.config import settings
+
+CREATOR = 1904001
+
+
+@pytest.fixture(scope="module")
+def polls(app):
+    """Ids of a poll that ended long ago, one that just ended and one still open."""
+    from sqlmodel import Session
+
+    from core.db import engine
+    from services.poll_import import import_polls
+
+    now = datetime.now(timezone.utc)
+    windows = {
+        "settled": (now - timedelta(days=2), now - timedelta(days=1)),
+        "settling": (now - timedelta(days=1), now - timedelta(seconds=1)),
+        "open": (now - timedelta(days=1), now + timedelta(days=1)),
+    }
+    with Session(engine) as session:
+        results = import_polls(session, bench_email(CREATOR), [
+            {"title": f"results {name}", "description": name, "start_time": start, "end_time": end,
+             "option_texts": ["a", "b"]}
+            for name, (start, end) in windows.items()])
+    return dict(zip(windows, (result.poll_id for result in results)))
+
+
+def get_result(app, poll_id):
+    async def get():
+        async with client_for(app) as client:
+            return await client.get(f"{API}/polls/{poll_id}/result", headers={"X-Bench-Roll": str(CREATOR)})
+    return asyncio.run(get())
+
+
+def test_result_of_settled_poll_is_frozen(app, polls):
+    response = get_result(app, polls["settled"])
+    assert response.status_code == 200, response.text
+    assert response.json()["total_votes"] == 0
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+def test_result_of_settling_poll_is_served_live(app, polls):
+    assert settings.RESULT_SETTLE_SECONDS > 1
+    response = get_result(app, polls["settling"])
+    assert response.status_code == 200, response.text
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+
+
+def test_result_of_open_poll_is_refused(app, polls):
+    response = get_result(app, polls["open"])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Poll has not ended yet"
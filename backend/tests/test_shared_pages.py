@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.routes import poll as poll_routes
+from benchmarks.harness import API, bench_email, client_for, seed_polls
+from core.config import settings
+from services import poll_events
+
+# Two students of the same cohort, and a voter from another batch
+FIRST = 1904001
+SECOND = 1904002
+VOTER = 2004001
+
+
+@pytest.fixture(scope="module")
+def poll_id(app):
+    poll_id = seed_polls(3, private_share=0, prefix="shared pages")[-1]
+    # Seeding writes behind the app's back, without announcing the new polls
+    poll_routes._forget_shared_pages(None)
+    return poll_id
+
+
+@pytest.fixture
+def secret_poll(app, poll_id):
+    """A poll private to FIRST alone, at the top of the feeds, that the caches have not heard of."""
+    from sqlmodel import Session
+
+    from core.db import engine
+    from models.poll import Poll, RollRange
+    from services.eligibility import refresh_allowed_rolls
+
+    # The cohorts are loaded before the poll exists
+    get(app, "/polls/?limit=5", FIRST)
+    now = datetime.now(timezone.utc)
+    with Session(engine) as session:
+        poll = Poll(title="shared pages secret", description="for one student", is_private=True,
+                    creator_email=bench_email(VOTER), start_time=now - timedelta(hours=1),
+                    end_time=now + timedelta(days=1), total_votes=10 ** 6)
+        session.add(poll)
+        session.flush()
+        session.add(RollRange(poll_id=poll.id, start=FIRST, end=FIRST))
+        session.flush()
+        refresh_allowed_rolls(session, poll.id)
+        session.commit()
+        yield poll.id
+        session.delete(poll)
+        session.commit()
+    poll_events._dispatch(None)
+
+
+def get(app, path: str, roll: int, headers: dict[str, str] | None = None):
+    async def request():
+        async with client_for(app) as client:
+            return await client.get(f"{API}{path}", headers={"X-Bench-Roll": str(roll), **(headers or {})})
+    return asyncio.run(request())
+
+
+def ids(response) -> list[str]:
+    return [row["id"] for row in response.json()["data"]]
+
+
+def vote(app, poll_id, roll: int) -> None:
+    async def request():
+        async with client_for(app) as client:
+            headers = {"X-Bench-Roll": str(roll)}
+            options = (await client.get(f"{API}/polls/{poll_id}/options", headers=headers)).json()["data"]
+            response = await client.post(f"{API}/votes/vote", json={"option_id": options[0]["id"]},
+                                         headers=headers)
+            assert response.status_code == 200, response.text
+    asyncio.run(request())
+
+
+def test_shared_page_shows_votes_cast_after_it_was_cached(app, poll_id, monkeypatch):
+    monkeypatch.setattr(settings, "COHORT_FEED_CACHE", True)
+    get(app, "/polls/?limit=5", FIRST)
+    vote(app, poll_id, VOTER)
+    vote(app, poll_id, SECOND)
+
+    hits = poll_routes._shared_pages.hits
+    shared = get(app, "/polls/?limit=5", SECOND)
+    assert poll_routes._shared_pages.hits == hits + 1
+
+    monkeypatch.setattr(settings, "COHORT_FEED_CACHE", False)
+    assert shared.content == get(app, "/polls/?limit=5", SECOND).content
+    row = next(row for row in shared.json()["data"] if row["id"] == str(poll_id))
+    assert row["total_votes"] == 2
+    assert row["selected_option"] is not None
+
+
+def test_poll_changes_drop_shared_pages(app, poll_id, monkeypatch):
+    monkeypatch.setattr(settings, "COHORT_FEED_CACHE", True)
+    get(app, "/polls/public?limit=5", FIRST)
+
+    async def create():
+        async with client_for(app) as client:
+            response = await client.post(f"{API}/polls/create", headers={"X-Bench-Roll": str(FIRST)},
+                                         json={"title": "shared pages created", "description": "new"})
+            assert response.status_code == 200, response.text
+            return response.json()["poll_id"]
+    created = asyncio.run(create())
+
+    assert ids(get(app, "/polls/public?limit=5", SECOND))[0] == created
+
+
+def test_shared_page_keeps_to_each_students_polls(app, secret_poll, monkeypatch):
+    monkeypatch.setattr(settings, "COHORT_FEED_CACHE", True)
+    # The cohort index still puts both students in one cohort, as on a
+    # worker the poll's announcement has not reached yet
+    poll_routes._shared_pages.clear()
+    first = get(app, "/polls/?limit=5", FIRST)
+    assert ids(first)[0] == str(secret_poll)
+
+    shared = get(app, "/polls/?limit=5", SECOND)
+    assert str(secret_poll) not in ids(shared)
+    revalidated = get(app, "/polls/?limit=5", SECOND, {"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 200
+    assert revalidated.content == shared.content
+
+    monkeypatch.setattr(settings, "COHORT_FEED_CACHE", False)
+    assert shared.content == get(app, "/polls/?limit=5", SECOND).content
@@ -0,0 +1,67 @@
+import random
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from sqlmodel import Session, func, select
+
+from benchmarks.harness import bench_email, seed_polls
+from core.db import engine
+from models.common import AuthUser
+from models.poll import Poll, PollOption
+from models.vote import Vote
+from services.voting import PendingVote, VoteResult, cast_votes
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "postgresql",
+                                reason="batches are one INSERT_VOTES statement on Postgres only")
+
+WRITERS = 16
+ROUNDS = 20
+
+
+@pytest.fixture(scope="module")
+def option_ids(app):
+    poll_ids = seed_polls(4, private_share=0, prefix="vote batches")
+    with Session(engine) as session:
+        return session.exec(select(PollOption.id).where(PollOption.poll_id.in_(poll_ids))).all()
+
+
+def test_concurrent_batches_do_not_deadlock(option_ids):
+    errors = []
+
+    def write(writer: int) -> None:
+        try:
+            for round in range(ROUNDS):
+                # Batches bump overlapping sets of tallies, each in its own order
+                options = random.sample(option_ids, random.randint(2, len(option_ids)))
+                now = datetime.now(timezone.utc)
+                votes = [PendingVote(option_id=option_id, now=now,
+                                     user=AuthUser(email=bench_email(roll), full_name="voter", roll=roll))
+                         for i, option_id in enumerate(options)
+                         for roll in [2100000 + writer * 10_000 + round * 100 + i]]
+                with Session(engine) as session:
+                    assert cast_votes(session, votes) == [VoteResult.accepted] * len(votes)
+                    session.commit()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    with Session(engine) as session:
+        for total_votes, recorded in session.exec(
+                select(PollOption.total_votes, func.count(Vote.id))
+                .join(Vote, Vote.option_id == PollOption.id, isouter=True)
+                .where(PollOption.id.in_(option_ids))
+                .group_by(PollOption.id)).all():
+            assert total_votes == recorded
+        for total_votes, recorded in session.exec(
+                select(Poll.total_votes, func.count(Vote.id))
+                .join(Vote, Vote.poll_id == Poll.id)
+                .where(Poll.id.in_(select(PollOption.poll_id).where(PollOption.id.in_(option_ids))))
+                .group_by(Poll.id)).all():
+            assert total_votes == recorded
@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.harness import bench_email
+from core.db import engine, is_transient_conflict
+from models.common import AuthUser
+from services import vote_writer as vote_writer_module
+from services.vote_writer import VoteWriter
+from services.voting import VoteResult
+
+
+class DriverError(Exception):
+    """Carries an SQLSTATE the way psycopg2 (pgcode) or asyncpg (sqlstate) does."""
+
+    def __init__(self, pgcode=None, sqlstate=None):
+        super().__init__(pgcode or sqlstate)
+        self.pgcode = pgcode
+        self.sqlstate = sqlstate
+
+
+def conflict(**code) -> OperationalError:
+    return OperationalError("INSERT_VOTES", {}, DriverError(**code))
+
+
+@pytest.mark.parametrize("error, transient", [
+    (conflict(pgcode="40P01"), True),
+    (conflict(pgcode="40001"), True),
+    (conflict(sqlstate="40P01"), True),
+    (conflict(sqlstate="40001"), True),
+    (conflict(pgcode="23505"), False),
+    (conflict(), False),
+    (ValueError("not a database error"), False),
+])
+def test_is_transient_conflict(error, transient):
+    assert is_transient_conflict(error) is transient
+
+
+class FlakyBatches:
+    """Stands in for cast_votes: fails the first `failures` batches with `error`, then accepts."""
+
+    def __init__(self, failures: int, error: Exception):
+        self.failures = failures
+        self.error = error
+        self.sizes: list[int] = []
+
+    def __call__(self, session, votes):
+        self.sizes.append(len(votes))
+        if len(self.sizes) <= self.failures:
+            raise self.error
+        return [VoteResult.accepted] * len(votes)
+
+
+def write(monkeypatch, batches: FlakyBatches, retries: int, votes: int = 3) -> list:
+    """Queue `votes` votes on a writer with `retries` and return their futures once written."""
+    monkeypatch.setattr(vote_writer_module, "cast_votes", batches)
+    # Batches only go through cast_votes on Postgres
+    monkeypatch.setattr(engine.dialect, "name", "postgresql")
+    writer = VoteWriter(engine, batch_size=votes, linger=1, max_queued=votes, retries=retries)
+    futures = [writer.submit(uuid4(), AuthUser(email=bench_email(1904001 + i), full_name="voter",
+                                               roll=1904001 + i))
+               for i in range(votes)]
+    writer.start()
+    writer.stop()
+    return futures
+
+
+def test_conflicted_batch_is_retried(monkeypatch):
+    batches = FlakyBatches(2, conflict(pgcode="40P01"))
+    futures = write(monkeypatch, batches, retries=2)
+    assert batches.sizes == [3, 3, 3]
+    assert [future.result(timeout=0) for future in futures] == [VoteResult.accepted] * 3
+
+
+def test_votes_fail_once_retries_run_out(monkeypatch):
+    batches = FlakyBatches(3, conflict(sqlstate="40001"))
+    futures = write(monkeypatch, batches, retries=2)
+    assert batches.sizes == [3, 3, 3]
+    for future in futures:
+        assert future.exception(timeout=0) is batches.error
+
+
+def test_other_errors_are_not_retried(monkeypatch):
+    batches = FlakyBatches(1, conflict(pgcode="23505"))
+    futures = write(monkeypatch, batches, retries=2)
+    assert batches.sizes == [3]
+    for future in futures:
+        assert future.exception(timeout=0) is batches.error
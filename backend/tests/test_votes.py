@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from benchmarks.harness import API, bench_email, client_for
+from core.config import settings
+
+CREATOR = 2103000
+# Voters are numbered from these rolls, one run checking votes in memory and
+# one in the database; the private poll is open to voter 3 of each
+REGISTRY_VOTERS = 2104000
+DATABASE_VOTERS = 2105000
+ELIGIBLE = 3
+
+
+@pytest.fixture(scope="module")
+def options(app):
+    """Two option ids of each poll: open, private, upcoming and ended."""
+    from sqlmodel import Session, select
+
+    from core.db import engine
+    from models.poll import PollOption
+    from services.poll_import import import_polls
+
+    now = datetime.now(timezone.utc)
+    polls = {
+        "open": {"start_time": now - timedelta(hours=1), "end_time": now + timedelta(days=1)},
+        "private": {"start_time": now - timedelta(hours=1), "end_time": now + timedelta(days=1),
+                    "is_private": True,
+                    "roll_ranges": [(REGISTRY_VOTERS + ELIGIBLE,) * 2, (DATABASE_VOTERS + ELIGIBLE,) * 2]},
+        "upcoming": {"start_time": now + timedelta(days=1), "end_time": now + timedelta(days=2)},
+        "ended": {"start_time": now - timedelta(days=2), "end_time": now - timedelta(days=1)},
+    }
+    with Session(engine) as session:
+        results = import_polls(session, bench_email(CREATOR), [
+            {"title": f"votes {name}", "description": name, "option_texts": ["a", "b"], **poll}
+            for name, poll in polls.items()])
+        return {name: session.exec(select(PollOption.id).where(PollOption.poll_id == result.poll_id)
+                                   .order_by(PollOption.option_text)).all()
+                for name, result in zip(polls, results)}
+
+
+@pytest.fixture(params=[True, False], ids=["registry", "database"])
+def voters(request, monkeypatch):
+    """Rolls of fresh voters, for votes checked in memory and in the database."""
+    monkeypatch.setattr(settings, "ACTIVE_POLL_REGISTRY", request.param)
+    first = REGISTRY_VOTERS if request.param else DATABASE_VOTERS
+    return lambda i: first + i
+
+
+def post(app, path: str, roll: int, body: dict):
+    async def request():
+        async with client_for(app) as client:
+            return await client.post(f"{API}/votes/{path}", json=body, headers={"X-Bench-Roll": str(roll)})
+    return asyncio.run(request())
+
+
+def vote(app, option_id, roll: int):
+    return post(app, "vote", roll, {"option_id": str(option_id)})
+
+
+def assert_refused(response, status_code: int, detail: str) -> None:
+    assert response.status_code == status_code, response.text
+    assert response.json()["detail"] == detail
+
+
+def test_vote_is_accepted_once_per_poll(app, options, voters):
+    response = vote(app, options["open"][0], voters(1))
+    assert response.status_code == 200, response.text
+    assert response.json()["message"] == "Voted successfully"
+
+    for option_id in options["open"]:
+        assert_refused(vote(app, option_id, voters(1)), 400, "You have already voted in this poll")
+
+
+def test_vote_for_unknown_option(app, options, voters):
+    assert_refused(vote(app, uuid4(), voters(2)), 404, "PollOption not found")
+
+
+def test_vote_in_private_poll(app, options, voters):
+    assert_refused(vote(app, options["private"][0], voters(6)), 403,
+                   "You are not authorized to vote in this poll")
+    assert vote(app, options["private"][0], voters(ELIGIBLE)).status_code == 200
+    assert_refused(vote(app, options["private"][1], voters(ELIGIBLE)), 400,
+                   "You have already voted in this poll")
+
+
+def test_vote_outside_poll_window(app, options, voters):
+    assert_refused(vote(app, options["upcoming"][0], voters(4)), 400, "Poll not started yet")
+    assert_refused(vote(app, options["ended"][0], voters(4)), 400, "Poll has ended")
+
+
+def test_ballot_reports_every_option(app, options, voters):
+    option_ids = [options["open"][0], options["open"][1], options["private"][0], options["upcoming"][0],
+                  options["ended"][0], uuid4()]
+    response = post(app, "ballot", voters(5), {"option_ids": [str(option_id) for option_id in option_ids]})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert [item["result"] for item in body["data"]] == [
+        "accepted", "duplicate", "forbidden", "not_started", "ended", "option_not_found"]
+    assert body["accepted"] == 1
+
+    again = post(app, "ballot", voters(5), {"option_ids": [str(options["open"][1])]}).json()
+    assert again["data"][0]["result"] == "duplicate"
+    assert again["data"][0]["detail"] == "You have already voted in this poll"